@@ -1,9 +1,15 @@
+import math
+import threading
+import time
+import weakref
 from abc import ABC, abstractmethod
-from random import randrange
-from typing import Optional
+from array import array
+from concurrent.futures import Executor, Future
+from random import Random, randrange
+from typing import Dict, Iterator, Optional, List, Tuple
 
-from heuristics import WIN_SCORE, DRAW_SCORE, evaluate
-from my_chess import Color
+from heuristics import WIN_SCORE, DRAW_SCORE, PIECE_VALUES, EvalCache, evaluate
+from my_chess import Color, Move, Piece, opposite
 
 
 class Agent(ABC):
@@ -15,6 +21,94 @@ class Agent(ABC):
     def choose_move(self, board: 'Board') -> Optional['Move']:
         pass
 
+    # Tìm nước đi ở nền, trả về Future[SearchResult]. Agent tìm trên bản sao nên board của người gọi
+    # có thể đổi ngay sau khi gọi. cancel.set() dừng tìm kiếm sớm và trả về nước tốt nhất đã có.
+    # Mỗi agent chỉ tìm một nước tại một thời điểm (cây MCTS, killers, last_info... là trạng thái của agent):
+    # gọi lại khi lần trước chưa xong sẽ hủy lần trước và chờ nó dừng hẳn rồi mới bắt đầu.
+    # Không truyền executor thì chạy trên một daemon thread riêng. Dùng với asyncio:
+    #     result = await asyncio.wrap_future(agent.choose_move_async(board, movetime=500))
+    def choose_move_async(self, board: 'Board', movetime: Optional[float] = None,
+                          cancel: Optional[threading.Event] = None,
+                          executor: Optional[Executor] = None) -> 'Future[SearchResult]':
+        board = board.copy()
+        cancel = cancel if cancel is not None else threading.Event()
+        slot = _search_slot(self)
+        with _search_slots_lock:
+            previous, slot.cancel = slot.cancel, cancel
+        if previous is not None:
+            previous.set()
+        if executor is not None:
+            return executor.submit(self._run, board, movetime, cancel)
+
+        future: 'Future[SearchResult]' = Future()
+
+        def run():
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                future.set_result(self._run(board, movetime, cancel))
+            except BaseException as e:
+                future.set_exception(e)
+
+        threading.Thread(target=run, name=f"{self.name}-search", daemon=True).start()
+        return future
+
+    def _run(self, board: 'Board', movetime: Optional[float], cancel: threading.Event) -> 'SearchResult':
+        start = time.perf_counter()
+        deadline = start + movetime / 1000 if movetime is not None else None
+        with _search_slot(self).lock:
+            move, stats = self.think(board, deadline, cancel)
+        if move is None:
+            # Bị hủy trước khi xét xong nước đầu tiên ở gốc: vẫn trả về một nước đi được
+            moves = legal_moves(board)
+            move = moves[0] if moves else next(board.get_legal_moves(), None)
+        return SearchResult(move, stats, time.perf_counter() - start, cancel.is_set())
+
+    # Tìm nước đi cho choose_move_async, trả về (nước đi, thống kê). Agent nào hỗ trợ dừng sớm thì
+    # override và kiểm tra cancel / deadline (perf_counter) trong vòng lặp tìm kiếm.
+    def think(self, board: 'Board', deadline: Optional[float],
+              cancel: threading.Event) -> Tuple[Optional['Move'], dict]:
+        return self.choose_move(board), {}
+
+
+# Khóa tìm kiếm và cancel token của lần choose_move_async gần nhất, theo từng agent. Giữ ngoài agent để
+# agent vẫn pickle được (gửi sang worker process).
+class _SearchSlot:
+    __slots__ = ("lock", "cancel")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.cancel: Optional[threading.Event] = None
+
+
+_search_slots: 'weakref.WeakKeyDictionary[Agent, _SearchSlot]' = weakref.WeakKeyDictionary()
+_search_slots_lock = threading.Lock()
+
+
+def _search_slot(agent: 'Agent') -> _SearchSlot:
+    with _search_slots_lock:
+        slot = _search_slots.get(agent)
+        if slot is None:
+            slot = _search_slots[agent] = _SearchSlot()
+        return slot
+
+
+# Kết quả của choose_move_async: nước đi (None nếu không còn nước), thống kê của agent (nodes, depth, ...),
+# thời gian chạy (giây) và tìm kiếm có bị hủy hay không
+class SearchResult:
+    __slots__ = ("move", "stats", "elapsed", "cancelled")
+
+    def __init__(self, move: Optional['Move'], stats: dict, elapsed: float, cancelled: bool):
+        self.move = move
+        self.stats = stats
+        self.elapsed = elapsed
+        self.cancelled = cancelled
+
+    def __repr__(self):
+        move = self.move.to_uci() if self.move is not None else None
+        return f"SearchResult(move={move}, elapsed={self.elapsed:.3f}, cancelled={self.cancelled})"
+
+
 # Agent này sẽ chọn ngẫu nhiên 1 nước đi từ các nước đi hợp lệ
 class RandomAgent(Agent):
     def choose_move(self, board: 'Board') -> Optional['Move']:
@@ -53,28 +147,789 @@ class MinimaxAgent(Agent):
 
 
 class AlphaBetaAgent(Agent):
-    def __init__(self, name: str, color: 'Color', depth: int = 3):
+    def __init__(self, name: str, color: 'Color', depth: int = 3, ponder_width: int = 3,
+                 tt_size: int = 1 << 20, cache: Optional['AnalysisCache'] = None, eval_cache_size: int = 1 << 18,
+                 quiescence: bool = False):
         super().__init__(name, color)
         self.depth = depth
+        self.quiescence = quiescence  # tìm tiếp các nước ăn quân không lỗ (SEE) ở lá
+        self.tt = TranspositionTable(tt_size)
+        # Cache điểm evaluate của các lá, giữ qua các lần tìm kiếm (0 = tắt)
+        self.eval_cache = EvalCache(eval_cache_size) if eval_cache_size else None
+        self.cache = cache  # cache phân tích lưu trên đĩa, dùng chung giữa các process / lần chạy
+
+        # Pondering: suy nghĩ trong thời gian của đối thủ
+        self.ponder_width = ponder_width  # số nước trả lời dự đoán sẽ được tìm trước
+        self.ponder_hits = 0
+        self._prepared = {}  # hash thế cờ sau nước của đối thủ -> (nước đi đã chuẩn bị sẵn, last_info của nó)
+        self._ponder_thread: Optional[threading.Thread] = None
+        self._ponder_stop: Optional[threading.Event] = None
+
+        self.last_info = {}  # thống kê của lần lặp cuối: depth, score, nodes, time, pv
+        self._root_best: Optional['Move'] = None
 
     def choose_move(self, board: 'Board') -> Optional['Move']:
-        best_move = None
-        best_val = float("-inf") if self.color == Color.WHITE else float("inf")
+        self.stop_ponder()
+
+        # Ponder hit: đối thủ đi đúng nước đã dự đoán => trả lời ngay
+        prepared = self._prepared.pop(board.hash, None)
+        self._prepared.clear()
+        if prepared is not None:
+            prepared_move, info = prepared
+            for move in board.get_legal_moves():
+                if move == prepared_move:
+                    self.ponder_hits += 1
+                    self.last_info = info
+                    return move
+
+        # Ponder miss: tìm kiếm bình thường, TT đã được làm nóng trong lúc ponder
+        return self.search(board, self.depth)
+
+    # Iterative deepening với các giới hạn: độ sâu, thời gian (ms), số node, hoặc stop event từ bên ngoài.
+    # Khi bị dừng giữa chừng, trả về nước tốt nhất của lần lặp cuối cùng đã hoàn thành.
+    def search(self, board: 'Board', depth: Optional[int] = None, movetime: Optional[float] = None,
+               nodes: Optional[int] = None, stop: Optional[threading.Event] = None) -> Optional['Move']:
+        for _ in self.analyse(board, depth, movetime, nodes, stop):
+            pass
+        return self.best_move()
+
+    # Nước tốt nhất của lần lặp cuối cùng đã hoàn thành; bị dừng trước khi xong độ sâu 1 thì dùng
+    # nước tốt nhất tạm thời ở gốc
+    def best_move(self) -> Optional['Move']:
+        return self.last_info.get("move") or self._root_best
+
+    # Như search nhưng trả về kết quả sau mỗi độ sâu hoàn thành: depth, move, score, nodes, time, nps, pv
+    # và multipv (multipv dòng tốt nhất, mỗi dòng gồm move, score, pv). Việc tìm kiếm chỉ chạy khi người gọi
+    # lấy kết quả tiếp theo, nên ngừng lặp (hoặc đóng generator) là dừng tìm kiếm. searchmoves (UCI "go
+    # searchmoves"): chỉ xét các nước này ở gốc.
+    def analyse(self, board: 'Board', depth: Optional[int] = None, movetime: Optional[float] = None,
+                nodes: Optional[int] = None, stop: Optional[threading.Event] = None,
+                multipv: int = 1, searchmoves: Optional[List['Move']] = None) -> Iterator[dict]:
+        start = time.perf_counter()
+        deadline = start + movetime / 1000 if movetime is not None else None
+        ctx = SearchContext(self.tt, stop, deadline, nodes, self.eval_cache, self.quiescence)
+        ctx.root_moves = searchmoves
+        self._root_best = None
+        try:
+            yield from self._analyse(board, ctx, start, depth, multipv)
+        finally:
+            self._root_best = ctx.root_best
+
+    # Dùng cho choose_move_async: có deadline thì đào sâu tới khi hết giờ, không thì tới self.depth
+    def think(self, board: 'Board', deadline: Optional[float],
+              cancel: threading.Event) -> Tuple[Optional['Move'], dict]:
+        self.stop_ponder()
+        ctx = SearchContext(self.tt, cancel, deadline, None, self.eval_cache, self.quiescence)
+        info = {}
+        for info in self._analyse(board, ctx, time.perf_counter(), None if deadline else self.depth):
+            pass
+        return info.get("move") or ctx.root_best, info
+
+    def _analyse(self, board: 'Board', ctx: 'SearchContext', start: float, depth: Optional[int] = None,
+                 multipv: int = 1) -> Iterator[dict]:
+        self.last_info = {}
+        # Kết quả khi chỉ xét một phần nước ở gốc không phải điểm của thế cờ: không đọc / ghi cache
+        use_cache = self.cache is not None and not ctx.root_moves
+        if use_cache and multipv == 1:
+            cached = self._cached_result(board, depth)
+            if cached is not None:
+                self.last_info = cached
+                yield cached
+                return
+
+        for d in range(1, (depth or MAX_DEPTH) + 1):
+            try:
+                lines = self._search_root(board, d, ctx, multipv)
+            except SearchAborted:
+                return
+            if not lines:
+                return
+            elapsed = time.perf_counter() - start
+            move, score = lines[0]
+            info = self.last_info = {
+                "depth": d,
+                "move": move,
+                "score": score,
+                "nodes": ctx.nodes,
+                "time": elapsed,
+                "nps": int(ctx.nodes / elapsed) if elapsed > 0 else 0,
+                "pv": self._line(board, move, d) if ctx.root_moves else principal_variation(board, self.tt, d),
+                "multipv": [{"move": m, "score": v, "pv": self._line(board, m, d)} for m, v in lines],
+            }
+            if use_cache:
+                self.cache.put(board.hash, d, score, EXACT, move.to_code())
+            yield info
+
+    # Tra cache trên đĩa. Entry luôn được nạp vào TT (hash move cho lần tìm kiếm này); nếu là kết quả chính xác
+    # với độ sâu đủ thì trả về luôn thay cho việc tìm kiếm.
+    def _cached_result(self, board: 'Board', depth: Optional[int]) -> Optional[dict]:
+        entry = self.cache.get(board.hash)
+        if entry is None or entry[3] is None:
+            return None
+        cached_depth, score, flag, code = entry
+        move = board.find_move(Move.from_code(code, board.turn == Color.WHITE))
+        if move is None:
+            return None
+        self.tt.store(board.hash, cached_depth, score, flag, move)
+        if flag != EXACT or depth is None or cached_depth < depth:
+            return None
+        pv = principal_variation(board, self.tt, cached_depth)
+        return {
+            "depth": cached_depth,
+            "move": move,
+            "score": score,
+            "nodes": 0,
+            "time": 0.0,
+            "nps": 0,
+            "pv": pv,
+            "multipv": [{"move": move, "score": score, "pv": pv}],
+            "cached": True,
+        }
+
+    # Biến chính bắt đầu bằng nước gốc move (dùng cho các dòng multipv không phải nước tốt nhất)
+    def _line(self, board: 'Board', move: 'Move', depth: int) -> List['Move']:
+        board.push_move(move)
+        try:
+            return [move] + principal_variation(board, self.tt, depth - 1)
+        finally:
+            board.pop_move()
+
+    # Tìm ở gốc, trả về tối đa multipv cặp (move, score) tốt nhất theo thứ tự giảm dần (theo bên đi).
+    # Cửa sổ alpha/beta ở gốc lấy theo dòng thứ multipv để điểm của cả multipv dòng đều chính xác.
+    def _search_root(self, board: 'Board', depth: int, ctx: 'SearchContext', multipv: int = 1):
+        maximizing = board.turn == Color.WHITE
+        alpha, beta = float("-inf"), float("inf")
+        lines = []
+
+        entry = self.tt.get(board.hash)
+        for move in pick_moves(board, entry[3] if entry else None, ctx.killers_at(board.ply()), ctx.quiescence):
+            if ctx.root_moves and move not in ctx.root_moves:
+                continue
+            board.push_move(move)
+            try:
+                eval = alpha_beta(board, depth - 1, alpha, beta, not maximizing, ctx)
+            finally:
+                board.pop_move()
+
+            lines.append((move, eval))
+            lines.sort(key=lambda line: line[1], reverse=maximizing)
+            if len(lines) >= multipv:
+                if maximizing:
+                    alpha = max(alpha, lines[multipv - 1][1])
+                else:
+                    beta = min(beta, lines[multipv - 1][1])
+            if ctx.root_best is None:
+                ctx.root_best = lines[0][0]
+
+        lines = lines[:multipv]
+        if lines and not ctx.root_moves:
+            self.tt.store(board.hash, depth, lines[0][1], EXACT, lines[0][0])
+        return lines
+
+    # Bắt đầu ponder trên bản sao của bàn cờ (gọi ngay sau khi agent vừa đi)
+    def start_ponder(self, board: 'Board'):
+        self.stop_ponder()
+        self._prepared.clear()
+        self._ponder_stop = threading.Event()
+        self._ponder_thread = threading.Thread(target=self._ponder, args=(board.copy(), self._ponder_stop),
+                                               daemon=True)
+        self._ponder_thread.start()
+
+    def stop_ponder(self):
+        if self._ponder_thread is None:
+            return
+        self._ponder_stop.set()
+        self._ponder_thread.join()
+        self._ponder_thread = None
+        self._ponder_stop = None
+
+    def _ponder(self, board: 'Board', stop: threading.Event):
+        ctx = SearchContext(self.tt, stop, eval_cache=self.eval_cache, quiescence=self.quiescence)
+        try:
+            for reply in self._expected_replies(board, ctx):
+                board.push_move(reply)
+                start, nodes = time.perf_counter(), ctx.nodes
+                lines = []
+                for d in range(1, self.depth + 1):
+                    lines = self._search_root(board, d, ctx)
+                if lines:
+                    # Thống kê như của search để last_info vẫn đúng khi ponder hit
+                    move, score = lines[0]
+                    elapsed = time.perf_counter() - start
+                    pv = principal_variation(board, self.tt, self.depth)
+                    self._prepared[board.hash] = (move, {
+                        "depth": self.depth,
+                        "move": move,
+                        "score": score,
+                        "nodes": ctx.nodes - nodes,
+                        "time": elapsed,
+                        "nps": int((ctx.nodes - nodes) / elapsed) if elapsed > 0 else 0,
+                        "pv": pv,
+                        "multipv": [{"move": move, "score": score, "pv": pv}],
+                        "ponderhit": True,
+                    })
+                board.pop_move()
+        except SearchAborted:
+            # Bàn cờ là bản sao nên không cần pop lại các nước đang dở
+            pass
+
+    # Dự đoán các nước trả lời có khả năng nhất của đối thủ, nước tốt nhất (theo đối thủ) đứng trước
+    def _expected_replies(self, board: 'Board', ctx: 'SearchContext') -> List['Move']:
         maximizing = self.color == Color.WHITE
+        scored = []
+        for reply in board.get_legal_moves():
+            board.push_move(reply)
+            score = alpha_beta(board, 1, float("-inf"), float("inf"), maximizing, ctx)
+            board.pop_move()
+            scored.append((score, reply))
 
-        for move in board.get_legal_moves():
+        # Đối thủ muốn giá trị nhỏ nhất nếu agent là trắng và ngược lại
+        scored.sort(key=lambda item: item[0], reverse=not maximizing)
+        replies = [reply for _, reply in scored]
+
+        # Nước tốt nhất của đối thủ trong TT (từ lần tìm kiếm sâu hơn) được ưu tiên
+        entry = self.tt.get(board.hash)
+        return order_moves(replies, entry[3] if entry else None)[:self.ponder_width]
+
+
+# Agent tìm chiếu hết bằng proof-number search: chứng minh (hoặc bác bỏ) "chiếu hết trong mate_in nước".
+# Cây chỉ mở rộng nhánh "dễ chứng minh nhất" nên tìm được chiếu hết ngắn với rất ít node so với alpha-beta
+# full-width. Nếu không chứng minh được trong giới hạn node / bộ nhớ thì dùng fallback (alpha-beta nông).
+class MateSearchAgent(Agent):
+    def __init__(self, name: str, color: 'Color', mate_in: int = 3, max_nodes: int = 200_000,
+                 max_tree_nodes: int = 1_000_000, fallback: Optional[Agent] = None):
+        super().__init__(name, color)
+        self.mate_in = mate_in
+        self.max_nodes = max_nodes            # số thế cờ được sinh tối đa
+        self.max_tree_nodes = max_tree_nodes  # số node tối đa được tạo trong cây (giới hạn bộ nhớ)
+        self.fallback = fallback if fallback is not None else AlphaBetaAgent(name, color, depth=2)
+        self.last_info = {}  # result ("mate" / "no mate" / "unknown"), nodes, tree_nodes, time, pv
+
+    def choose_move(self, board: 'Board') -> Optional['Move']:
+        line = self.solve(board)
+        if line:
+            return board.find_move(line[0])
+        self.fallback.color = board.turn
+        return self.fallback.choose_move(board)
+
+    def think(self, board: 'Board', deadline: Optional[float],
+              cancel: threading.Event) -> Tuple[Optional['Move'], dict]:
+        line = self.solve(board, deadline=deadline, stop=cancel)
+        if line:
+            return board.find_move(line[0]), self.last_info
+        info = dict(self.last_info)
+        if cancel.is_set() or (deadline is not None and time.perf_counter() >= deadline):
+            # Hết thời gian trong lúc tìm chiếu hết: trả về nước bất kỳ thay vì tìm tiếp bằng fallback
+            return (legal_moves(board) or [None])[0], info
+        self.fallback.color = board.turn
+        move, info["fallback"] = self.fallback.think(board, deadline, cancel)
+        return move, info
+
+    # Tìm chiếu hết cho bên đang đi trong tối đa mate_in nước, trả về biến chiếu hết (nước của cả hai bên)
+    # hoặc None nếu đã bác bỏ / hết giới hạn (xem last_info["result"]). deadline (perf_counter) và stop
+    # được kiểm tra sau mỗi lần mở rộng lá.
+    def solve(self, board: 'Board', mate_in: Optional[int] = None, deadline: Optional[float] = None,
+              stop: Optional[threading.Event] = None) -> Optional[List['Move']]:
+        start = time.perf_counter()
+        board = board.copy()
+        self._max_ply = 2 * (mate_in or self.mate_in) - 1  # nước chiếu hết là nửa nước thứ 2N-1
+        self._nodes = 0
+        self._tree_nodes = 1
+        root = ProofNode(None, True, 0)
+        self._expand(board, root)
+
+        while root.pn and root.dn and self._nodes < self.max_nodes and self._tree_nodes < self.max_tree_nodes:
+            if (stop is not None and stop.is_set()) or (deadline is not None and time.perf_counter() >= deadline):
+                break
+            # Đi xuống node lá "đáng chứng minh nhất"
+            node = root
+            while node.children:
+                node = min(node.children, key=(lambda c: c.pn) if node.attacker else (lambda c: c.dn))
+                board.push_move(node.move)
+            self._expand(board, node)
+
+            # Cập nhật pn / dn ngược về gốc
+            while node is not None:
+                node.update()
+                if node.parent is not None:
+                    board.pop_move()
+                if node.dn == 0 and node is not root:
+                    node.children = []  # nhánh đã bác bỏ không cần giữ lại
+                node = node.parent
+
+        line = root.mating_line() if root.pn == 0 else None
+        result = "mate" if root.pn == 0 else "no mate" if root.dn == 0 else "unknown"
+        self.last_info = {"result": result, "nodes": self._nodes, "tree_nodes": self._tree_nodes,
+                          "time": time.perf_counter() - start, "pv": line or []}
+        return line
+
+    # Sinh các nước hợp lệ của node và khởi tạo pn / dn cho từng node con
+    def _expand(self, board: 'Board', node: 'ProofNode'):
+        moves = legal_moves(board)
+        self._nodes += len(moves)
+        if not moves:
+            # Bên phòng thủ hết nước: bị chiếu là chiếu hết (đã chứng minh), không thì hòa pat (bác bỏ)
+            mated = not node.attacker and board.is_check(board.turn)
+            node.pn, node.dn = (0, INFINITE_PN) if mated else (INFINITE_PN, 0)
+            return
+
+        for move in moves:
+            child = ProofNode(move, not node.attacker, node.ply + 1, node)
             board.push_move(move)
-            eval = alpha_beta(board, self.depth - 1, float("-inf"), float("inf"), not maximizing)
+            if board.repetition_count() >= 2:
+                child.pn, child.dn = INFINITE_PN, 0
+            elif node.attacker:
+                # Bên phòng thủ sắp đi: ít nước trả lời thì dễ chứng minh hơn
+                if board.is_check(board.turn):
+                    replies = board.count_legal_moves()
+                    self._nodes += replies
+                    if replies == 0:
+                        child.pn, child.dn = 0, INFINITE_PN
+                    elif child.ply >= self._max_ply:
+                        child.pn, child.dn = INFINITE_PN, 0
+                    else:
+                        child.pn = replies
+                elif child.ply >= self._max_ply:
+                    child.pn, child.dn = INFINITE_PN, 0
+                else:
+                    replies = board.count_legal_moves(pseudo=True)
+                    # Không bị chiếu mà hết nước: hòa pat (bác bỏ), không được coi pn = 0 là chiếu hết
+                    if replies == 0:
+                        child.pn, child.dn = INFINITE_PN, 0
+                    else:
+                        child.pn = replies
             board.pop_move()
+            node.children.append(child)
+        self._tree_nodes += len(node.children)
 
-            if maximizing and eval > best_val:
-                best_val = eval
-                best_move = move
-            elif not maximizing and eval < best_val:
-                best_val = eval
-                best_move = move
 
-        return best_move
+# Monte Carlo tree search với UCT. Lá được đánh giá bằng evaluate (sau một đoạn rollout ngẫu nhiên ngắn
+# nếu rollout_depth > 0). Cây được giữ lại giữa các lần choose_move: đi xuống cây con của các nước đã đi.
+class MCTSAgent(Agent):
+    def __init__(self, name: str, color: 'Color', iterations: int = 2000, movetime: Optional[float] = None,
+                 exploration: float = 1.4, rollout_depth: int = 0, max_nodes: int = 2_000_000,
+                 seed: Optional[int] = None):
+        super().__init__(name, color)
+        self.iterations = iterations
+        self.movetime = movetime            # ms, nếu có thì dừng theo thời gian thay cho số vòng lặp
+        self.exploration = exploration
+        self.rollout_depth = rollout_depth
+        self.max_nodes = max_nodes          # ngừng mở rộng cây khi đạt số node này
+        self.rng = Random(seed)
+        self.tree = MCTSTree()
+        self.last_info = {}                 # iterations, nodes, reused, time, visits của nước được chọn
+
+        # Thế cờ ứng với gốc cây: các nước đã đi (mã 16 bit) và hash, để nhận ra các nước đi tiếp theo
+        self._root_history: List[int] = []
+        self._root_hash: Optional[int] = None
+
+    def choose_move(self, board: 'Board') -> Optional['Move']:
+        start = time.perf_counter()
+        deadline = start + self.movetime / 1000 if self.movetime is not None else None
+        return self._search(board.copy(), start, deadline, None)
+
+    def think(self, board: 'Board', deadline: Optional[float],
+              cancel: threading.Event) -> Tuple[Optional['Move'], dict]:
+        move = self._search(board.copy(), time.perf_counter(), deadline, cancel)
+        return move, self.last_info
+
+    # Lặp tới deadline (nếu có, không thì đủ self.iterations lần) hoặc tới khi stop được set
+    def _search(self, board: 'Board', start: float, deadline: Optional[float],
+                stop: Optional[threading.Event]) -> Optional['Move']:
+        reused = self._reuse_tree(board)
+        iterations = 0
+        while True:
+            if stop is not None and stop.is_set():
+                break
+            if deadline is not None:
+                if time.perf_counter() >= deadline:
+                    break
+            elif iterations >= self.iterations:
+                break
+            self._iterate(board)
+            iterations += 1
+
+        tree = self.tree
+        best = None
+        if tree.child_count[0]:
+            first = tree.first_child[0]
+            best = max(range(first, first + tree.child_count[0]), key=lambda i: tree.visits[i])
+        self.last_info = {"iterations": iterations, "nodes": len(tree), "reused": reused,
+                          "time": time.perf_counter() - start,
+                          "visits": tree.visits[best] if best is not None else 0}
+        if best is None:
+            return None
+        return board.find_move(Move.from_code(tree.code[best], board.turn == Color.WHITE))
+
+    # Nếu thế cờ hiện tại đi tiếp từ gốc cây cũ thì giữ lại cây con tương ứng, không thì tạo cây mới
+    def _reuse_tree(self, board: 'Board') -> bool:
+        history = [move.to_code() for move in board.move_history()]
+        known = len(self._root_history)
+        node = None
+        if self._root_hash is not None and history[:known] == self._root_history:
+            root_board = board.copy()
+            for _ in range(len(history) - known):
+                root_board.pop_move()
+            if root_board.hash == self._root_hash:
+                node = 0
+                for code in history[known:]:
+                    node = self.tree.find_child(node, code)
+                    if node is None:
+                        break
+
+        self._root_history = history
+        self._root_hash = board.hash
+        if node is None:
+            self.tree = MCTSTree()
+            return False
+        if node != 0:
+            self.tree = self.tree.subtree(node)
+        return True
+
+    # Một vòng MCTS: chọn (UCT) -> mở rộng -> đánh giá lá -> lan truyền ngược
+    def _iterate(self, board: 'Board'):
+        tree = self.tree
+        node = 0
+        pushed = 0
+        while tree.child_count[node]:
+            node = tree.select(node, self.exploration)
+            board.push_move(Move.from_code(tree.code[node], board.turn == Color.WHITE))
+            pushed += 1
+
+        value = self._terminal_value(board)
+        if value is None:
+            if (tree.visits[node] or node == 0) and len(tree) < self.max_nodes:
+                moves = list(board.get_legal_moves())
+                if moves:
+                    node = tree.add_children(node, [move.to_code() for move in moves])
+                    board.push_move(Move.from_code(tree.code[node], board.turn == Color.WHITE))
+                    pushed += 1
+                    value = self._terminal_value(board)
+            if value is None:
+                value = self._leaf_value(board)
+
+        tree.backpropagate(node, value)
+        for _ in range(pushed):
+            board.pop_move()
+
+    # Giá trị (0..1) cho bên vừa đi vào thế cờ này nếu ván đã kết thúc: ăn được vua = thắng, lặp lại = hòa
+    def _terminal_value(self, board: 'Board') -> Optional[float]:
+        if board.find_king(board.turn) is None:
+            return 1.0
+        if board.repetition_count() >= 2 or board.is_fifty_moves():
+            return 0.5
+        return None
+
+    def _leaf_value(self, board: 'Board') -> float:
+        mover = opposite(board.turn)
+        pushed = 0
+        for _ in range(self.rollout_depth):
+            moves = list(board.get_legal_moves())
+            if not moves or board.find_king(board.turn) is None:
+                break
+            board.push_move(self.rng.choice(moves))
+            pushed += 1
+        score = evaluate(board)
+        for _ in range(pushed):
+            board.pop_move()
+        # Đổi điểm centipawn sang xác suất thắng của trắng rồi lấy theo góc nhìn bên vừa đi
+        white = 1 / (1 + math.exp(-score / MCTS_SCALE))
+        return white if mover == Color.WHITE else 1 - white
+
+
+# Độ dốc của hàm sigmoid đổi điểm centipawn sang xác suất thắng trong MCTS
+MCTS_SCALE = 400
+
+
+# Cây MCTS lưu theo cột trong các array (khoảng 20 byte mỗi node): con của một node nằm liền nhau,
+# node gốc luôn là 0. value là tổng giá trị (0..1) theo góc nhìn của bên đi nước dẫn vào node.
+class MCTSTree:
+    def __init__(self):
+        self.code = array("H", [0])          # mã 16 bit của nước dẫn vào node (Move.to_code)
+        self.parent = array("i", [-1])
+        self.first_child = array("i", [0])
+        self.child_count = array("H", [0])
+        self.visits = array("I", [0])
+        self.value = array("f", [0.0])
+
+    def __len__(self) -> int:
+        return len(self.code)
+
+    # Thêm các node con (chưa được thăm) cho node, trả về chỉ số của con đầu tiên
+    def add_children(self, node: int, codes: List[int]) -> int:
+        first = len(self.code)
+        count = len(codes)
+        self.code.extend(codes)
+        self.parent.extend([node] * count)
+        self.first_child.extend([0] * count)
+        self.child_count.extend([0] * count)
+        self.visits.extend([0] * count)
+        self.value.extend([0.0] * count)
+        self.first_child[node] = first
+        self.child_count[node] = count
+        return first
+
+    def find_child(self, node: int, code: int) -> Optional[int]:
+        first = self.first_child[node]
+        for child in range(first, first + self.child_count[node]):
+            if self.code[child] == code:
+                return child
+        return None
+
+    # UCT: con chưa thăm được chọn trước, sau đó cân bằng giá trị trung bình và mức độ khám phá
+    def select(self, node: int, exploration: float) -> int:
+        visits, value = self.visits, self.value
+        log_parent = math.log(visits[node] or 1)
+        best, best_score = -1, -1.0
+        first = self.first_child[node]
+        for child in range(first, first + self.child_count[node]):
+            n = visits[child]
+            if n == 0:
+                return child
+            score = value[child] / n + exploration * math.sqrt(log_parent / n)
+            if score > best_score:
+                best, best_score = child, score
+        return best
+
+    # Cộng kết quả từ lá về gốc, đổi góc nhìn ở mỗi tầng
+    def backpropagate(self, node: int, value: float):
+        while node >= 0:
+            self.visits[node] += 1
+            self.value[node] += value
+            value = 1.0 - value
+            node = self.parent[node]
+
+    # Cây mới chỉ gồm cây con của node (node trở thành gốc), các node khác được giải phóng
+    def subtree(self, node: int) -> 'MCTSTree':
+        new = MCTSTree()
+        new.visits[0] = self.visits[node]
+        new.value[0] = self.value[node]
+        order = [node]  # order[i] = chỉ số cũ của node mới i
+        i = 0
+        while i < len(order):
+            old = order[i]
+            count = self.child_count[old]
+            if count:
+                first = self.first_child[old]
+                new_first = new.add_children(i, self.code[first:first + count].tolist())
+                for k in range(count):
+                    new.visits[new_first + k] = self.visits[first + k]
+                    new.value[new_first + k] = self.value[first + k]
+                order.extend(range(first, first + count))
+            i += 1
+        return new
+
+
+# Các nước thật sự hợp lệ (không để vua mình bị chiếu) của bên đang đi
+def legal_moves(board: 'Board') -> List['Move']:
+    color = board.turn
+    moves = []
+    for move in board.get_legal_moves():
+        board.push_move(move)
+        if not board.is_check(color):
+            moves.append(move)
+        board.pop_move()
+    return moves
+
+
+# pn / dn vô cực của proof-number search
+INFINITE_PN = 1 << 30
+
+
+# Node của cây proof-number: attacker = bên tìm chiếu hết đang đi (OR node), ngược lại là AND node.
+# pn: số lá tối thiểu cần chứng minh để chứng minh node, dn: số lá tối thiểu cần bác bỏ.
+class ProofNode:
+    __slots__ = ("move", "attacker", "ply", "parent", "children", "pn", "dn")
+
+    def __init__(self, move: Optional['Move'], attacker: bool, ply: int, parent: Optional['ProofNode'] = None):
+        self.move = move
+        self.attacker = attacker
+        self.ply = ply
+        self.parent = parent
+        self.children: List['ProofNode'] = []
+        self.pn = 1
+        self.dn = 1
+
+    def update(self):
+        if not self.children:
+            return
+        if self.attacker:
+            self.pn = min(c.pn for c in self.children)
+            self.dn = min(INFINITE_PN, sum(c.dn for c in self.children))
+        else:
+            self.pn = min(INFINITE_PN, sum(c.pn for c in self.children))
+            self.dn = min(c.dn for c in self.children)
+
+    # Biến chiếu hết của node đã chứng minh: bên tấn công chọn đường ngắn nhất, bên phòng thủ chống dài nhất
+    def mating_line(self) -> List['Move']:
+        lines = [[c.move] + c.mating_line() for c in self.children if c.pn == 0]
+        if not lines:
+            return []
+        return min(lines, key=len) if self.attacker else max(lines, key=len)
+
+
+# Bị raise bên trong alpha_beta khi tìm kiếm bị dừng từ bên ngoài (stop event)
+class SearchAborted(Exception):
+    pass
+
+
+# Độ sâu tối đa của iterative deepening khi chỉ giới hạn bằng thời gian / số node
+MAX_DEPTH = 64
+
+
+# Trạng thái dùng chung của một lần tìm kiếm: TT, điều kiện dừng và bộ đếm node
+class SearchContext:
+    def __init__(self, tt: Optional['TranspositionTable'] = None, stop: Optional[threading.Event] = None,
+                 deadline: Optional[float] = None, max_nodes: Optional[int] = None,
+                 eval_cache: Optional[EvalCache] = None, quiescence: bool = False):
+        self.tt = tt
+        self.eval_cache = eval_cache
+        self.quiescence = quiescence  # ở lá tìm tiếp các nước ăn quân không lỗ thay vì evaluate ngay
+        self.stop = stop
+        self.deadline = deadline  # thời điểm (time.perf_counter) phải dừng
+        self.max_nodes = max_nodes
+        self.nodes = 0
+        self.killers: Dict[int, List['Move']] = {}  # ply -> các nước yên tĩnh gần đây gây cắt tỉa beta
+        self.root_best: Optional['Move'] = None     # nước tốt nhất tạm thời ở gốc (trước khi xong độ sâu 1)
+        self.root_moves: Optional[List['Move']] = None  # chỉ xét các nước này ở gốc (None = tất cả)
+
+    # Gọi ở mỗi node: đếm node và raise SearchAborted khi hết giới hạn
+    def tick(self):
+        self.nodes += 1
+        if self.stop is not None and self.stop.is_set():
+            raise SearchAborted
+        if self.max_nodes is not None and self.nodes > self.max_nodes:
+            raise SearchAborted
+        # Chỉ đọc đồng hồ mỗi 256 node cho rẻ
+        if self.deadline is not None and not self.nodes & 255 and time.perf_counter() >= self.deadline:
+            raise SearchAborted
+
+    def killers_at(self, ply: int) -> List['Move']:
+        return self.killers.get(ply, [])
+
+    # Ghi nhớ nước yên tĩnh vừa gây cắt tỉa beta ở ply này (nước mới nhất đứng đầu)
+    def store_killer(self, ply: int, move: 'Move'):
+        killers = self.killers.setdefault(ply, [])
+        if move in killers:
+            return
+        killers.insert(0, move)
+        del killers[KILLER_SLOTS:]
+
+
+# Số killer move giữ lại ở mỗi ply
+KILLER_SLOTS = 2
+
+
+# Loại giá trị lưu trong transposition table
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+# Transposition table: hash thế cờ -> (depth, value, flag, best_move)
+class TranspositionTable:
+    def __init__(self, max_entries: int = 1 << 20):
+        self.max_entries = max_entries
+        self.entries = {}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: int):
+        return self.entries.get(key)
+
+    def store(self, key: int, depth: int, value: int, flag: int, move: Optional['Move']):
+        old = self.entries.get(key)
+        # Ưu tiên giữ lại kết quả của lần tìm kiếm sâu hơn
+        if old is not None and old[0] > depth:
+            return
+        if old is None and len(self.entries) >= self.max_entries:
+            self.entries.clear()
+        self.entries[key] = (depth, value, flag, move)
+
+    def clear(self):
+        self.entries.clear()
+
+
+# Đưa nước đi lấy từ TT (hash move) lên đầu danh sách
+def order_moves(moves, hash_move: Optional['Move'] = None) -> List['Move']:
+    moves = list(moves)
+    if hash_move is not None:
+        moves.sort(key=lambda m: m != hash_move)
+    return moves
+
+
+# Điểm MVV-LVA để xếp các nước ăn quân: ăn quân giá trị cao nhất trước, dùng quân rẻ nhất để ăn.
+# Phong tốt được cộng thêm giá trị quân phong.
+def mvv_lva(board: 'Board', move: 'Move') -> int:
+    victim = board.piece_at(*move.to_pos)
+    score = victim.piece_type.value * 8 if victim else 0
+    if move.promotion:
+        score += Piece.from_symbol(move.promotion).piece_type.value * 8
+    return score - board.piece_at(*move.from_pos).piece_type.value
+
+
+# Nước ăn quân bị lỗ vật chất theo static exchange evaluation (ví dụ hậu ăn tốt được bảo vệ).
+# Chỉ cần tính SEE khi quân bị ăn rẻ hơn quân đi ăn, phong tốt không bao giờ bị coi là lỗ.
+def is_losing_capture(board: 'Board', move: 'Move') -> bool:
+    if move.promotion:
+        return False
+    victim = board.piece_at(*move.to_pos)
+    if victim is None or PIECE_VALUES[victim.piece_type] >= PIECE_VALUES[board.piece_at(*move.from_pos).piece_type]:
+        return False
+    return board.see(move, PIECE_VALUES) < 0
+
+
+# Sinh nước theo giai đoạn: hash move, rồi các nước ăn quân / phong tốt theo MVV-LVA, rồi killer move,
+# cuối cùng mới sinh các nước yên tĩnh. Cắt tỉa beta ở giai đoạn đầu sẽ bỏ qua hẳn việc sinh nước yên tĩnh.
+# defer_losing: để các nước ăn quân lỗ theo SEE lại sau cùng. Chỉ có lợi khi có tìm kiếm tĩnh: không có nó,
+# ở lá nước "lỗ" như hậu ăn tốt được bảo vệ vẫn được tính là lời (hiệu ứng chân trời) và hay gây cắt tỉa.
+def pick_moves(board: 'Board', hash_move: Optional['Move'] = None, killers: List['Move'] = (),
+               defer_losing: bool = False) -> Iterator['Move']:
+    if hash_move is not None:
+        hash_move = board.find_move(hash_move)
+        if hash_move is not None:
+            yield hash_move
+
+    captures = sorted(board.get_captures(), key=lambda m: mvv_lva(board, m), reverse=True)
+    losing = []
+    for move in captures:
+        if move == hash_move:
+            continue
+        if defer_losing and is_losing_capture(board, move):
+            losing.append(move)
+        else:
+            yield move
+
+    tried = [hash_move]
+    for killer in killers:
+        if killer == hash_move or board.is_capture_or_promotion(killer):
+            continue
+        killer = board.find_move(killer)
+        if killer is not None:
+            tried.append(killer)
+            yield killer
+
+    for move in board.get_quiet_moves():
+        if move not in tried:
+            yield move
+
+    yield from losing
+
+
+# Lấy biến chính (principal variation) bằng cách đi theo hash move trong TT
+def principal_variation(board: 'Board', tt: 'TranspositionTable', depth: int) -> List['Move']:
+    pv = []
+    for _ in range(depth):
+        entry = tt.get(board.hash)
+        if entry is None or entry[3] is None:
+            break
+        move = next((m for m in board.get_legal_moves() if m == entry[3]), None)
+        if move is None:
+            break
+        board.push_move(move)
+        pv.append(move)
+    for _ in pv:
+        board.pop_move()
+    return pv
 
 
 
@@ -104,34 +959,129 @@ def minimax(board, depth, maximizing) -> int:
         return min_eval
 
 
-def alpha_beta(board, depth, alpha, beta, maximizing) -> int:
+def alpha_beta(board, depth, alpha, beta, maximizing, ctx: Optional[SearchContext] = None) -> int:
+    tt = None
+    eval_cache = None
+    if ctx is not None:
+        ctx.tick()
+        tt = ctx.tt
+        eval_cache = ctx.eval_cache
+
+    # Thế cờ lặp lại (chỉ cần một lần trong nhánh đang tìm), luật 50 nước hoặc không đủ quân chiếu hết:
+    # hòa. Kết quả phụ thuộc đường đi nên kiểm tra trước khi tra TT.
+    if board.repetition_count() >= 2 or board.is_fifty_moves() or board.is_insufficient_material():
+        return DRAW_SCORE
+
     # Nếu đạt độ sâu giới hạn hoặc ván cờ đã kết thúc (chiếu hết, hòa, v.v.)
     # thì trả về giá trị đánh giá của bàn cờ hiện tại
     if depth == 0 or board.is_game_over():
-        return evaluate(board)
+        if depth == 0 and ctx is not None and ctx.quiescence:
+            return quiescence(board, alpha, beta, maximizing, ctx)
+        return eval_cache.evaluate(board) if eval_cache is not None else evaluate(board)
+
+    # Tra transposition table: nếu thế cờ đã được tìm đủ sâu thì dùng lại kết quả
+    hash_move = None
+    if tt is not None:
+        entry = tt.get(board.hash)
+        if entry is not None:
+            tt_depth, tt_value, tt_flag, hash_move = entry
+            if tt_depth >= depth:
+                if tt_flag == EXACT:
+                    return tt_value
+                if tt_flag == LOWER and tt_value >= beta:
+                    return tt_value
+                if tt_flag == UPPER and tt_value <= alpha:
+                    return tt_value
+    alpha_orig, beta_orig = alpha, beta
+    best_move = None
+    ply = board.ply()
+    killers = ctx.killers_at(ply) if ctx is not None else ()
+    defer_losing = ctx is not None and ctx.quiescence
 
     if maximizing:
         # Người chơi MAX muốn tối đa hóa giá trị
         max_eval = float("-inf")
-        for move in board.get_legal_moves():  # Duyệt tất cả các nước đi hợp lệ
+        for move in pick_moves(board, hash_move, killers, defer_losing):  # Duyệt các nước đi theo từng giai đoạn
             board.push_move(move)  # Thực hiện nước đi
-            eval = alpha_beta(board, depth - 1, alpha, beta, False)  # Đệ quy sang lượt MIN
-            board.pop_move()  # Hoàn tác nước đi
-            max_eval = max(max_eval, eval)  # Cập nhật giá trị lớn nhất
+            try:
+                eval = alpha_beta(board, depth - 1, alpha, beta, False, ctx)  # Đệ quy sang lượt MIN
+            finally:
+                board.pop_move()  # Hoàn tác nước đi (kể cả khi tìm kiếm bị dừng)
+            if eval > max_eval:
+                max_eval = eval  # Cập nhật giá trị lớn nhất
+                best_move = move
             alpha = max(alpha, eval)  # Cập nhật ngưỡng alpha (giá trị tốt nhất của MAX)
             if beta <= alpha: # Nếu alpha >= beta thì cắt tỉa (không cần xét thêm các nhánh khác)
+                if ctx is not None and not board.is_capture_or_promotion(move):
+                    ctx.store_killer(ply, move)
                 break
-        return max_eval
+        value = max_eval
 
     else:
         # Người chơi MIN muốn tối thiểu hóa giá trị
         min_eval = float("inf")
-        for move in board.get_legal_moves():  # Duyệt tất cả các nước đi hợp lệ
+        for move in pick_moves(board, hash_move, killers, defer_losing):  # Duyệt các nước đi theo từng giai đoạn
             board.push_move(move)  # Thực hiện nước đi
-            eval = alpha_beta(board, depth - 1, alpha, beta, True)  # Đệ quy sang lượt MAX
-            board.pop_move()  # Hoàn tác nước đi
-            min_eval = min(min_eval, eval)  # Cập nhật giá trị nhỏ nhất
+            try:
+                eval = alpha_beta(board, depth - 1, alpha, beta, True, ctx)  # Đệ quy sang lượt MAX
+            finally:
+                board.pop_move()  # Hoàn tác nước đi (kể cả khi tìm kiếm bị dừng)
+            if eval < min_eval:
+                min_eval = eval  # Cập nhật giá trị nhỏ nhất
+                best_move = move
             beta = min(beta, eval)  # Cập nhật ngưỡng beta (giá trị tốt nhất của MIN)
             if beta <= alpha:  # Nếu beta <= alpha thì cắt tỉa (không cần xét thêm các nhánh khác)
+                if ctx is not None and not board.is_capture_or_promotion(move):
+                    ctx.store_killer(ply, move)
                 break
-        return min_eval
+        value = min_eval
+
+    # Lưu kết quả vào TT cùng loại cận (chính xác / cận dưới / cận trên)
+    if tt is not None and best_move is not None:
+        if value <= alpha_orig:
+            flag = UPPER
+        elif value >= beta_orig:
+            flag = LOWER
+        else:
+            flag = EXACT
+        tt.store(board.hash, depth, value, flag, best_move)
+    return value
+
+
+# Tìm kiếm tĩnh ở lá: chỉ đi tiếp các nước ăn quân / phong tốt không lỗ theo SEE cho tới khi thế cờ yên tĩnh,
+# để không đánh giá giữa chừng một chuỗi đổi quân. Bên đi luôn có thể dừng lại nhận điểm evaluate (stand pat).
+def quiescence(board, alpha, beta, maximizing, ctx: SearchContext) -> int:
+    ctx.tick()
+    stand_pat = ctx.eval_cache.evaluate(board) if ctx.eval_cache is not None else evaluate(board)
+    if board.find_king(board.turn) is None:
+        return stand_pat
+
+    best = stand_pat
+    if maximizing:
+        if best >= beta:
+            return best
+        alpha = max(alpha, best)
+    else:
+        if best <= alpha:
+            return best
+        beta = min(beta, best)
+
+    captures = sorted(board.get_captures(), key=lambda m: mvv_lva(board, m), reverse=True)
+    for move in captures:
+        if is_losing_capture(board, move):
+            continue
+        board.push_move(move)
+        try:
+            eval = quiescence(board, alpha, beta, not maximizing, ctx)
+        finally:
+            board.pop_move()
+        if maximizing:
+            best = max(best, eval)
+            alpha = max(alpha, eval)
+        else:
+            best = min(best, eval)
+            beta = min(beta, eval)
+        if beta <= alpha:
+            break
+    return best
+
@@ -0,0 +1,337 @@
+"""
+Batch position analysis over EPD or PGN files.
+
+    python analyse.py positions.epd results.jsonl --workers 8 --depth 5
+    python analyse.py games.pgn results.epd --format epd --movetime 500
+
+Positions are read as a stream (EPD: one position per line; PGN: the position before every move of
+every game), analysed by AlphaBetaAgent in a process pool with a per-position depth and/or time
+limit, and written in input order, either as JSON lines (score in centipawns from White's view, like
+evaluate()) or as EPD with bm / ce / acd / acn / pv / id opcodes (ce from the side to move, as EPD
+expects).
+
+Every ``--checkpoint-every`` positions the output is flushed and ``<output>.ckpt`` records how many
+positions are done and the output size at that point. Rerunning the same command resumes from the
+last checkpoint: the output is truncated back to the recorded size and the finished positions are
+skipped. A checkpoint is written before the first position, so an existing output without one was not
+produced by this script: the run refuses to touch it unless ``--force`` is given, which overwrites it.
+"""
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import re
+import sys
+import time
+from collections import deque
+from typing import Iterator, Optional, TextIO, Tuple
+
+import profiler
+from agents import AlphaBetaAgent
+from analysis_cache import AnalysisCache
+from my_chess import Board, Color, Move
+
+DEFAULT_DEPTH = 4
+CHECKPOINT_SUFFIX = ".ckpt"
+
+# Các thành phần của phần nước đi trong PGN: chú thích {...} hoặc ;... tới cuối dòng, biến (...), NAG $n,
+# số thứ tự nước "12." / "12...", kết quả ván, và còn lại là nước đi SAN
+PGN_TOKEN = re.compile(r"\{[^}]*\}?|;[^\n]*|\(|\)|\$\d+|\d+\.+|1-0|0-1|1/2-1/2|\*|[^\s{}();$]+")
+PGN_TAG = re.compile(r'^\[(\w+)\s+"(.*)"\]\s*$')
+PGN_RESULTS = ("1-0", "0-1", "1/2-1/2", "*")
+EPD_OPERATION = re.compile(r'\s*(\w+)((?:\s+(?:"[^"]*"|[^\s;]+))*)\s*;')
+
+
+# ---------------- Đọc input ----------------
+# Nước đi ứng với ký hiệu SAN ở thế cờ hiện tại (so khớp với board.san của các nước hợp lệ), None nếu không có
+def parse_san(board: Board, san: str) -> Optional[Move]:
+    san = san.rstrip("+#!?").replace("0-0-0", "O-O-O").replace("0-0", "O-O")
+    match = None
+    for move in board.get_legal_moves():
+        # Lọc nhanh theo ô đích trước khi sinh SAN (board.san phải thử nước để đánh dấu chiếu)
+        if not move.is_castling and move.to_uci()[2:4].lower() not in san:
+            continue
+        if board.san(move).rstrip("+#") != san:
+            continue
+        # Nước giả hợp lệ để vua bị chiếu có thể trùng SAN với nước hợp lệ (quân bị ghim)
+        color = board.turn
+        board.push_move(move)
+        legal = not board.is_check(color)
+        board.pop_move()
+        if legal:
+            return move
+        match = match or move
+    return match
+
+
+# Tách một dòng EPD thành FEN và các operation (giá trị giữ nguyên dạng chuỗi, bỏ dấu ngoặc kép)
+def parse_epd(line: str) -> Tuple[str, dict]:
+    fields = line.split(None, 4)
+    if len(fields) < 4:
+        raise ValueError(f"Invalid EPD: {line!r}")
+    operations = {}
+    for opcode, operands in EPD_OPERATION.findall(fields[4] if len(fields) > 4 else ""):
+        operations[opcode] = operands.strip().strip('"')
+    fen = " ".join(fields[:4] + [operations.get("hmvc", "0"), operations.get("fmvn", "1")])
+    return fen, operations
+
+
+def iter_epd(lines: Iterator[str]) -> Iterator[Tuple[str, str, Optional[str]]]:
+    for number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            fen, operations = parse_epd(line)
+            Board.from_fen(fen)
+        except ValueError as e:
+            print(f"line {number}: {e}, skipped", file=sys.stderr)
+            continue
+        yield operations.get("id", f"line {number}"), fen, None
+
+
+# Các ván trong PGN: (tags, danh sách token nước đi SAN của biến chính)
+def iter_pgn_games(lines: Iterator[str]) -> Iterator[Tuple[dict, list]]:
+    tags, moves, text = {}, [], ""
+    for line in lines:
+        stripped = line.strip()
+        tag = PGN_TAG.match(stripped) if not text else None
+        if tag:
+            if moves:  # ván trước không có kết quả ở cuối
+                yield tags, moves
+                tags, moves = {}, []
+            tags[tag.group(1)] = tag.group(2)
+            continue
+        text += line
+        # Chú thích {...} có thể kéo dài qua nhiều dòng: đợi đọc hết rồi mới tách token
+        if text.count("{") > text.count("}"):
+            continue
+
+        depth, finished = 0, False
+        for token in PGN_TOKEN.findall(text):
+            if token == "(":
+                depth += 1
+            elif token == ")":
+                depth = max(0, depth - 1)
+            elif depth or token[0] in "{;$" or token[0].isdigit() and token.endswith("."):
+                continue
+            elif token in PGN_RESULTS:
+                finished = True
+            else:
+                moves.append(token)
+        text = ""
+        if finished:
+            yield tags, moves
+            tags, moves = {}, []
+    if moves:
+        yield tags, moves
+
+
+def iter_pgn(lines: Iterator[str]) -> Iterator[Tuple[str, str, Optional[str]]]:
+    for number, (tags, moves) in enumerate(iter_pgn_games(lines), start=1):
+        try:
+            board = Board.from_fen(tags["FEN"]) if "FEN" in tags else Board()
+        except ValueError as e:
+            print(f"game {number}: {e}, skipped", file=sys.stderr)
+            continue
+        for ply, san in enumerate(moves, start=1):
+            move = parse_san(board, san)
+            if move is None:
+                print(f"game {number} ply {ply}: illegal move {san!r}, rest of game skipped", file=sys.stderr)
+                break
+            yield f"game {number} ply {ply}", board.fen(), san
+            board.push_move(move)
+
+
+# Dòng input -> (id, FEN, nước đã đi trong ván hoặc None)
+def iter_positions(path: str) -> Iterator[Tuple[str, str, Optional[str]]]:
+    with (sys.stdin if path == "-" else open(path)) as f:
+        yield from (iter_pgn(f) if is_pgn(path) else iter_epd(f))
+
+
+def is_pgn(path: str) -> bool:
+    return path.lower().endswith(".pgn")
+
+
+# Đếm số thế cờ để tính ETA (không dựng lại bàn cờ nên nhanh hơn nhiều so với đọc thật)
+def count_positions(path: str) -> Optional[int]:
+    if path == "-":
+        return None
+    with open(path) as f:
+        if is_pgn(path):
+            return sum(len(moves) for _, moves in iter_pgn_games(f))
+        return sum(1 for line in f if line.strip() and not line.lstrip().startswith("#"))
+
+
+# ---------------- Worker ----------------
+_agent: Optional[AlphaBetaAgent] = None
+_limits: Tuple[Optional[int], Optional[float]] = (None, None)
+
+
+def _init_worker(depth: Optional[int], movetime: Optional[float], tt_size: int,
+                 cache: Optional[AnalysisCache] = None):
+    global _agent, _limits
+    _agent = AlphaBetaAgent("analyse", Color.WHITE, depth=depth or DEFAULT_DEPTH, tt_size=tt_size, cache=cache)
+    _limits = (depth, movetime)
+
+
+def analyse_position(position_id: str, fen: str, played: Optional[str]) -> dict:
+    board = Board.from_fen(fen)
+    depth, movetime = _limits
+    _agent.color = board.turn
+    move = _agent.search(board, depth=depth, movetime=movetime)
+    info = _agent.last_info
+    result = {
+        "id": position_id,
+        "fen": fen,
+        "move": move.to_uci().lower() if move else None,
+        "san": board.san(move) if move else None,
+        "score": info.get("score"),
+        "depth": info.get("depth", 0),
+        "nodes": info.get("nodes", 0),
+        "time": round(info.get("time", 0.0), 4),
+        "pv": [m.to_uci().lower() for m in info.get("pv", [])],
+    }
+    if played is not None:
+        result["played"] = played
+    return result
+
+
+# ---------------- Output ----------------
+def format_epd(result: dict) -> str:
+    fields = result["fen"].split()[:4]
+    operations = []
+    if result["san"]:
+        operations.append(f"bm {result['san']}")
+    if result["score"] is not None:
+        # ce theo bên đang đi, score theo bên trắng
+        operations.append(f"ce {result['score'] if fields[1] == 'w' else -result['score']}")
+    operations.append(f"acd {result['depth']}")
+    operations.append(f"acn {result['nodes']}")
+    if result["pv"]:
+        operations.append(f"pv {' '.join(result['pv'])}")
+    if result.get("played"):
+        operations.append(f"pm {result['played']}")
+    operations.append(f'id "{result["id"]}"')
+    return " ".join(fields) + " " + " ".join(op + ";" for op in operations)
+
+
+def write_result(out: TextIO, result: dict, fmt: str):
+    out.write((format_epd(result) if fmt == "epd" else json.dumps(result)) + "\n")
+
+
+# ---------------- Checkpoint ----------------
+def load_checkpoint(output: str, settings: dict) -> int:
+    path = output + CHECKPOINT_SUFFIX
+    if not os.path.exists(path) or not os.path.exists(output):
+        return 0
+    with open(path) as f:
+        state = json.load(f)
+    if state["settings"] != settings:
+        raise SystemExit(f"{path} was written with different settings {state['settings']}; "
+                         f"delete it to start over")
+    # Bỏ phần output được ghi sau checkpoint cuối (các thế cờ đó sẽ được phân tích lại)
+    with open(output, "r+b") as f:
+        f.truncate(state["offset"])
+    return state["done"]
+
+
+def save_checkpoint(out: TextIO, output: str, settings: dict, done: int):
+    out.flush()
+    os.fsync(out.fileno())
+    path = output + CHECKPOINT_SUFFIX
+    with open(path + ".tmp", "w") as f:
+        json.dump({"settings": settings, "done": done, "offset": out.tell()}, f)
+    os.replace(path + ".tmp", path)
+
+
+def _format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
+
+
+# ---------------- Main loop ----------------
+def run(input_path: str, output: str, workers: int, depth: Optional[int] = None, movetime: Optional[float] = None,
+        fmt: str = "jsonl", tt_size: int = 1 << 18, checkpoint_every: int = 100, report_every: float = 10.0,
+        cache: Optional[AnalysisCache] = None, force: bool = False):
+    if depth is None and movetime is None:
+        depth = DEFAULT_DEPTH
+    settings = {"input": os.path.abspath(input_path) if input_path != "-" else "-",
+                "depth": depth, "movetime": movetime, "format": fmt}
+    skip = load_checkpoint(output, settings)
+    if (not os.path.exists(output + CHECKPOINT_SUFFIX) and os.path.exists(output)
+            and os.path.getsize(output) and not force):
+        raise SystemExit(f"{output} exists but has no checkpoint; use --force to overwrite it")
+    total = count_positions(input_path)
+    if skip:
+        print(f"resuming after {skip} positions")
+
+    positions = iter_positions(input_path)
+    for _ in range(skip):
+        next(positions, None)
+
+    done = skip
+    analysed = 0
+    started = last_report = time.perf_counter()
+    # Giới hạn số việc đang chờ để đọc input theo luồng, kết quả được ghi đúng thứ tự input
+    window = workers * 4
+    pending = deque()
+    # Chạy lại từ đầu thì ghi đè output, nếu không kết quả cũ sẽ bị lặp lại
+    with open(output, "a" if skip else "w") as out, mp.Pool(workers, initializer=_init_worker,
+                                           initargs=(depth, movetime, tt_size, cache)) as pool:
+        save_checkpoint(out, output, settings, done)
+        while True:
+            while len(pending) < window:
+                position = next(positions, None)
+                if position is None:
+                    break
+                pending.append(pool.apply_async(analyse_position, position))
+            if not pending:
+                break
+
+            write_result(out, pending.popleft().get(), fmt)
+            done += 1
+            analysed += 1
+            if done % checkpoint_every == 0:
+                save_checkpoint(out, output, settings, done)
+
+            now = time.perf_counter()
+            if now - last_report >= report_every:
+                last_report = now
+                rate = analysed / (now - started)
+                progress = f"{done}/{total}" if total else f"{done}"
+                eta = f", ETA {_format_duration((total - done) / rate)}" if total and rate else ""
+                print(f"{progress} positions, {rate:.1f} pos/s{eta}", flush=True)
+        save_checkpoint(out, output, settings, done)
+
+    elapsed = time.perf_counter() - started
+    print(f"done: {analysed} positions analysed in {_format_duration(elapsed)} "
+          f"({analysed / elapsed if elapsed else 0:.1f} pos/s), {done} in {output}")
+
+
+def main():
+    profiler.enable_from_env()
+    parser = argparse.ArgumentParser(description="Analyse every position of an EPD or PGN file")
+    parser.add_argument("input", help=".epd / .pgn file, or - for EPD on stdin")
+    parser.add_argument("output")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--depth", type=int, help=f"search depth per position (default {DEFAULT_DEPTH} "
+                                                  f"when no --movetime)")
+    parser.add_argument("--movetime", type=float, help="time per position in ms")
+    parser.add_argument("--format", choices=("jsonl", "epd"), default="jsonl")
+    parser.add_argument("--tt-size", type=int, default=1 << 18, help="transposition table entries per worker")
+    parser.add_argument("--checkpoint-every", type=int, default=100, help="positions between checkpoints")
+    parser.add_argument("--report-every", type=float, default=10.0, help="seconds between progress lines")
+    parser.add_argument("--cache", help="sqlite analysis cache shared across workers and runs")
+    parser.add_argument("--cache-size", type=int, default=1_000_000, help="max cached positions")
+    parser.add_argument("--force", action="store_true", help="overwrite an existing output that has no checkpoint")
+    args = parser.parse_args()
+    cache = AnalysisCache(args.cache, args.cache_size, min_depth=args.depth or DEFAULT_DEPTH) if args.cache else None
+    run(args.input, args.output, args.workers, args.depth, args.movetime, args.format, args.tt_size,
+        args.checkpoint_every, args.report_every, cache, args.force)
+
+
+if __name__ == "__main__":
+    main()
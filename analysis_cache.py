@@ -0,0 +1,120 @@
+"""
+Persistent analysis cache: position hash -> (depth, score, flag, best move), stored in sqlite.
+
+The database runs in WAL mode, so any number of processes can read while one of them writes
+(sqlite serialises writers; others wait up to ``timeout`` seconds). Scores are from White's point of
+view like evaluate(), flags are the transposition-table bounds (EXACT / LOWER / UPPER) and moves use
+the 16-bit Move.to_code() encoding.
+
+When the table grows past ``max_entries`` the shallowest, oldest entries are evicted down to
+``EVICT_TO`` of the cap.
+
+    cache = AnalysisCache("analysis.sqlite", max_entries=1_000_000, min_depth=4)
+    agent = AlphaBetaAgent("bot", Color.WHITE, depth=5, cache=cache)
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional, Tuple
+
+EVICT_TO = 0.9          # sau khi dọn, giữ lại 90% giới hạn
+EVICT_CHECK_EVERY = 256  # số lần ghi giữa hai lần kiểm tra kích thước
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS positions (
+    hash   INTEGER PRIMARY KEY,
+    depth  INTEGER NOT NULL,
+    score  INTEGER NOT NULL,
+    flag   INTEGER NOT NULL,
+    move   INTEGER,
+    stored REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS positions_age ON positions (depth, stored);
+"""
+
+
+# sqlite chỉ có số nguyên 64 bit có dấu, hash Zobrist là số 64 bit không dấu
+def _to_signed(key: int) -> int:
+    return key - (1 << 64) if key >= 1 << 63 else key
+
+
+class AnalysisCache:
+    def __init__(self, path: str, max_entries: int = 1_000_000, min_depth: int = 4, timeout: float = 30.0):
+        self.path = path
+        self.max_entries = max_entries
+        self.min_depth = min_depth  # chỉ lưu kết quả tìm kiếm từ độ sâu này trở lên
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._local = threading.local()
+        self._connection()  # tạo bảng ngay để lỗi đường dẫn lộ ra sớm
+
+    # Mỗi thread (và mỗi process sau fork) dùng connection riêng
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key: int) -> Optional[Tuple[int, int, int, Optional[int]]]:
+        row = self._connection().execute("SELECT depth, score, flag, move FROM positions WHERE hash = ?",
+                                         (_to_signed(key),)).fetchone()
+        if row is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return row
+
+    # Ghi kết quả, giữ lại entry cũ nếu nó được tìm sâu hơn
+    def put(self, key: int, depth: int, score: int, flag: int, move: Optional[int]):
+        if depth < self.min_depth:
+            return
+        self._connection().execute(
+            "INSERT INTO positions (hash, depth, score, flag, move, stored) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (hash) DO UPDATE SET depth = excluded.depth, score = excluded.score, "
+            "flag = excluded.flag, move = excluded.move, stored = excluded.stored "
+            "WHERE excluded.depth >= positions.depth",
+            (_to_signed(key), depth, int(score), flag, move, time.time()))
+        self._writes += 1
+        if self._writes % EVICT_CHECK_EVERY == 0:
+            self.evict()
+
+    # Xóa các entry nông nhất, cũ nhất khi vượt quá max_entries
+    def evict(self):
+        conn = self._connection()
+        count = conn.execute("SELECT COUNT(*) FROM positions").fetchone()[0]
+        if count <= self.max_entries:
+            return
+        excess = count - int(self.max_entries * EVICT_TO)
+        conn.execute("DELETE FROM positions WHERE hash IN "
+                     "(SELECT hash FROM positions ORDER BY depth, stored LIMIT ?)", (excess,))
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM positions").fetchone()[0]
+
+    def clear(self):
+        self._connection().execute("DELETE FROM positions")
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            conn.close()
+        self._local = threading.local()
+
+    # Connection sqlite không pickle được: khi gửi sang process khác chỉ mang theo cấu hình
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_local"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
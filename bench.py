@@ -0,0 +1,125 @@
+"""
+Benchmarks for the engine's hot paths.
+
+    python bench.py eval [--positions 20000]
+    python bench.py gamelog [--games 2000] [--workers 4]
+"""
+
+import argparse
+import io
+import multiprocessing as mp
+import os
+import random
+import tempfile
+import time
+from typing import List
+
+import profiler
+from my_chess import Board, Color
+
+
+# Sinh các thế cờ ngẫu nhiên bằng cách đi ngẫu nhiên từ thế cờ ban đầu
+def random_positions(count: int, seed: int = 0, max_plies: int = 120) -> List[Board]:
+    rng = random.Random(seed)
+    positions = []
+    board = Board()
+    while len(positions) < count:
+        moves = list(board.get_legal_moves())
+        # Bắt đầu ván mới khi hết nước, mất vua hoặc ngẫu nhiên (độ dài ván trung bình max_plies)
+        if (not moves or board.find_king(Color.WHITE) is None or board.find_king(Color.BLACK) is None
+                or rng.random() < 1 / max_plies):
+            board = Board()
+            continue
+        board.push_move(rng.choice(moves))
+        positions.append(board.copy())
+    return positions
+
+
+def bench_eval(args):
+    from heuristics import evaluate, evaluate_batch, encode_positions
+
+    boards = random_positions(args.positions)
+
+    start = time.perf_counter()
+    expected = [evaluate(board) for board in boards]
+    scalar = time.perf_counter() - start
+
+    codes = encode_positions(boards)
+    start = time.perf_counter()
+    scores = evaluate_batch(codes)
+    batch = time.perf_counter() - start
+
+    mismatches = sum(int(a != b) for a, b in zip(expected, scores.tolist()))
+    print(f"positions:      {len(boards)}")
+    print(f"evaluate:       {len(boards) / scalar:12,.0f} pos/s")
+    print(f"evaluate_batch: {len(boards) / batch:12,.0f} pos/s  ({scalar / batch:.0f}x)")
+    print(f"mismatches:     {mismatches}")
+
+
+# Chơi một ván ngẫu nhiên rồi ghi vào log (chạy trong worker của pool)
+def _log_random_game(path: str, seed: int, max_plies: int) -> int:
+    from gamelog import GameLogWriter, log_board
+
+    rng = random.Random(seed)
+    board = Board()
+    while board.get_result() is None and len(board.move_history()) < max_plies:
+        board.push_move(rng.choice(list(board.get_legal_moves())))
+    with GameLogWriter(path) as writer:
+        log_board(writer, board)
+    return len(board.move_history())
+
+
+def bench_gamelog(args):
+    from gamelog import export_pgn, export_uci, iter_games
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "games.bin")
+        start = time.perf_counter()
+        with mp.Pool(args.workers) as pool:
+            plies = pool.starmap(_log_random_game, [(path, seed, args.max_plies) for seed in range(args.games)])
+        write = time.perf_counter() - start
+        size = os.path.getsize(path)
+
+        start = time.perf_counter()
+        read_games = read_moves = 0
+        for game in iter_games(path):
+            read_games += 1
+            read_moves += len(game)
+        read = time.perf_counter() - start
+        assert read_games == args.games and read_moves == sum(plies), "log lost games"
+
+        exports = {}
+        for name, export in (("uci", export_uci), ("pgn", export_pgn)):
+            start = time.perf_counter()
+            export(iter_games(path), io.StringIO())
+            exports[name] = time.perf_counter() - start
+
+    print(f"games:          {args.games} ({sum(plies) / args.games:.1f} plies/game)")
+    print(f"bytes/game:     {size / args.games:12.1f}  ({size / sum(plies):.2f} bytes/ply)")
+    print(f"play+write:     {args.games / write:12,.0f} games/s  ({args.workers} workers)")
+    print(f"read:           {read_games / read:12,.0f} games/s  ({read_moves / read:,.0f} moves/s)")
+    print(f"export uci:     {args.games / exports['uci']:12,.0f} games/s")
+    print(f"export pgn:     {args.games / exports['pgn']:12,.0f} games/s")
+
+
+def main():
+    profiler.enable_from_env()
+    parser = argparse.ArgumentParser(description="Engine benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("eval", help="evaluate vs evaluate_batch throughput")
+    p.add_argument("--positions", type=int, default=20000)
+    p.set_defaults(func=bench_eval)
+
+    p = sub.add_parser("gamelog", help="game log size and read / export throughput")
+    p.add_argument("--games", type=int, default=2000)
+    p.add_argument("--workers", type=int, default=4)
+    p.add_argument("--max-plies", type=int, default=200)
+    p.set_defaults(func=bench_gamelog)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
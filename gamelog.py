@@ -0,0 +1,187 @@
+"""
+Compact append-only game log.
+
+File layout: an 8-byte file header (MAGIC + version), then one record per game:
+
+    <H n_moves> <b result> <B flags> <H fen_length> [start FEN, ascii] [n_moves x <H move code>]
+
+Moves use the 16-bit Move.to_code() encoding, so a typical game costs 6 + 2 * plies bytes.
+GameLogWriter appends each game with a single write under an exclusive file lock, so any number of
+threads and processes can share one log. iter_games() reads lazily through mmap; export_uci() and
+export_pgn() stream to a text file one game at a time.
+
+    python gamelog.py pgn games.bin games.pgn
+    python gamelog.py uci games.bin games.txt
+"""
+
+import argparse
+import fcntl
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+from typing import Iterable, Iterator, Optional, TextIO
+
+from my_chess import Board, Color, Move
+from my_chess.board import STARTING_FEN
+
+MAGIC = b"ACGL"
+VERSION = 1
+FILE_HEADER = struct.Struct("<4sB3x")
+GAME_HEADER = struct.Struct("<HbBH")
+
+FLAG_FEN = 1  # ván bắt đầu từ một thế cờ khác thế cờ ban đầu
+
+RESULT_CODES = {"WHITE_WIN": 1, "BLACK_WIN": -1, "DRAW": 0, None: -128}
+RESULT_NAMES = {code: name for name, code in RESULT_CODES.items()}
+PGN_RESULTS = {"WHITE_WIN": "1-0", "BLACK_WIN": "0-1", "DRAW": "1/2-1/2", None: "*"}
+
+
+class GameRecord:
+    def __init__(self, result: Optional[str], moves: array, start_fen: Optional[str] = None):
+        self.result = result
+        self.moves = moves            # array('H') các mã nước đi 16 bit
+        self.start_fen = start_fen    # None = thế cờ ban đầu
+
+    def __len__(self) -> int:
+        return len(self.moves)
+
+    def board(self) -> Board:
+        return Board.from_fen(self.start_fen) if self.start_fen else Board()
+
+    # Lần lượt trả về (board trước nước đi, nước đi); board là cùng một đối tượng được cập nhật tại chỗ
+    def replay(self) -> Iterator[tuple]:
+        board = self.board()
+        for code in self.moves:
+            move = Move.from_code(code, board.turn == Color.WHITE)
+            yield board, move
+            board.push_move(move)
+
+
+def encode_game(moves: Iterable[Move], result: Optional[str], start_fen: Optional[str] = None) -> bytes:
+    codes = array("H", (move.to_code() for move in moves))
+    fen = start_fen.encode("ascii") if start_fen and start_fen != STARTING_FEN else b""
+    if len(codes) > 0xFFFF:
+        raise ValueError("game too long for the log format")
+    if sys.byteorder == "big":
+        codes.byteswap()
+    header = GAME_HEADER.pack(len(codes), RESULT_CODES[result], FLAG_FEN if fen else 0, len(fen))
+    return header + fen + codes.tobytes()
+
+
+class GameLogWriter:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        # O_APPEND: mỗi lần write ghi nguyên khối vào cuối file, kể cả khi nhiều process cùng ghi
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def write(self, moves: Iterable[Move], result: Optional[str], start_fen: Optional[str] = None):
+        self.write_encoded(encode_game(moves, result, start_fen))
+
+    def write_encoded(self, record: bytes):
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                if os.fstat(self._fd).st_size == 0:
+                    record = FILE_HEADER.pack(MAGIC, VERSION) + record
+                os.write(self._fd, record)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Ghi lại một ván đã chơi xong trên board (lấy các nước đi từ stack của board)
+def log_board(writer: GameLogWriter, board: Board, start_fen: Optional[str] = None):
+    writer.write(board.move_history(), board.get_result(), start_fen)
+
+
+def iter_games(path: str) -> Iterator[GameRecord]:
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            magic, version = FILE_HEADER.unpack_from(data, 0)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path}: not a game log (version {VERSION})")
+            offset = FILE_HEADER.size
+            swap = sys.byteorder == "big"
+            while offset + GAME_HEADER.size <= len(data):
+                n_moves, result, flags, fen_length = GAME_HEADER.unpack_from(data, offset)
+                offset += GAME_HEADER.size
+                start_fen = None
+                if flags & FLAG_FEN:
+                    start_fen = data[offset:offset + fen_length].decode("ascii")
+                offset += fen_length
+                moves = array("H")
+                moves.frombytes(data[offset:offset + 2 * n_moves])
+                if swap:
+                    moves.byteswap()
+                offset += 2 * n_moves
+                yield GameRecord(RESULT_NAMES.get(result), moves, start_fen)
+
+
+# ---------------- Export ----------------
+def export_uci(games: Iterable[GameRecord], out: TextIO):
+    for game in games:
+        moves = " ".join(Move.from_code(code).to_uci().lower() for code in game.moves)
+        prefix = f"fen {game.start_fen} " if game.start_fen else ""
+        out.write(f"{prefix}{moves} {PGN_RESULTS[game.result]}\n")
+
+
+def export_pgn(games: Iterable[GameRecord], out: TextIO, event: str = "agent-chess"):
+    for number, game in enumerate(games, start=1):
+        result = PGN_RESULTS[game.result]
+        out.write(f'[Event "{event}"]\n[Round "{number}"]\n[White "?"]\n[Black "?"]\n[Result "{result}"]\n')
+        if game.start_fen:
+            out.write(f'[SetUp "1"]\n[FEN "{game.start_fen}"]\n')
+        out.write("\n")
+
+        tokens = []
+        for board, move in game.replay():
+            ply = board.ply()
+            if ply % 2 == 0:
+                tokens.append(f"{ply // 2 + 1}.")
+            elif not tokens:
+                tokens.append(f"{ply // 2 + 1}...")
+            tokens.append(board.san(move))
+        tokens.append(result)
+
+        # Xuống dòng khoảng 80 ký tự như PGN thông thường
+        line = ""
+        for token in tokens:
+            if line and len(line) + 1 + len(token) > 80:
+                out.write(line + "\n")
+                line = token
+            else:
+                line = f"{line} {token}" if line else token
+        out.write(line + "\n\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a binary game log")
+    parser.add_argument("format", choices=("pgn", "uci"))
+    parser.add_argument("log")
+    parser.add_argument("out")
+    args = parser.parse_args()
+    with open(args.out, "w") as out:
+        if args.format == "pgn":
+            export_pgn(iter_games(args.log), out)
+        else:
+            export_uci(iter_games(args.log), out)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,16 @@
+import importlib
+import threading
+from array import array
 from collections import defaultdict
 from typing import Tuple
 
 from my_chess import PieceType, Color
 
+try:
+    import numpy as np
+except ImportError:  # numpy chỉ cần cho evaluate_batch
+    np = None
+
 WIN_SCORE = 1_000_000
 DRAW_SCORE = 0
 
@@ -101,6 +109,29 @@ EXTENDED_CENTER = {
     (2, 4), (5, 4),                   # c5, f5
     (2, 5), (3, 5), (4, 5), (5, 5)    # c6, d6, e6, f6
 }
+CENTER_BONUS = 20
+EXTENDED_CENTER_BONUS = 10
+
+# --- Cấu trúc tốt ---
+DOUBLED_PAWN_PENALTY = 10
+ISOLATED_PAWN_PENALTY = 15
+
+# --- An toàn của vua ---
+CASTLED_KING_BONUS = 30
+PAWN_SHIELD_BONUS = 10
+PAWN_SHIELD_MISSING_PENALTY = 5
+MISSING_KING_PENALTY = 100000
+
+# Các hằng số vô hướng có thể được tune (xem tuner.py / load_params)
+TUNABLE_CONSTANTS = (
+    "CENTER_BONUS",
+    "EXTENDED_CENTER_BONUS",
+    "DOUBLED_PAWN_PENALTY",
+    "ISOLATED_PAWN_PENALTY",
+    "CASTLED_KING_BONUS",
+    "PAWN_SHIELD_BONUS",
+    "PAWN_SHIELD_MISSING_PENALTY",
+)
 
 
 
@@ -116,7 +147,7 @@ def pst_value(piece, file, rank) -> int:
 
 def king_safety_value(pos, color: Color, pawns) -> int: # pieces là ds (piece, (file, rank))
     if pos is None:
-        return -100000
+        return -MISSING_KING_PENALTY
 
     kf, kr = pos
     score = 0
@@ -124,10 +155,10 @@ def king_safety_value(pos, color: Color, pawns) -> int: # pieces là ds (piece,
     # Thưởng nhập thành
     if color == Color.WHITE:
         if (kf, kr) in ((6, 0), (2, 0)):
-            score += 30
+            score += CASTLED_KING_BONUS
     else:
         if (kf, kr) in ((6, 7), (2, 7)):
-            score += 30
+            score += CASTLED_KING_BONUS
 
     # Pawn shield
     direction = 1 if color == Color.WHITE else -1
@@ -135,9 +166,9 @@ def king_safety_value(pos, color: Color, pawns) -> int: # pieces là ds (piece,
         nx, ny = kf + dx, kr + direction
         if 0 <= nx < 8 and 0 <= ny < 8:
             if (nx, ny) in pawns:
-                score += 10
+                score += PAWN_SHIELD_BONUS
             else:
-                score -= 5
+                score -= PAWN_SHIELD_MISSING_PENALTY
 
     return score
 
@@ -170,11 +201,11 @@ def evaluate(board: 'Board') -> int:
 
             # Nếu quân đứng trên ô trung tâm tuyệt đối
             if (file, rank) in CENTER_SQUARES:
-                score += 20 if is_white else -20
+                score += CENTER_BONUS if is_white else -CENTER_BONUS
 
             # Nếu quân đứng trên trung tâm mở rộng
             elif (file, rank) in EXTENDED_CENTER:
-                score += 10 if is_white else -10
+                score += EXTENDED_CENTER_BONUS if is_white else -EXTENDED_CENTER_BONUS
 
             if p.piece_type == PieceType.KING:
                 if is_white:
@@ -190,13 +221,13 @@ def evaluate(board: 'Board') -> int:
             if is_white:
                 white_pawns.add((file, rank))
                 if file in white_pawn_files:
-                    score -= 10 # Phạt trắng (Tức có lợi cho đen)
+                    score -= DOUBLED_PAWN_PENALTY # Phạt trắng (Tức có lợi cho đen)
                 else:
                     white_pawn_files.add(file)
             else:
                 black_pawns.add((file, rank))
                 if file in black_pawn_files:
-                    score += 10 # Phạt đen (Tức có lợi cho trắng)
+                    score += DOUBLED_PAWN_PENALTY # Phạt đen (Tức có lợi cho trắng)
                 else:
                     black_pawn_files.add(file)
 
@@ -204,11 +235,11 @@ def evaluate(board: 'Board') -> int:
     # Nếu bị cô lập thì trừ 15 điểm
     for file, _ in white_pawns:
         if (file - 1 not in white_pawn_files) and (file + 1 not in white_pawn_files):
-            score -= 15 # Phạt trắng (Tức có lợi cho đen)
+            score -= ISOLATED_PAWN_PENALTY # Phạt trắng (Tức có lợi cho đen)
 
     for file, _ in black_pawns:
         if (file - 1 not in black_pawn_files) and (file + 1 not in black_pawn_files):
-            score += 15 # Phạt đen (Tức có lợi cho trắng)
+            score += ISOLATED_PAWN_PENALTY # Phạt đen (Tức có lợi cho trắng)
 
     score += king_safety_value(white_king, Color.WHITE, white_pawns) - \
             king_safety_value(black_king, Color.BLACK, black_pawns)
@@ -216,3 +247,177 @@ def evaluate(board: 'Board') -> int:
     return score
 
 
+# Tăng mỗi lần load_params để EvalCache bỏ các giá trị tính bằng tham số cũ
+_params_version = 0
+
+
+# Nạp bộ tham số (ví dụ module do tuner.py sinh ra) thay cho các giá trị mặc định.
+# Các bảng được sửa tại chỗ nên mọi nơi đã import PIECE_VALUES / PST đều thấy giá trị mới.
+def load_params(module):
+    global _params_version
+    if isinstance(module, str):
+        module = importlib.import_module(module)
+    PIECE_VALUES.update(module.PIECE_VALUES)
+    for piece_type, table in module.PST.items():
+        PST[piece_type][:] = table
+    for name in TUNABLE_CONSTANTS:
+        globals()[name] = getattr(module, name)
+    _params_version += 1
+
+
+# Cache kết quả evaluate theo Zobrist hash, ánh xạ trực tiếp: mỗi hash chỉ có một ô (hash & mask),
+# entry mới luôn ghi đè entry cũ. Mỗi entry tốn 12 byte (hash 8 byte + điểm 4 byte).
+class EvalCache:
+    def __init__(self, entries: int = 1 << 18):
+        size = 1 << max(0, entries - 1).bit_length()  # làm tròn lên lũy thừa của 2
+        self.mask = size - 1
+        self.keys = array("Q", bytes(8 * size))
+        self.values = array("i", bytes(4 * size))
+        self.hits = 0
+        self.misses = 0
+        self._version = _params_version
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self.mask + 1
+
+    def evaluate(self, board: 'Board') -> int:
+        if self._version != _params_version:
+            self.clear()
+        key = board.hash
+        slot = key & self.mask
+        keys = self.keys
+        if keys[slot] == key:
+            value = self.values[slot]
+            # Đọc lại key: nếu thread khác vừa ghi đè ô này thì value có thể là của thế cờ khác
+            if keys[slot] == key:
+                self.hits += 1
+                return value
+        self.misses += 1
+        value = evaluate(board)
+        # Key và value nằm ở hai mảng: xóa key trước khi ghi value để không ai đọc được cặp lệch nhau
+        with self._lock:
+            keys[slot] = 0
+            self.values[slot] = value
+            keys[slot] = key
+        return value
+
+    # Lock không pickle được (agent có thể được gửi sang worker process)
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def hit_rate(self) -> float:
+        probes = self.hits + self.misses
+        return self.hits / probes if probes else 0.0
+
+    def clear(self):
+        size = self.mask + 1
+        self.keys = array("Q", bytes(8 * size))
+        self.values = array("i", bytes(4 * size))
+        self.hits = self.misses = 0
+        self._version = _params_version
+
+
+# ---------------- Đánh giá hàng loạt bằng NumPy ----------------
+# Mỗi thế cờ là một hàng 64 phần tử int8 (xem Board.piece_codes): ô sq = rank * 8 + file,
+# giá trị = PieceType.value (1..6) cho quân trắng, số âm cho quân đen, 0 là ô trống.
+
+def encode_positions(boards) -> 'np.ndarray':
+    return np.array([board.piece_codes() for board in boards], dtype=np.int8).reshape(-1, 64)
+
+
+# Bảng tra dựng sẵn theo mã quân (chỉ số = code + 6), tính lại mỗi lần gọi nên luôn khớp với hằng số hiện tại
+def _batch_tables():
+    values = np.zeros(13, dtype=np.int64)
+    pst = np.zeros((13, 64), dtype=np.int64)
+    for piece_type in PieceType:
+        code = piece_type.value
+        table = np.array(PST[piece_type], dtype=np.int64)
+        values[6 + code] = PIECE_VALUES[piece_type]
+        values[6 - code] = -PIECE_VALUES[piece_type]
+        pst[6 + code] = table
+        pst[6 - code] = -table[np.arange(64) ^ 56]  # quân đen nhìn bảng theo hàng lật ngược
+
+    center = np.zeros(64, dtype=np.int64)
+    for file, rank in CENTER_SQUARES:
+        center[rank * 8 + file] = CENTER_BONUS
+    for file, rank in EXTENDED_CENTER:
+        center[rank * 8 + file] = EXTENDED_CENTER_BONUS
+    return values, pst, center
+
+
+# 3 ô lá chắn tốt trước vua cho mỗi ô của vua; 64 = ngoài bàn cờ
+def _shield_squares(color: Color) -> 'np.ndarray':
+    direction = 1 if color == Color.WHITE else -1
+    table = np.full((64, 3), 64, dtype=np.int64)
+    for sq in range(64):
+        kf, kr = sq % 8, sq // 8
+        for i, dx in enumerate((-1, 0, 1)):
+            nx, ny = kf + dx, kr + direction
+            if 0 <= nx < 8 and 0 <= ny < 8:
+                table[sq, i] = ny * 8 + nx
+    return table
+
+
+# Số tốt chồng và số tốt cô lập của một bên, cho từng thế cờ
+def pawn_structure_counts(codes: 'np.ndarray', color: Color):
+    sign = 1 if color == Color.WHITE else -1
+    # Đếm tốt theo cột (codes nhìn theo (N, rank, file))
+    pawn_counts = (codes.reshape(-1, 8, 8) == sign * PieceType.PAWN.value).sum(axis=1)
+    doubled = np.maximum(pawn_counts - 1, 0).sum(axis=1)
+    has = pawn_counts > 0
+    left = np.zeros_like(has)
+    left[:, 1:] = has[:, :-1]
+    right = np.zeros_like(has)
+    right[:, :-1] = has[:, 1:]
+    isolated = (pawn_counts * (~left & ~right)).sum(axis=1)
+    return doubled, isolated
+
+
+# Các thành phần an toàn của vua: (có vua, đã nhập thành, số ô lá chắn có tốt, số ô lá chắn trống)
+def king_safety_counts(codes: 'np.ndarray', color: Color):
+    sign = 1 if color == Color.WHITE else -1
+    kings = codes == sign * PieceType.KING.value
+    has_king = kings.any(axis=1)
+    king_sq = kings.argmax(axis=1)
+
+    castled = np.isin(king_sq, (6, 2) if color == Color.WHITE else (62, 58))
+
+    # Thêm cột 64 (luôn False) để tra các ô lá chắn nằm ngoài bàn cờ
+    own_pawns = np.zeros((codes.shape[0], 65), dtype=bool)
+    own_pawns[:, :64] = codes == sign * PieceType.PAWN.value
+    squares = _shield_squares(color)[king_sq]                    # (N, 3)
+    on_board = (squares < 64).sum(axis=1)
+    hits = np.take_along_axis(own_pawns, squares, axis=1).sum(axis=1)
+    return has_king, castled, hits, on_board - hits
+
+
+def _king_safety_batch(codes: 'np.ndarray', color: Color) -> 'np.ndarray':
+    has_king, castled, hits, misses = king_safety_counts(codes, color)
+    score = CASTLED_KING_BONUS * castled + PAWN_SHIELD_BONUS * hits - PAWN_SHIELD_MISSING_PENALTY * misses
+    return np.where(has_king, score, -MISSING_KING_PENALTY)
+
+
+# Đánh giá N thế cờ cùng lúc, cho kết quả giống hệt evaluate(board) cho từng thế cờ
+def evaluate_batch(positions) -> 'np.ndarray':
+    if np is None:
+        raise ImportError("evaluate_batch requires numpy")
+    codes = np.asarray(positions, dtype=np.int8).reshape(-1, 64)
+    index = codes.astype(np.int64) + 6
+    values, pst, center = _batch_tables()
+
+    score = values[index].sum(axis=1)
+    score += pst[index, np.arange(64)].sum(axis=1)
+    score += (np.sign(codes) * center).sum(axis=1)
+
+    for color, sign in ((Color.WHITE, 1), (Color.BLACK, -1)):
+        doubled, isolated = pawn_structure_counts(codes, color)
+        score -= sign * (DOUBLED_PAWN_PENALTY * doubled + ISOLATED_PAWN_PENALTY * isolated)
+        score += sign * _king_safety_batch(codes, color)
+    return score
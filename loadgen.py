@@ -0,0 +1,96 @@
+"""
+Local load generator for server.py: many concurrent clients playing random legal moves.
+
+    python server.py --workers 4 &
+    python loadgen.py --clients 32 --games 2 --depth 2
+
+Prints client-side p50/p99 move latency and throughput, then the server's own stats.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import List
+
+from my_chess import Board
+
+
+async def request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, payload: dict) -> dict:
+    writer.write(json.dumps(payload).encode() + b"\n")
+    await writer.drain()
+    return json.loads(await reader.readline())
+
+
+# Chọn ngẫu nhiên một nước hợp lệ (không để vua mình bị chiếu)
+def random_legal_move(board: Board):
+    color = board.turn
+    moves = list(board.get_legal_moves())
+    random.shuffle(moves)
+    for move in moves:
+        board.push_move(move)
+        ok = not board.is_check(color)
+        board.pop_move()
+        if ok:
+            return move
+    return None
+
+
+async def client(host: str, port: int, games: int, depth: int, max_plies: int, latencies: List[float]):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for _ in range(games):
+            state = await request(reader, writer, {"op": "new", "color": "white", "depth": depth})
+            game_id = state["game"]
+            board = Board()
+            for _ in range(max_plies):
+                move = random_legal_move(board)
+                if move is None:
+                    break
+                started = time.perf_counter()
+                state = await request(reader, writer, {"op": "move", "game": game_id, "move": move.to_uci().lower()})
+                latencies.append(time.perf_counter() - started)
+                if "error" in state:
+                    break
+                board = Board()
+                for uci in state["moves"]:
+                    board.push_move(board.move_from_uci(uci))
+                if state["result"] is not None:
+                    break
+            await request(reader, writer, {"op": "close", "game": game_id})
+    finally:
+        writer.close()
+
+
+async def run(args):
+    latencies: List[float] = []
+    started = time.perf_counter()
+    await asyncio.gather(*(client(args.host, args.port, args.games, args.depth, args.max_plies, latencies)
+                           for _ in range(args.clients)))
+    elapsed = time.perf_counter() - started
+
+    ordered = sorted(latencies) or [0.0]
+    p50 = ordered[len(ordered) // 2]
+    p99 = ordered[min(len(ordered) - 1, int(0.99 * len(ordered)))]
+    print(f"client: {len(latencies)} moves in {elapsed:.1f}s, "
+          f"p50 {p50 * 1000:.1f} ms, p99 {p99 * 1000:.1f} ms, {len(latencies) / elapsed:.1f} moves/s")
+
+    reader, writer = await asyncio.open_connection(args.host, args.port)
+    print("server:", await request(reader, writer, {"op": "stats"}))
+    writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load generator for server.py")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--games", type=int, default=1, help="games per client")
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--max-plies", type=int, default=20, help="human moves per game")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,20 @@
 """
 Pygame GUI: Human (White) vs Agent (Black)
 Structure: clean, modular, UI on the right, piece images with fallback to text.
+
+Importing this module does not touch the display: pygame is initialised by init_display().
+Piece images are scaled once per square size into a sprite atlas cached on disk (ATLAS_DIR).
 """
 
 import os
 import sys
 import time
 import pygame
-from typing import Optional, Tuple, Dict
+from typing import Optional, Tuple, Dict, List
 
 # Adjust imports to match your package layout
 try:
-    from my_chess import Board, Color, PieceType
+    from my_chess import Board, Color, PieceType, Move
     from my_chess.piece import PIECE_TO_SYMBOL
     from agents import RandomAgent, MinimaxAgent, AlphaBetaAgent
 except Exception as e:
@@ -36,15 +39,39 @@ TEXT_COLOR = (30, 30, 30)
 RESULT_COLOR = (200, 30, 30)
 
 IMAGES_DIR = "images"      # folder with Chess_klt60.png etc.
+ATLAS_DIR = os.path.join(IMAGES_DIR, ".cache")   # scaled sprite atlases, one file per SQUARE_SIZE
+MIN_SQUARE_SIZE = 32
 
 # ---------------- Pygame init ----------------
-pygame.init()
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Chess - Human vs Agent")
-clock = pygame.time.Clock()
-FONT_LG = pygame.font.SysFont(None, 36)
-FONT_MD = pygame.font.SysFont(None, 20)
-FONT_SM = pygame.font.SysFont(None, 16)
+# Created by init_display(), not at import time
+screen: Optional[pygame.Surface] = None
+clock: Optional[pygame.time.Clock] = None
+FONT_LG: Optional[pygame.font.Font] = None
+FONT_MD: Optional[pygame.font.Font] = None
+FONT_SM: Optional[pygame.font.Font] = None
+
+
+def init_display():
+    global screen, clock, FONT_LG, FONT_MD, FONT_SM
+    pygame.display.init()
+    pygame.font.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.RESIZABLE)
+    pygame.display.set_caption("Chess - Human vs Agent")
+    clock = pygame.time.Clock()
+    FONT_LG = pygame.font.SysFont(None, 36)
+    FONT_MD = pygame.font.SysFont(None, 20)
+    FONT_SM = pygame.font.SysFont(None, 16)
+
+
+def resize(width: int, height: int):
+    # keep the board square: the largest multiple of 8 that fits next to the UI panel
+    global BOARD_SIZE, WIDTH, HEIGHT, SQUARE_SIZE, screen
+    SQUARE_SIZE = max(MIN_SQUARE_SIZE, min(width - UI_WIDTH, height) // 8)
+    BOARD_SIZE = SQUARE_SIZE * 8
+    WIDTH, HEIGHT = BOARD_SIZE + UI_WIDTH, BOARD_SIZE
+    screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.RESIZABLE)
+    load_images()
+    build_layers()
 
 # ---------------- Agents map ----------------
 AGENTS = {
@@ -54,15 +81,18 @@ AGENTS = {
 }
 
 # ---------------- Globals (game state) ----------------
-PIECE_IMAGES: Dict[str, pygame.Surface] = {}       # keyed by symbol like 'K' or 'k'
-SCALED_CACHE: Dict[str, pygame.Surface] = {}       # cached scaled images to SQUARE_SIZE
+ATLAS: Optional[pygame.Surface] = None             # all piece sprites scaled to SQUARE_SIZE, side by side
+ATLAS_RECTS: Dict[str, pygame.Rect] = {}           # symbol like 'K' or 'k' -> area of ATLAS (missing image -> absent)
 board: Board
 agent = None
 HUMAN_COLOR = Color.WHITE
 agent_mode = "alpha-beta-pruning"
 selected_sq = None
-legal_moves_cache = []
+legal_moves_cache: Dict[Tuple[int, int], Move] = {}   # to-square -> move for the selected piece
+legal_index: Dict[Tuple[int, int], Dict[Tuple[int, int], Move]] = {}   # from -> to -> move
+legal_index_key: Optional[int] = None                 # position hash legal_index was built for
 last_ai_time = 0.0
+ponder_enabled = True      # search on the human's time (agents exposing start_ponder only)
 
 
 # ---------------- Utilities ----------------
@@ -86,41 +116,98 @@ def all_legal_moves(bd: Board):
     return list(bd.get_legal_moves())
 
 
+def legal_move_index(bd: Board) -> Dict[Tuple[int, int], Dict[Tuple[int, int], Move]]:
+    # from-square -> {to-square: move} for the side to move, self-check filtered.
+    # Built once per position: keyed by the position hash, so any push/pop/undo invalidates it.
+    global legal_index, legal_index_key
+    if legal_index_key == bd.hash:
+        return legal_index
+    color = bd.turn
+    index: Dict[Tuple[int, int], Dict[Tuple[int, int], Move]] = {}
+    for mv in all_legal_moves(bd):
+        bd.push_move(mv)
+        ok = not bd.is_check(color)
+        bd.pop_move()
+        if ok:
+            # first generated promotion (queen) wins when several moves share a target
+            index.setdefault(mv.from_pos, {}).setdefault(mv.to_pos, mv)
+    legal_index, legal_index_key = index, bd.hash
+    return index
+
+
 # ---------------- Image loading ----------------
-def load_images():
-    PIECE_IMAGES.clear()
-    SCALED_CACHE.clear()
+def piece_image_paths() -> List[Tuple[str, str]]:
+    # (symbol, path) in atlas order, e.g. ('K', 'images/Chess_klt60.png')
+    paths = []
     for color in list(Color):
         for ptype in list(PieceType):
             symbol = PIECE_TO_SYMBOL[(ptype, color)]  # e.g. 'K' or 'k'
             file_sym = symbol.lower()
             color_suffix = "d" if color == Color.BLACK else "l"
-            filename = f"Chess_{file_sym}{color_suffix}t60.png"
-            path = os.path.join(IMAGES_DIR, filename)
-            try:
-                img = pygame.image.load(path).convert_alpha()
-                PIECE_IMAGES[symbol] = img
-            except Exception:
-                # missing image -> don't crash; fallback will render letter
-                print(f"Warning: missing image '{path}', using text fallback.")
-                PIECE_IMAGES[symbol] = None
-
-
-def get_scaled_image(symbol: str):
-    # return cached scaled image or scale and cache
-    if symbol in SCALED_CACHE:
-        return SCALED_CACHE[symbol]
-    img = PIECE_IMAGES.get(symbol)
-    if img:
-        scaled = pygame.transform.smoothscale(img, (SQUARE_SIZE, SQUARE_SIZE))
-        SCALED_CACHE[symbol] = scaled
-        return scaled
-    return None
+            paths.append((symbol, os.path.join(IMAGES_DIR, f"Chess_{file_sym}{color_suffix}t60.png")))
+    return paths
+
+
+def build_atlas(paths: List[Tuple[str, str]]) -> Tuple[pygame.Surface, List[str]]:
+    # scale every piece image once into one strip; returns the atlas and the symbols that have an image
+    atlas = pygame.Surface((SQUARE_SIZE * len(paths), SQUARE_SIZE), pygame.SRCALPHA)
+    present = []
+    for i, (symbol, path) in enumerate(paths):
+        try:
+            img = pygame.image.load(path).convert_alpha()
+        except Exception:
+            # missing image -> don't crash; fallback will render letter
+            print(f"Warning: missing image '{path}', using text fallback.")
+            continue
+        atlas.blit(pygame.transform.smoothscale(img, (SQUARE_SIZE, SQUARE_SIZE)), (i * SQUARE_SIZE, 0))
+        present.append(symbol)
+    return atlas, present
+
+
+def load_images():
+    # load the atlas for the current SQUARE_SIZE from disk, rebuilding it when missing or older than the PNGs
+    global ATLAS
+    paths = piece_image_paths()
+    present = [symbol for symbol, path in paths if os.path.exists(path)]
+    atlas_path = os.path.join(ATLAS_DIR, f"atlas_{SQUARE_SIZE}.png")
+    # the folder's mtime changes when an image is added or removed
+    sources = [IMAGES_DIR] + [path for symbol, path in paths if symbol in present]
+    newest = max((os.path.getmtime(path) for path in sources if os.path.exists(path)), default=0)
+
+    ATLAS = None
+    if os.path.exists(atlas_path) and os.path.getmtime(atlas_path) >= newest:
+        try:
+            ATLAS = pygame.image.load(atlas_path).convert_alpha()
+        except pygame.error:
+            ATLAS = None
+    if ATLAS is None:
+        ATLAS, present = build_atlas(paths)
+        try:
+            os.makedirs(ATLAS_DIR, exist_ok=True)
+            pygame.image.save(ATLAS, atlas_path)
+        except (OSError, pygame.error) as e:
+            print(f"Warning: could not cache sprite atlas '{atlas_path}': {e}")
+
+    ATLAS_RECTS.clear()
+    for i, (symbol, _) in enumerate(paths):
+        if symbol in present:
+            ATLAS_RECTS[symbol] = pygame.Rect(i * SQUARE_SIZE, 0, SQUARE_SIZE, SQUARE_SIZE)
 
 
 # ---------------- Game functions ----------------
+def stop_pondering():
+    if hasattr(agent, "stop_ponder"):
+        agent.stop_ponder()
+
+
+def start_pondering():
+    if ponder_enabled and hasattr(agent, "start_ponder") and not board.is_game_over():
+        agent.start_ponder(board)
+
+
 def new_game(mode: str = "alpha-beta-pruning"):
     global board, agent, HUMAN_COLOR, agent_mode, selected_sq, legal_moves_cache, last_ai_time
+    stop_pondering()
     board = Board()
     HUMAN_COLOR = Color.WHITE
     AgentClass = AGENTS.get(mode, MinimaxAgent)
@@ -133,103 +220,161 @@ def new_game(mode: str = "alpha-beta-pruning"):
         agent = AgentClass("Bot", Color.BLACK)
     agent_mode = mode
     selected_sq = None
-    legal_moves_cache = []
+    legal_moves_cache = {}
     last_ai_time = 0.0
 
 
 def try_undo_pair():
     # undo up to two moves if possible
+    global selected_sq, legal_moves_cache
+    stop_pondering()
+    selected_sq = None
+    legal_moves_cache = {}
     if board.pop_move() is not None:
         board.pop_move()
 
 
 # ---------------- Drawing ----------------
-def draw_board(bd: Board, selected=None, legal_moves=None):
-    # squares + pieces
+# Rendering is layered: a static background (squares) and a transparent
+# coordinate overlay are built once, each square is redrawn only when what it
+# shows changes, and the UI panel is re-rendered only when its text changes.
+# Only the touched rects are pushed with pygame.display.update(rects).
+BACKGROUND: Optional[pygame.Surface] = None        # 8x8 squares
+LABELS: Optional[pygame.Surface] = None            # pre-rendered coordinates (transparent)
+square_looks: Dict[Tuple[int, int], tuple] = {}   # what is currently drawn on each square
+ui_key = None                                      # state the UI panel was last rendered for
+result_cache: Tuple[Optional[tuple], Optional[str]] = (None, None)   # ((position hash, ply), result)
+
+
+def square_rect(file: int, rank: int) -> pygame.Rect:
+    return pygame.Rect(file * SQUARE_SIZE, (7 - rank) * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE)
+
+
+def build_layers():
+    global BACKGROUND, LABELS
+    BACKGROUND = pygame.Surface((BOARD_SIZE, BOARD_SIZE))
     for file in range(8):
         for rank in range(8):
             light = (file + rank) % 2 == 0
-            rect = pygame.Rect(file * SQUARE_SIZE, (7 - rank) * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE)
-            pygame.draw.rect(screen, LIGHT_SQ if light else DARK_SQ, rect)
+            pygame.draw.rect(BACKGROUND, LIGHT_SQ if light else DARK_SQ, square_rect(file, rank))
+
+    # file labels top & bottom, rank labels left & right
+    LABELS = pygame.Surface((BOARD_SIZE, BOARD_SIZE), pygame.SRCALPHA)
+    files = "abcdefgh"
+    for i in range(8):
+        s = FONT_SM.render(files[i], True, TEXT_COLOR)
+        cx = i * SQUARE_SIZE + SQUARE_SIZE // 2
+        LABELS.blit(s, s.get_rect(center=(cx, BOARD_SIZE - 10)))
+        LABELS.blit(s, s.get_rect(center=(cx, 10)))
+
+        rtext = FONT_SM.render(str(i + 1), True, TEXT_COLOR)
+        cy = (7 - i) * SQUARE_SIZE + SQUARE_SIZE // 2
+        LABELS.blit(rtext, rtext.get_rect(center=(10, cy)))
+        LABELS.blit(rtext, rtext.get_rect(center=(BOARD_SIZE - 10, cy)))
+
+    invalidate_layers()
+
 
+def invalidate_layers():
+    # force a full redraw on the next frame (first frame, window exposed, ...)
+    global ui_key
+    square_looks.clear()
+    ui_key = None
+
+
+def cached_result(bd: Board) -> Optional[str]:
+    # get_result runs a full checkmate/stalemate analysis: only redo it when the position changes.
+    # Repetition and fifty-move draws depend on the move history too, so the ply is part of the key.
+    global result_cache
+    key = (bd.hash, bd.ply())
+    if result_cache[0] != key:
+        result_cache = (key, bd.get_result())
+    return result_cache[1]
+
+
+def draw_board(bd: Board, selected=None, legal_moves=None) -> List[pygame.Rect]:
+    targets = {mv.to_pos for mv in legal_moves} if legal_moves else set()
+    dirty = []
+    for file in range(8):
+        for rank in range(8):
             piece = bd.piece_at(file, rank)
-            if piece:
-                symbol = piece.symbol()
-                img = get_scaled_image(symbol)
-                if img:
-                    screen.blit(img, rect)
+            look = (piece.symbol() if piece else None, selected == (file, rank), (file, rank) in targets)
+            if square_looks.get((file, rank)) == look:
+                continue
+            square_looks[(file, rank)] = look
+
+            rect = square_rect(file, rank)
+            screen.blit(BACKGROUND, rect, rect)
+
+            symbol, is_selected, is_target = look
+            if symbol:
+                area = ATLAS_RECTS.get(symbol)
+                if area:
+                    screen.blit(ATLAS, rect, area)
                 else:
                     # fallback text
                     text = FONT_LG.render(symbol, True, TEXT_COLOR)
                     screen.blit(text, text.get_rect(center=rect.center))
 
-    # highlights
-    if selected:
-        fx, fy = selected
-        rect = pygame.Rect(fx * SQUARE_SIZE, (7 - fy) * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE)
-        pygame.draw.rect(screen, SELECT, rect, 4)
+            # highlights
+            if is_selected:
+                pygame.draw.rect(screen, SELECT, rect, 4)
+            if is_target:
+                pygame.draw.circle(screen, HIGHLIGHT, rect.center, max(6, SQUARE_SIZE // 10))
 
-    if legal_moves:
-        for mv in legal_moves:
-            tx, ty = mv.to_pos
-            cx, cy = screen_center_from_square(tx, ty)
-            pygame.draw.circle(screen, HIGHLIGHT, (cx, cy), max(6, SQUARE_SIZE // 10))
+            screen.blit(LABELS, rect, rect)
+            dirty.append(rect)
+    return dirty
 
-    # file labels top & bottom, rank labels left & right
-    files = "abcdefgh"
-    for i in range(8):
-        # bottom
-        s = FONT_SM.render(files[i], True, TEXT_COLOR)
-        bx = i * SQUARE_SIZE + SQUARE_SIZE // 2
-        by = BOARD_SIZE - 10
-        screen.blit(s, s.get_rect(center=(bx, by)))
-        # top
-        tx = i * SQUARE_SIZE + SQUARE_SIZE // 2
-        ty = 10
-        screen.blit(s, s.get_rect(center=(tx, ty)))
 
-    for i in range(8):
-        rtext = FONT_SM.render(str(i + 1), True, TEXT_COLOR)
-        lx = 10
-        ly = (7 - i) * SQUARE_SIZE + SQUARE_SIZE // 2
-        screen.blit(rtext, rtext.get_rect(center=(lx, ly)))
-        # right side
-        rx = BOARD_SIZE - 10
-        ry = (7 - i) * SQUARE_SIZE + SQUARE_SIZE // 2
-        screen.blit(rtext, rtext.get_rect(center=(rx, ry)))
+def draw_ui(bd: Board, agent_obj, mode: str, last_ai_sec: float) -> List[pygame.Rect]:
+    global ui_key
+    turn = "WHITE" if bd.turn == Color.WHITE else "BLACK"
+    name = getattr(agent_obj, "name", agent_obj.__class__.__name__)
+    ponder = None
+    if hasattr(agent_obj, "start_ponder"):
+        ponder = f"on ({agent_obj.ponder_hits} hits)" if ponder_enabled else "off"
+    result = cached_result(bd)
 
+    key = (turn, mode, name, round(last_ai_sec, 2), ponder, result)
+    if key == ui_key:
+        return []
+    ui_key = key
 
-def draw_ui(bd: Board, agent_obj, mode: str, last_ai_sec: float):
     # panel background
     ui_rect = pygame.Rect(BOARD_SIZE, 0, UI_WIDTH, HEIGHT)
-    pygame.draw.rect(screen, UI_BG, ui_rect)
+    panel = pygame.Surface(ui_rect.size)
+    panel.fill(UI_BG)
 
-    x0 = BOARD_SIZE + 12
+    x0 = 12
     y = 12
 
     # Title
-    screen.blit(FONT_LG.render("Game Info", True, TEXT_COLOR), (x0, y))
+    panel.blit(FONT_LG.render("Game Info", True, TEXT_COLOR), (x0, y))
     y += 40
 
     # Turn
-    turn = "WHITE" if bd.turn == Color.WHITE else "BLACK"
-    screen.blit(FONT_MD.render(f"Turn: {turn}", True, TEXT_COLOR), (x0, y))
+    panel.blit(FONT_MD.render(f"Turn: {turn}", True, TEXT_COLOR), (x0, y))
     y += 26
 
     # Agent mode & name
-    name = getattr(agent_obj, "name", agent_obj.__class__.__name__)
-    screen.blit(FONT_MD.render(f"Agent: {mode}", True, TEXT_COLOR), (x0, y))
+    panel.blit(FONT_MD.render(f"Agent: {mode}", True, TEXT_COLOR), (x0, y))
     y += 20
-    screen.blit(FONT_MD.render(f"Name: {name}", True, TEXT_COLOR), (x0, y))
+    panel.blit(FONT_MD.render(f"Name: {name}", True, TEXT_COLOR), (x0, y))
     y += 28
 
     # Last AI time
     if last_ai_sec > 0:
-        screen.blit(FONT_MD.render(f"AI last move: {last_ai_sec:.2f}s", True, TEXT_COLOR), (x0, y))
+        panel.blit(FONT_MD.render(f"AI last move: {last_ai_sec:.2f}s", True, TEXT_COLOR), (x0, y))
+        y += 24
+
+    # Pondering status
+    if ponder is not None:
+        panel.blit(FONT_MD.render(f"Ponder: {ponder}", True, TEXT_COLOR), (x0, y))
         y += 24
 
     # Controls
-    screen.blit(FONT_MD.render("Controls:", True, TEXT_COLOR), (x0, y))
+    panel.blit(FONT_MD.render("Controls:", True, TEXT_COLOR), (x0, y))
     y += 20
     controls = [
         "Click piece -> click target",
@@ -237,23 +382,26 @@ def draw_ui(bd: Board, agent_obj, mode: str, last_ai_sec: float):
         "R : restart",
         "1 : random agent",
         "2 : minimax agent",
-        "3 : alpha-beta pruning agent"
+        "3 : alpha-beta pruning agent",
+        "P : toggle pondering"
     ]
     for c in controls:
-        screen.blit(FONT_SM.render(c, True, TEXT_COLOR), (x0, y))
+        panel.blit(FONT_SM.render(c, True, TEXT_COLOR), (x0, y))
         y += 18
 
     # Result if any
-    result = bd.get_result()
     if result:
         y = HEIGHT - 60
-        screen.blit(FONT_LG.render("Result:", True, RESULT_COLOR), (x0, y))
-        screen.blit(FONT_MD.render(result, True, RESULT_COLOR), (x0 + 10, y + 34))
+        panel.blit(FONT_LG.render("Result:", True, RESULT_COLOR), (x0, y))
+        panel.blit(FONT_MD.render(result, True, RESULT_COLOR), (x0 + 10, y + 34))
+
+    screen.blit(panel, ui_rect)
+    return [ui_rect]
 
 
 # ---------------- Event handling ----------------
 def handle_key(event):
-    global agent_mode
+    global agent_mode, ponder_enabled
     if event.key == pygame.K_u:
         try_undo_pair()
     elif event.key == pygame.K_r:
@@ -267,73 +415,63 @@ def handle_key(event):
     elif event.key == pygame.K_3:
         agent_mode = "alpha-beta-pruning"
         new_game(agent_mode)
+    elif event.key == pygame.K_p:
+        ponder_enabled = not ponder_enabled
+        if not ponder_enabled:
+            stop_pondering()
+        elif board.turn == HUMAN_COLOR:
+            start_pondering()
 
 
 def handle_mouse(pos, button):
     global selected_sq, legal_moves_cache
     if button != 1:
         return
-    if board.is_game_over():
-        return
     file, rank = board_coords_from_mouse(pos)
     if file < 0:
         return
     # only allow human turn
     if board.turn != HUMAN_COLOR:
         return
+    if cached_result(board) is not None:
+        return
 
     piece = board.piece_at(file, rank)
-    if selected_sq is None:
-        if piece and piece.color == HUMAN_COLOR:
-            selected_sq = (file, rank)
-            # compute legal moves for this piece and filter self-check
-            legal_moves_cache = []
-            for mv in all_legal_moves(board):
-                if mv.from_pos == selected_sq:
-                    board.push_move(mv)
-                    ok = not board.is_check(HUMAN_COLOR)
-                    board.pop_move()
-                    if ok:
-                        legal_moves_cache.append(mv)
-    else:
+    index = legal_move_index(board)
+    if selected_sq is not None:
         # attempt to move selected -> clicked square
-        dest = (file, rank)
-        mv = next((m for m in legal_moves_cache if m.to_pos == dest), None)
+        mv = legal_moves_cache.get((file, rank))
         if mv:
             board.push_move(mv)
             # clear selection
             selected_sq = None
-            legal_moves_cache = []
-        else:
-            # change selection if clicked another own piece
-            if piece and piece.color == HUMAN_COLOR:
-                selected_sq = (file, rank)
-                legal_moves_cache = []
-                for mv2 in all_legal_moves(board):
-                    if mv2.from_pos == selected_sq:
-                        board.push_move(mv2)
-                        ok = not board.is_check(HUMAN_COLOR)
-                        board.pop_move()
-                        if ok:
-                            legal_moves_cache.append(mv2)
-            else:
-                selected_sq = None
-                legal_moves_cache = []
+            legal_moves_cache = {}
+            return
+
+    # select (or change selection to) an own piece
+    if piece and piece.color == HUMAN_COLOR:
+        selected_sq = (file, rank)
+        legal_moves_cache = index.get(selected_sq, {})
+    else:
+        selected_sq = None
+        legal_moves_cache = {}
 
 
 # ---------------- AI turn ----------------
 def ai_move_if_needed():
     global last_ai_time
-    if board.is_game_over():
-        return
     if board.turn == HUMAN_COLOR:
         return
+    if cached_result(board) is not None:
+        return
     start = time.perf_counter()
     mv = agent.choose_move(board)
     elapsed = time.perf_counter() - start
     last_ai_time = elapsed
     if mv:
         board.push_move(mv)
+        # think about the expected replies while the human is choosing a move
+        start_pondering()
 
 
 # ---------------- Main loop ----------------
@@ -348,23 +486,30 @@ def main_loop():
         for ev in pygame.event.get():
             if ev.type == pygame.QUIT:
                 running = False
+            elif ev.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                invalidate_layers()
+            elif ev.type == pygame.VIDEORESIZE:
+                resize(ev.w, ev.h)
             elif ev.type == pygame.KEYDOWN:
                 handle_key(ev)
             elif ev.type == pygame.MOUSEBUTTONDOWN:
                 handle_mouse(ev.pos, ev.button)
 
 
-        # draw
-        screen.fill((0, 0, 0))
-        draw_board(board, selected_sq, legal_moves_cache)
-        draw_ui(board, agent, agent_mode, last_ai_time)
-        pygame.display.flip()
+        # draw (only the rects that changed since the last frame)
+        dirty = draw_board(board, selected_sq, legal_moves_cache.values())
+        dirty += draw_ui(board, agent, agent_mode, last_ai_time)
+        if dirty:
+            pygame.display.update(dirty)
 
+    stop_pondering()
     pygame.quit()
 
 
 # ---------------- Entry ----------------
 if __name__ == "__main__":
+    init_display()
     load_images()
+    build_layers()
     new_game(agent_mode)
     main_loop()
@@ -1,7 +1,11 @@
 from typing import List, Tuple, Optional, Iterator
 
-from .move import Move
+from .move import Move, FILES, RANKS, pos_to_square
 from .piece import Piece, Color, PieceType, opposite, PIECE_TO_SYMBOL
+from .tables import KNIGHT_TARGETS, KING_TARGETS, BISHOP_RAYS, ROOK_RAYS, QUEEN_RAYS, PAWN_CAPTURES
+from .zobrist import ZOBRIST_PIECES, ZOBRIST_BLACK_TO_MOVE, ZOBRIST_CASTLING
+
+STARTING_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
 
 
 class Board:
@@ -9,6 +13,7 @@ class Board:
         self.state: List[List[Optional[Piece]]] = [[None] * 8 for _ in range(8)]
         self._stack_move = []
         self.turn = Color.WHITE
+        self._start_ply = 0  # số nửa nước đã đi trước thế cờ ban đầu (khi tạo từ FEN)
 
         # Khởi tạo init state
         board = [
@@ -27,6 +32,13 @@ class Board:
                 if board[file][rank] != '.':
                     self.state[file][rank] = Piece.from_symbol(board[file][rank])
 
+        # Zobrist hash của thế cờ hiện tại, được cập nhật tăng dần trong push_move/pop_move
+        self.hash = self.compute_hash()
+        self._hash_history: List[int] = []
+
+        # Số nửa nước kể từ lần ăn quân / đi tốt gần nhất (luật 50 nước), giá trị cũ được lưu để undo
+        self.halfmove_clock = 0
+        self._clock_history: List[int] = []
 
     def __repr__(self):
         rows = []
@@ -51,6 +63,206 @@ class Board:
     def piece_at(self, file: int, rank: int) -> Optional[Piece]:
         return None if not self.in_bounds(file, rank) else self.state[file][rank]
 
+    # Tạo bàn cờ từ chuỗi FEN (bỏ qua ô bắt tốt qua đường vì engine chưa hỗ trợ en passant)
+    @classmethod
+    def from_fen(cls, fen: str) -> 'Board':
+        fields = fen.split()
+        if len(fields) < 2:
+            raise ValueError(f"Invalid FEN: {fen!r}")
+        placement, side = fields[0], fields[1]
+        castling = fields[2] if len(fields) > 2 else "-"
+        halfmove = int(fields[4]) if len(fields) > 4 else 0
+        fullmove = int(fields[5]) if len(fields) > 5 else 1
+
+        board = cls.__new__(cls)
+        board.state = [[None] * 8 for _ in range(8)]
+        board._stack_move = []
+
+        rows = placement.split("/")
+        if len(rows) != 8:
+            raise ValueError(f"Invalid FEN: {fen!r}")
+        for i, row in enumerate(rows):
+            rank = 7 - i
+            file = 0
+            for ch in row:
+                if ch.isdigit():
+                    file += int(ch)
+                    continue
+                piece = Piece.from_symbol(ch)
+                if piece is None or file > 7:
+                    raise ValueError(f"Invalid FEN: {fen!r}")
+                # Quân không ở vị trí ban đầu coi như đã di chuyển (chỉ ảnh hưởng tới nhập thành)
+                piece.has_moved = piece.piece_type in (PieceType.KING, PieceType.ROOK)
+                board.state[file][rank] = piece
+                file += 1
+
+        # Khôi phục quyền nhập thành bằng cờ has_moved của vua và xe
+        for symbol, color, rank, rook_file in (("K", Color.WHITE, 0, 7), ("Q", Color.WHITE, 0, 0),
+                                               ("k", Color.BLACK, 7, 7), ("q", Color.BLACK, 7, 0)):
+            if symbol not in castling:
+                continue
+            king = board.state[4][rank]
+            rook = board.state[rook_file][rank]
+            if (king and king.piece_type == PieceType.KING and king.color == color
+                    and rook and rook.piece_type == PieceType.ROOK and rook.color == color):
+                king.has_moved = False
+                rook.has_moved = False
+
+        board.turn = Color.WHITE if side == "w" else Color.BLACK
+        board._start_ply = 2 * (fullmove - 1) + (1 if board.turn == Color.BLACK else 0)
+        board.hash = board.compute_hash()
+        board._hash_history = []
+        board.halfmove_clock = halfmove
+        board._clock_history = []
+        return board
+
+    def fen(self) -> str:
+        rows = []
+        for rank in range(7, -1, -1):
+            row, empty = "", 0
+            for file in range(8):
+                piece = self.state[file][rank]
+                if piece is None:
+                    empty += 1
+                    continue
+                if empty:
+                    row += str(empty)
+                    empty = 0
+                row += piece.symbol()
+            rows.append(row + (str(empty) if empty else ""))
+
+        rights = self.castling_rights()
+        castling = "".join(symbol for bit, symbol in ((1, "K"), (2, "Q"), (4, "k"), (8, "q")) if rights & bit)
+        side = "w" if self.turn == Color.WHITE else "b"
+        fullmove = self.ply() // 2 + 1
+        return f"{'/'.join(rows)} {side} {castling or '-'} - {self.halfmove_clock} {fullmove}"
+
+    # Mã hóa bàn cờ thành 64 số nguyên (ô sq = rank * 8 + file): PieceType.value cho quân trắng,
+    # số âm cho quân đen, 0 cho ô trống. Dùng cho đánh giá hàng loạt và lưu dữ liệu.
+    def piece_codes(self) -> List[int]:
+        codes = [0] * 64
+        for file in range(8):
+            for rank in range(8):
+                piece = self.state[file][rank]
+                if piece:
+                    code = piece.piece_type.value
+                    codes[rank * 8 + file] = code if piece.color == Color.WHITE else -code
+        return codes
+
+    # Tìm nước đi hợp lệ ứng với chuỗi UCI (ví dụ "e2e4", "e7e8q"), trả về None nếu không có
+    def move_from_uci(self, uci: str) -> Optional[Move]:
+        target = Move.from_uci(uci)
+        promotion = (target.promotion or "").lower()
+        for move in self.get_legal_moves():
+            if (move.from_pos == target.from_pos and move.to_pos == target.to_pos
+                    and (move.promotion or "").lower() == promotion):
+                return move
+        return None
+
+    # Số nửa nước tính từ đầu ván (kể cả phần trước FEN ban đầu)
+    def ply(self) -> int:
+        return self._start_ply + len(self._stack_move)
+
+    # Các nước đã đi trên bàn cờ này, theo thứ tự
+    def move_history(self) -> List[Move]:
+        return list(self._stack_move)
+
+    # Nước đi (giả hợp lệ) có giữ được vua của bên đi an toàn không
+    def _keeps_king_safe(self, move: Move) -> bool:
+        color = self.turn
+        self.push_move(move)
+        safe = not self.is_check(color)
+        self.pop_move()
+        return safe
+
+    # Ký hiệu SAN của nước đi ở thế cờ hiện tại (ví dụ "Nf3", "exd5", "O-O", "e8=Q+"), dùng cho PGN
+    def san(self, move: Move) -> str:
+        fx, fy = move.from_pos
+        if move.is_castling:
+            san = "O-O" if move.to_pos[0] == 6 else "O-O-O"
+        else:
+            piece = self.piece_at(fx, fy)
+            capture = self.piece_at(*move.to_pos) is not None
+            target = pos_to_square(*move.to_pos)
+            if piece.piece_type == PieceType.PAWN:
+                san = (FILES[fx] + "x" if capture else "") + target
+                if move.promotion:
+                    san += "=" + move.promotion.upper()
+            else:
+                san = piece.symbol().upper()
+                # Phân biệt khi có quân cùng loại khác cũng đi được tới ô đích
+                rivals = [m.from_pos for m in self._get_legal_moves_of(self.turn)
+                          if m.to_pos == move.to_pos and m.from_pos != move.from_pos
+                          and self.piece_at(*m.from_pos).piece_type == piece.piece_type
+                          and self._keeps_king_safe(m)]
+                if rivals:
+                    if all(x != fx for x, _ in rivals):
+                        san += FILES[fx]
+                    elif all(y != fy for _, y in rivals):
+                        san += RANKS[fy]
+                    else:
+                        san += FILES[fx] + RANKS[fy]
+                san += ("x" if capture else "") + target
+
+        self.push_move(move)
+        if self.is_check(self.turn):
+            san += "#" if self.is_checkmate() else "+"
+        self.pop_move()
+        return san
+
+    # Tạo bản sao độc lập (quân cờ, lịch sử nước đi, hash) để tìm kiếm ở thread khác không đụng vào bàn gốc
+    def copy(self) -> 'Board':
+        new = Board.__new__(Board)
+        pieces = {}
+
+        def clone(piece: Optional[Piece]) -> Optional[Piece]:
+            if piece is None:
+                return None
+            if id(piece) not in pieces:
+                twin = Piece(piece.piece_type, piece.color)
+                twin.has_moved = piece.has_moved
+                pieces[id(piece)] = twin
+            return pieces[id(piece)]
+
+        new.state = [[clone(p) for p in column] for column in self.state]
+        new._stack_move = []
+        for move in self._stack_move:
+            twin = Move(move.from_pos, move.to_pos, clone(move.piece), clone(move.captured),
+                        move.promotion, move.is_castling)
+            twin.piece_was_moved_before = move.piece_was_moved_before
+            new._stack_move.append(twin)
+        new.turn = self.turn
+        new._start_ply = self._start_ply
+        new.hash = self.hash
+        new._hash_history = list(self._hash_history)
+        new.halfmove_clock = self.halfmove_clock
+        new._clock_history = list(self._clock_history)
+        return new
+
+    # Bitmask quyền nhập thành (K=1, Q=2, k=4, q=8), suy ra từ cờ has_moved của vua và xe
+    def castling_rights(self) -> int:
+        rights = 0
+        for bit, color, rank, rook_file in ((1, Color.WHITE, 0, 7), (2, Color.WHITE, 0, 0),
+                                            (4, Color.BLACK, 7, 7), (8, Color.BLACK, 7, 0)):
+            king = self.state[4][rank]
+            rook = self.state[rook_file][rank]
+            if (king and king.piece_type == PieceType.KING and king.color == color and not king.has_moved
+                    and rook and rook.piece_type == PieceType.ROOK and rook.color == color and not rook.has_moved):
+                rights |= bit
+        return rights
+
+    # Tính lại Zobrist hash từ đầu (dùng khi khởi tạo hoặc khi sửa bàn cờ trực tiếp bằng set_piece_at)
+    def compute_hash(self) -> int:
+        h = 0
+        for file in range(8):
+            for rank in range(8):
+                piece = self.state[file][rank]
+                if piece:
+                    h ^= ZOBRIST_PIECES[(piece.piece_type, piece.color)][file * 8 + rank]
+        if self.turn == Color.BLACK:
+            h ^= ZOBRIST_BLACK_TO_MOVE
+        return h ^ ZOBRIST_CASTLING[self.castling_rights()]
+
     def is_legal_move(self, move: Move) -> bool:
         return move in self.get_legal_moves()
 
@@ -59,20 +271,29 @@ class Board:
         piece = self.piece_at(*move.from_pos)
         target = self.piece_at(*move.to_pos)
 
+        fx, fy = move.from_pos
+        tx, ty = move.to_pos
+        h = self.hash ^ ZOBRIST_CASTLING[self.castling_rights()] ^ ZOBRIST_BLACK_TO_MOVE
+        h ^= ZOBRIST_PIECES[(piece.piece_type, piece.color)][fx * 8 + fy]
+        if target:
+            h ^= ZOBRIST_PIECES[(target.piece_type, target.color)][tx * 8 + ty]
+
         # Nhập thành
         if move.is_castling:
-            fx, fy = move.from_pos
-            tx, ty = move.to_pos
             if tx == 6:  # king-side
                 rook = self.piece_at(7, fy)
                 self.set_piece_at((5, fy), rook)
                 self.set_piece_at((7, fy), None)
                 rook.has_moved = True
+                h ^= ZOBRIST_PIECES[(rook.piece_type, rook.color)][7 * 8 + fy] ^ \
+                     ZOBRIST_PIECES[(rook.piece_type, rook.color)][5 * 8 + fy]
             elif tx == 2:  # queen-side
                 rook = self.piece_at(0, fy)
                 self.set_piece_at((3, fy), rook)
                 self.set_piece_at((0, fy), None)
                 rook.has_moved = True
+                h ^= ZOBRIST_PIECES[(rook.piece_type, rook.color)][0 * 8 + fy] ^ \
+                     ZOBRIST_PIECES[(rook.piece_type, rook.color)][3 * 8 + fy]
 
         # Di chuyển
         self.set_piece_at(move.to_pos, piece)
@@ -91,6 +312,18 @@ class Board:
         if piece:
             piece.has_moved = True
 
+        placed = self.piece_at(tx, ty)
+        h ^= ZOBRIST_PIECES[(placed.piece_type, placed.color)][tx * 8 + ty]
+        self._hash_history.append(self.hash)
+        self.hash = h ^ ZOBRIST_CASTLING[self.castling_rights()]
+
+        # Ăn quân hoặc đi tốt là nước không thể đảo ngược: đếm lại luật 50 nước
+        self._clock_history.append(self.halfmove_clock)
+        if target or piece.piece_type == PieceType.PAWN:
+            self.halfmove_clock = 0
+        else:
+            self.halfmove_clock += 1
+
         self.turn = opposite(self.turn)
 
     def pop_move(self) -> Optional[Move]:
@@ -124,6 +357,8 @@ class Board:
         self.set_piece_at(move.to_pos, move.captured)
         self.set_piece_at(move.from_pos, move.piece)
         self.turn = opposite(self.turn)
+        self.hash = self._hash_history.pop()
+        self.halfmove_clock = self._clock_history.pop()
 
         return move
 
@@ -142,45 +377,261 @@ class Board:
     # Kiểm tra vua màu trắng hoặc đen mà bạn truyền vào có bị chiếu không
     def is_check(self, color: Color) -> bool:
         king_pos = self.find_king(color)
-
-        for move_of_opponent in self._get_legal_moves_of(opposite(color)):
-            if move_of_opponent.to_pos == king_pos:
+        if king_pos is None:
+            return False
+        return self.is_square_attacked(king_pos, opposite(color))
+
+    # Ô pos có bị quân màu by tấn công không: nhìn ngược từ ô pos theo các bảng tính sẵn
+    # (mã, vua, tốt, ray của quân trượt) thay vì sinh toàn bộ nước đi của bên kia
+    def is_square_attacked(self, pos: Tuple[int, int], by: Color) -> bool:
+        state = self.state
+        sq = pos[0] * 8 + pos[1]
+        for file, rank in KNIGHT_TARGETS[sq]:
+            piece = state[file][rank]
+            if piece is not None and piece.color == by and piece.piece_type == PieceType.KNIGHT:
                 return True
-
+        for file, rank in KING_TARGETS[sq]:
+            piece = state[file][rank]
+            if piece is not None and piece.color == by and piece.piece_type == PieceType.KING:
+                return True
+        # Tốt màu by ăn được ô pos khi đứng ở các ô mà tốt màu còn lại đứng ở pos ăn tới
+        for file, rank in PAWN_CAPTURES[opposite(by)][sq]:
+            piece = state[file][rank]
+            if piece is not None and piece.color == by and piece.piece_type == PieceType.PAWN:
+                return True
+        for rays, slider in ((ROOK_RAYS[sq], PieceType.ROOK), (BISHOP_RAYS[sq], PieceType.BISHOP)):
+            for ray in rays:
+                for file, rank in ray:
+                    piece = state[file][rank]
+                    if piece is None:
+                        continue
+                    if piece.color == by and piece.piece_type in (slider, PieceType.QUEEN):
+                        return True
+                    break
         return False
 
+    # Static exchange evaluation: kết quả vật chất (theo bảng giá trị values: PieceType -> điểm, ví dụ
+    # heuristics.PIECE_VALUES) của chuỗi ăn qua lại trên ô đích của move, mỗi bên luôn ăn bằng quân rẻ nhất
+    # và được dừng khi ăn tiếp bị lỗ. Quân đã ăn được nhấc khỏi bàn cờ nên quân trượt phía sau (x-ray) tham gia.
+    def see(self, move: Move, values) -> int:
+        if move.is_castling:
+            return 0
+        state = self.state
+        fx, fy = move.from_pos
+        target_pos = move.to_pos
+        piece = state[fx][fy]
+        victim = state[target_pos[0]][target_pos[1]]
+
+        gain = [values[victim.piece_type] if victim is not None else 0]
+        on_square = values[piece.piece_type]
+        if move.promotion:
+            promoted = Piece.from_symbol(move.promotion).piece_type
+            gain[0] += values[promoted] - values[PieceType.PAWN]
+            on_square = values[promoted]
+
+        removed = [(fx, fy, piece)]
+        state[fx][fy] = None
+        side = opposite(piece.color)
+        try:
+            while True:
+                attacker = self._least_valuable_attacker(target_pos, side, values)
+                if attacker is None:
+                    break
+                ax, ay, attacker_piece = attacker
+                # Không dừng sớm khi dấu đã rõ (như trên CPW): cách đó chỉ giữ đúng dấu, còn độ lớn thì sai
+                gain.append(on_square - gain[-1])
+                on_square = values[attacker_piece.piece_type]
+                removed.append(attacker)
+                state[ax][ay] = None
+                side = opposite(side)
+        finally:
+            for file, rank, removed_piece in removed:
+                state[file][rank] = removed_piece
+
+        # Đi ngược lại: mỗi bên chọn giữa ăn tiếp hoặc dừng
+        for i in range(len(gain) - 1, 0, -1):
+            gain[i - 1] = -max(-gain[i - 1], gain[i])
+        return gain[0]
+
+    # Quân màu by rẻ nhất (theo values) đang tấn công ô pos: (file, rank, piece) hoặc None
+    def _least_valuable_attacker(self, pos: Tuple[int, int], by: Color, values):
+        state = self.state
+        sq = pos[0] * 8 + pos[1]
+        best = None
+        best_value = None
+        for targets, kinds in ((PAWN_CAPTURES[opposite(by)][sq], (PieceType.PAWN,)),
+                               (KNIGHT_TARGETS[sq], (PieceType.KNIGHT,)),
+                               (KING_TARGETS[sq], (PieceType.KING,))):
+            for file, rank in targets:
+                piece = state[file][rank]
+                if piece is not None and piece.color == by and piece.piece_type in kinds:
+                    value = values[piece.piece_type]
+                    if best is None or value < best_value:
+                        best, best_value = (file, rank, piece), value
+        for rays, slider in ((ROOK_RAYS[sq], PieceType.ROOK), (BISHOP_RAYS[sq], PieceType.BISHOP)):
+            for ray in rays:
+                for file, rank in ray:
+                    piece = state[file][rank]
+                    if piece is None:
+                        continue
+                    if piece.color == by and piece.piece_type in (slider, PieceType.QUEEN):
+                        value = values[piece.piece_type]
+                        if best is None or value < best_value:
+                            best, best_value = (file, rank, piece), value
+                    break
+        return best
 
     # Kiểm tra chiều hết có nghĩa là vua bị chiếu và không còn nước đi phù hợp
     def is_checkmate(self) -> bool:
-        if not self.is_check(self.turn):
-            return False
-
-        color = self.turn
+        return self.is_check(self.turn) and not self.has_legal_move(self.turn)
 
-        for move in self._get_legal_moves_of(color):
-            self.push_move(move)
-            if not self.is_check(color):
-                self.pop_move()
-                return False
+    # Như trước đây, hết cờ chỉ khi không còn nước giả hợp lệ nào: engine cho phép đi vua vào ô bị chiếu
+    # (ván kết thúc khi mất vua)
+    def is_stalemate(self) -> bool:
+        if self.is_check(self.turn):
+            return False
 
-            self.pop_move()
+        return not self.has_legal_move(self.turn, pseudo=True)
 
-        return True
+    # Số nước đi hợp lệ (không để vua bị chiếu) của color, mặc định là bên đang đi. pseudo=True đếm
+    # các nước giả hợp lệ như get_legal_moves. Không tạo đối tượng Move.
+    def count_legal_moves(self, color: Optional[Color] = None, pseudo: bool = False) -> int:
+        return self._count_moves(color or self.turn, pseudo, 1 << 30)
 
+    # Còn ít nhất một nước đi hợp lệ không, dừng ở nước đầu tiên tìm được
+    def has_legal_move(self, color: Optional[Color] = None, pseudo: bool = False) -> bool:
+        return self._count_moves(color or self.turn, pseudo, 1) > 0
 
+    def _count_moves(self, color: Color, pseudo: bool, limit: int) -> int:
+        king_pos = None if pseudo else self.find_king(color)
+        count = 0
+        for file, column in enumerate(self.state):
+            for rank, piece in enumerate(column):
+                if piece is None or piece.color != color:
+                    continue
+                promotes = piece.piece_type == PieceType.PAWN and rank == (6 if color == Color.WHITE else 1)
+                for target_pos in self._piece_targets(piece, file, rank, color):
+                    if not pseudo and not self._is_safe_move(piece, file, rank, target_pos, king_pos, color):
+                        continue
+                    count += 4 if promotes else 1  # 4 kiểu phong tốt như _get_pawn_moves
+                    if count >= limit:
+                        return count
+        return count
+
+    # Các ô đích của quân tại (file, rank), đúng như _piece_moves sinh ra nhưng không tạo Move
+    # (phong tốt chỉ trả về ô đích một lần, nhập thành trả về ô đích của vua)
+    def _piece_targets(self, piece: Piece, file: int, rank: int, color: Color) -> Iterator[Tuple[int, int]]:
+        state = self.state
+        sq = file * 8 + rank
+        piece_type = piece.piece_type
+        if piece_type == PieceType.PAWN:
+            direction = 1 if color == Color.WHITE else -1
+            ny = rank + direction
+            if 0 <= ny < 8 and state[file][ny] is None:
+                yield file, ny
+                if rank == (1 if color == Color.WHITE else 6) and state[file][ny + direction] is None:
+                    yield file, ny + direction
+            targets = PAWN_CAPTURES[color][sq]
+            for target_pos in targets:
+                target = state[target_pos[0]][target_pos[1]]
+                if target is not None and target.color != color:
+                    yield target_pos
+            return
 
+        if piece_type == PieceType.KNIGHT or piece_type == PieceType.KING:
+            for target_pos in (KNIGHT_TARGETS if piece_type == PieceType.KNIGHT else KING_TARGETS)[sq]:
+                target = state[target_pos[0]][target_pos[1]]
+                if target is None or target.color != color:
+                    yield target_pos
+            if piece_type == PieceType.KING and not piece.has_moved:
+                # Cùng điều kiện với nhập thành trong _get_king_moves
+                home = 0 if color == Color.WHITE else 7
+                for rook_file, king_file, between in ((7, 6, (5, 6)), (0, 2, (1, 2, 3))):
+                    rook = state[rook_file][home]
+                    if (rook and rook.piece_type == PieceType.ROOK and not rook.has_moved
+                            and all(state[f][home] is None for f in between)):
+                        yield king_file, home
+            return
 
-    def is_stalemate(self) -> bool:
-        if self.is_check(self.turn):
-            return False
+        rays = BISHOP_RAYS if piece_type == PieceType.BISHOP else ROOK_RAYS if piece_type == PieceType.ROOK \
+            else QUEEN_RAYS
+        for ray in rays[sq]:
+            for target_pos in ray:
+                target = state[target_pos[0]][target_pos[1]]
+                if target is None:
+                    yield target_pos
+                    continue
+                if target.color != color:
+                    yield target_pos
+                break
+
+    # Đi thử trực tiếp trên state (không qua push_move) rồi kiểm tra vua của color có bị tấn công không
+    def _is_safe_move(self, piece: Piece, file: int, rank: int, target_pos: Tuple[int, int],
+                      king_pos: Optional[Tuple[int, int]], color: Color) -> bool:
+        state = self.state
+        tx, ty = target_pos
+        captured = state[tx][ty]
+        state[tx][ty] = piece
+        state[file][rank] = None
+        rook = None
+        if piece.piece_type == PieceType.KING:
+            king_pos = target_pos
+            if tx - file in (2, -2):  # nhập thành: xe cũng di chuyển (có thể che đường chiếu)
+                rook_from, rook_to = (7, 5) if tx == 6 else (0, 3)
+                rook = state[rook_from][ty]
+                state[rook_to][ty] = rook
+                state[rook_from][ty] = None
+
+        safe = king_pos is None or not self.is_square_attacked(king_pos, opposite(color))
+
+        if rook is not None:
+            state[rook_from][ty] = rook
+            state[rook_to][ty] = None
+        state[file][rank] = piece
+        state[tx][ty] = captured
+        return safe
+
+    # Số lần thế cờ hiện tại đã xuất hiện (tính cả lần này). Chỉ cần xét các thế cờ cùng bên đi
+    # kể từ nước không thể đảo ngược gần nhất, tức là halfmove_clock nửa nước gần nhất.
+    def repetition_count(self) -> int:
+        count = 1
+        history = self._hash_history
+        for back in range(2, min(self.halfmove_clock, len(history)) + 1, 2):
+            if history[-back] == self.hash:
+                count += 1
+        return count
+
+    def is_repetition(self, count: int = 3) -> bool:
+        return self.repetition_count() >= count
+
+    def is_fifty_moves(self) -> bool:
+        return self.halfmove_clock >= 100
+
+    # Không bên nào đủ quân để chiếu hết: chỉ còn vua, vua + một quân nhẹ, hoặc chỉ có tượng cùng màu ô
+    def is_insufficient_material(self) -> bool:
+        minors = []
+        for file in range(8):
+            for rank in range(8):
+                piece = self.state[file][rank]
+                if piece is None or piece.piece_type == PieceType.KING:
+                    continue
+                if piece.piece_type not in (PieceType.KNIGHT, PieceType.BISHOP):
+                    return False
+                minors.append((piece.piece_type, (file + rank) % 2))
+        if len(minors) <= 1:
+            return True
+        return all(piece_type == PieceType.BISHOP and shade == minors[0][1] for piece_type, shade in minors)
 
-        return not any(self.get_legal_moves())
+    # Hòa theo luật: lặp lại 3 lần, 50 nước không ăn quân / đi tốt, hoặc không đủ quân chiếu hết
+    def is_draw_by_rule(self) -> bool:
+        return self.is_fifty_moves() or self.is_repetition() or self.is_insufficient_material()
 
     def is_game_over(self) -> bool:
         return (not self.find_king(Color.WHITE) or
                 not self.find_king(Color.BLACK) or
                 self.is_checkmate() or
-                self.is_stalemate())
+                self.is_stalemate() or
+                self.is_draw_by_rule())
 
     def get_result(self) -> str | None:
         if not self.find_king(Color.WHITE):
@@ -189,7 +640,7 @@ class Board:
             return 'WHITE_WIN'
         if self.is_checkmate():
             return "WHITE_WIN" if self.turn == Color.BLACK else "BLACK_WIN"
-        if self.is_stalemate():
+        if self.is_stalemate() or self.is_draw_by_rule():
             return "DRAW"
         return None
 
@@ -198,62 +649,105 @@ class Board:
     def get_legal_moves(self) -> Iterator[Move]:
         yield from self._get_legal_moves_of(self.turn)
 
-    # Hàm này là private có thể lấy các nước đi phù hợp của các quân đen hoặc trắng mà bạn truyền vào
-    def _get_legal_moves_of(self, color: Color) -> Iterator[Move]:
-        dispatch = {
-            PieceType.PAWN: self._get_pawn_moves,
-            PieceType.KNIGHT: self._get_knight_moves,
-            PieceType.BISHOP: lambda pos, c: self._slide_moves(pos, c, [(1,1),(1,-1),(-1,1),(-1,-1)]),
-            PieceType.ROOK:   lambda pos, c: self._slide_moves(pos, c, [(0,1),(0,-1),(-1,0),(1,0)]),
-            PieceType.QUEEN:  lambda pos, c: self._slide_moves(pos, c, [(1,1),(1,-1),(-1,1),(-1,-1),(0,1),(0,-1),(-1,0),(1,0)]),
-            PieceType.KING:   self._get_king_moves,
-        }
-        for file in range(8):
-            for rank in range(8):
-                piece = self.piece_at(file, rank)
-                if piece and piece.color == color:
-                    yield from dispatch[piece.piece_type]((file, rank), color)
+    # Chỉ các nước ăn quân và phong tốt của người chơi hiện tại (giai đoạn đầu của sinh nước theo giai đoạn)
+    def get_captures(self) -> Iterator[Move]:
+        yield from self._get_legal_moves_of(self.turn, captures=True)
 
-    # Lấy cái nước đi trượt theo các hướng di chuyển mà bạn truyền vào như: đi thẳng, đi ngang, đi chéo
-    def _slide_moves(self, pos: Tuple[int,int], color: Color, directions: list[Tuple[int,int]]) -> Iterator[Move]:
-        x, y = pos
-        for dx, dy in directions:
-            nx, ny = x + dx, y + dy
-            while self.in_bounds(nx, ny):
-                target = self.piece_at(nx, ny)
-                if not target:
-                    yield Move(pos, (nx, ny))
+    # Các nước còn lại: đi vào ô trống không phong tốt, kể cả nhập thành
+    def get_quiet_moves(self) -> Iterator[Move]:
+        yield from self._get_legal_moves_of(self.turn, captures=False)
+
+    # Tìm trong các nước giả hợp lệ của bên đi nước bằng move (ví dụ hash move hoặc killer lấy từ nhánh
+    # khác), chỉ sinh nước của quân tại ô đi. Trả về đối tượng Move mới của bàn cờ này hoặc None.
+    def find_move(self, move: Move) -> Optional[Move]:
+        piece = self.piece_at(*move.from_pos)
+        if piece is None or piece.color != self.turn:
+            return None
+        return next((m for m in self._piece_moves(piece, move.from_pos, self.turn) if m == move), None)
+
+    # Nước đi có ăn quân hoặc phong tốt không (thuộc giai đoạn get_captures)
+    def is_capture_or_promotion(self, move: Move) -> bool:
+        return bool(move.promotion) or (not move.is_castling and self.piece_at(*move.to_pos) is not None)
+
+    # Hàm này là private có thể lấy các nước đi phù hợp của các quân đen hoặc trắng mà bạn truyền vào.
+    # captures: None = tất cả, True = chỉ ăn quân / phong tốt, False = chỉ các nước còn lại
+    def _get_legal_moves_of(self, color: Color, captures: Optional[bool] = None) -> Iterator[Move]:
+        for file, column in enumerate(self.state):
+            for rank, piece in enumerate(column):
+                if piece and piece.color == color:
+                    yield from self._piece_moves(piece, (file, rank), color, captures)
+
+    def _piece_moves(self, piece: Piece, pos: Tuple[int, int], color: Color,
+                     captures: Optional[bool] = None) -> Iterator[Move]:
+        piece_type = piece.piece_type
+        sq = pos[0] * 8 + pos[1]
+        if piece_type == PieceType.PAWN:
+            return self._get_pawn_moves(pos, color, captures)
+        if piece_type == PieceType.KNIGHT:
+            return self._step_moves(pos, color, KNIGHT_TARGETS[sq], captures)
+        if piece_type == PieceType.BISHOP:
+            return self._slide_moves(pos, color, BISHOP_RAYS[sq], captures)
+        if piece_type == PieceType.ROOK:
+            return self._slide_moves(pos, color, ROOK_RAYS[sq], captures)
+        if piece_type == PieceType.QUEEN:
+            return self._slide_moves(pos, color, QUEEN_RAYS[sq], captures)
+        return self._get_king_moves(pos, color, captures)
+
+    # Lấy các nước đi trượt theo các ray tính sẵn của ô pos (đi thẳng, đi ngang, đi chéo)
+    def _slide_moves(self, pos: Tuple[int, int], color: Color, rays, captures: Optional[bool] = None) -> Iterator[Move]:
+        state = self.state
+        for ray in rays:
+            for target_pos in ray:
+                target = state[target_pos[0]][target_pos[1]]
+                if target is None:
+                    if captures is not True:
+                        yield Move(pos, target_pos)
                 else:
-                    if target.color != color:
-                        yield Move(pos, (nx, ny))
+                    if target.color != color and captures is not False:
+                        yield Move(pos, target_pos)
                     break
-                nx, ny = nx + dx, ny + dy
 
-    # Lấy các nước đi phù hợp của quân tốt
-    def _get_pawn_moves(self, pos: Tuple[int,int], color: Color) -> Iterator[Move]:
+    # Các nước đi một bước tới những ô tính sẵn (mã, vua)
+    def _step_moves(self, pos: Tuple[int, int], color: Color, targets, captures: Optional[bool] = None) -> Iterator[Move]:
+        state = self.state
+        for target_pos in targets:
+            target = state[target_pos[0]][target_pos[1]]
+            if target is None:
+                if captures is not True:
+                    yield Move(pos, target_pos)
+            elif target.color != color and captures is not False:
+                yield Move(pos, target_pos)
+
+    # Lấy các nước đi phù hợp của quân tốt (phong tốt luôn thuộc nhóm captures)
+    def _get_pawn_moves(self, pos: Tuple[int,int], color: Color, captures: Optional[bool] = None) -> Iterator[Move]:
         x, y = pos
         direction = 1 if color == Color.WHITE else -1
         start_rank = 1 if color == Color.WHITE else 6
         promotion_rank = 7 if color == Color.WHITE else 0
 
-        # Đi thẳng
+        # Đi thẳng. Tốt không bao giờ đứng ở hàng phong nên ny chỉ ra ngoài bàn cờ với FEN lỗi
+        state = self.state
+        column = state[x]
         ny = y + direction
-        if not self.piece_at(x, ny):
+        if 0 <= ny < 8 and column[ny] is None:
             #Phong quân
             if ny == promotion_rank:
-                for promo in (PieceType.QUEEN, PieceType.ROOK, PieceType.BISHOP, PieceType.KNIGHT):
-                    yield Move(pos, (x, ny), promotion=PIECE_TO_SYMBOL[(promo, self.turn)])
-            else:
+                if captures is not False:
+                    for promo in (PieceType.QUEEN, PieceType.ROOK, PieceType.BISHOP, PieceType.KNIGHT):
+                        yield Move(pos, (x, ny), promotion=PIECE_TO_SYMBOL[(promo, self.turn)])
+            elif captures is not True:
                 yield Move(pos, (x, ny))
                 # Đi 2 ô nếu ở vị trí bắt đầu
-                if y == start_rank and not self.piece_at(x, y + 2 * direction):
+                if y == start_rank and column[y + 2 * direction] is None:
                     yield Move(pos, (x, y + 2 * direction))
 
+        if captures is False:
+            return
+
         # Ăn chéo
-        for dx in (-1, 1):
-            nx, ny = x + dx, y + direction
-            target = self.piece_at(nx, ny)
-            if self.in_bounds(nx, ny) and target and target.color != color:
+        for nx, ny in PAWN_CAPTURES[color][x * 8 + y]:
+            target = state[nx][ny]
+            if target and target.color != color:
                 # Phong quân
                 if ny == promotion_rank:
                     for promo in (PieceType.QUEEN, PieceType.ROOK, PieceType.BISHOP, PieceType.KNIGHT):
@@ -261,46 +755,33 @@ class Board:
                 else:
                     yield Move(pos, (nx, ny))
 
-    # Lấy nước đi phù hợp của quân mã
-    def _get_knight_moves(self, pos: Tuple[int,int], color: Color) -> Iterator[Move]:
-        x, y = pos
-        for dx, dy in [(1,2),(2,1),(2,-1),(1,-2),(-1,-2),(-2,-1),(-2,1),(-1,2)]:
-            nx, ny = x + dx, y + dy
-            target = self.piece_at(nx, ny)
-            if self.in_bounds(nx, ny) and (not target or target.color != color):
-                yield Move(pos, (nx, ny))
-
     # Lấy tất cả nước đi hợp lệ của quân vua tại vị trí pos
-    def _get_king_moves(self, pos: Tuple[int, int], color: Color) -> Iterator[Move]:
+    def _get_king_moves(self, pos: Tuple[int, int], color: Color, captures: Optional[bool] = None) -> Iterator[Move]:
         x, y = pos
 
         # 1. Đi 1 ô theo tất cả các hướng
-        for dx in (-1, 0, 1):
-            for dy in (-1, 0, 1):
-                if dx == dy == 0:
-                    continue
-                nx, ny = x + dx, y + dy
-                if not self.in_bounds(nx, ny):
-                    continue
-                target = self.piece_at(nx, ny)
-                if target is None or target.color != color:
-                    yield Move(pos, (nx, ny))
+        yield from self._step_moves(pos, color, KING_TARGETS[x * 8 + y], captures)
+
+        if captures is True:
+            return
 
         # 2. Pseudo castling (chỉ check rook + ô trống, chưa check chiếu)
-        piece = self.piece_at(x, y)
+        # Các ô đều cố định trong bàn cờ nên đọc thẳng state
+        state = self.state
+        piece = state[x][y]
         if not piece or piece.has_moved:
             return
 
         rank = 0 if color == Color.WHITE else 7
 
         # ---- Nhập thành ngắn (king-side) ----
-        rook = self.piece_at(7, rank)
+        rook = state[7][rank]
         if rook and rook.piece_type == PieceType.ROOK and not rook.has_moved:
-            if all(self.piece_at(f, rank) is None for f in (5, 6)):
+            if state[5][rank] is None and state[6][rank] is None:
                 yield Move((x, y), (6, rank), is_castling=True)
 
         # ---- Nhập thành dài (queen-side) ----
-        rook = self.piece_at(0, rank)
+        rook = state[0][rank]
         if rook and rook.piece_type == PieceType.ROOK and not rook.has_moved:
-            if all(self.piece_at(f, rank) is None for f in (1, 2, 3)):
+            if state[1][rank] is None and state[2][rank] is None and state[3][rank] is None:
                 yield Move((x, y), (2, rank), is_castling=True)
@@ -10,6 +10,12 @@ def pos_to_square(x: int, y: int) -> str:
 def square_to_pos(square: str) -> Tuple[int, int]:
     return FILES.index(square[0]), RANKS.index(square[1])
 
+# Mã hóa nước đi 16 bit: bit 0-5 ô đi, 6-11 ô đến (ô = rank * 8 + file),
+# 12-13 quân phong (n, b, r, q), 14 cờ phong cấp, 15 cờ nhập thành
+PROMOTION_PIECES = "nbrq"
+PROMOTION_FLAG = 1 << 14
+CASTLING_FLAG = 1 << 15
+
 class Move:
     def __init__(self, from_pos: Tuple[int, int], to_pos: Tuple[int, int], piece: 'Piece' = None,
                  captured: 'Piece' = None, promotion: str=None, is_castling=False):
@@ -30,6 +36,27 @@ class Move:
     def __repr__(self):
         return self.to_uci()
 
+    def to_code(self) -> int:
+        fx, fy = self.from_pos
+        tx, ty = self.to_pos
+        code = (fy * 8 + fx) | (ty * 8 + tx) << 6
+        if self.promotion:
+            code |= PROMOTION_FLAG | PROMOTION_PIECES.index(self.promotion.lower()) << 12
+        if self.is_castling:
+            code |= CASTLING_FLAG
+        return code
+
+    # white: màu của bên đi, quyết định ký hiệu quân phong (hoa cho trắng, thường cho đen)
+    @classmethod
+    def from_code(cls, code: int, white: bool = True) -> 'Move':
+        from_sq, to_sq = code & 63, code >> 6 & 63
+        promotion = None
+        if code & PROMOTION_FLAG:
+            promotion = PROMOTION_PIECES[code >> 12 & 3]
+            promotion = promotion.upper() if white else promotion
+        return cls((from_sq % 8, from_sq // 8), (to_sq % 8, to_sq // 8), promotion=promotion,
+                   is_castling=bool(code & CASTLING_FLAG))
+
     @classmethod
     def from_uci(cls, uci: str) -> Optional['Move']:
         from_pos = square_to_pos(uci[:2])
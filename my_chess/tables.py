@@ -0,0 +1,58 @@
+from typing import Tuple
+
+from .piece import Color
+
+
+# Bảng nước đi tính sẵn một lần khi import, đánh chỉ số theo ô file * 8 + rank (giống Zobrist).
+# Mỗi phần tử là tuple các ô (file, rank) đã nằm trong bàn cờ nên khi sinh nước không cần kiểm tra biên.
+
+KNIGHT_OFFSETS = ((1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2))
+KING_OFFSETS = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+
+BISHOP_DIRECTIONS = ((1, 1), (1, -1), (-1, 1), (-1, -1))
+ROOK_DIRECTIONS = ((0, 1), (0, -1), (-1, 0), (1, 0))
+QUEEN_DIRECTIONS = BISHOP_DIRECTIONS + ROOK_DIRECTIONS
+
+
+def _on_board(file: int, rank: int) -> bool:
+    return 0 <= file < 8 and 0 <= rank < 8
+
+
+def _targets(offsets) -> Tuple[Tuple[Tuple[int, int], ...], ...]:
+    return tuple(
+        tuple((file + dx, rank + dy) for dx, dy in offsets if _on_board(file + dx, rank + dy))
+        for file in range(8) for rank in range(8)
+    )
+
+
+# Ray từ ô sq theo hướng (dx, dy): các ô lần lượt gặp phải cho tới mép bàn cờ (không gồm sq)
+def _ray(file: int, rank: int, dx: int, dy: int) -> Tuple[Tuple[int, int], ...]:
+    squares = []
+    file, rank = file + dx, rank + dy
+    while _on_board(file, rank):
+        squares.append((file, rank))
+        file, rank = file + dx, rank + dy
+    return tuple(squares)
+
+
+# Các ray (bỏ ray rỗng) của mỗi ô theo danh sách hướng
+def _rays(directions) -> Tuple[Tuple[Tuple[Tuple[int, int], ...], ...], ...]:
+    return tuple(
+        tuple(ray for ray in (_ray(file, rank, dx, dy) for dx, dy in directions) if ray)
+        for file in range(8) for rank in range(8)
+    )
+
+
+KNIGHT_TARGETS = _targets(KNIGHT_OFFSETS)
+KING_TARGETS = _targets(KING_OFFSETS)
+
+# BISHOP_RAYS / ROOK_RAYS / QUEEN_RAYS[sq]: các ray khác rỗng của quân đó
+BISHOP_RAYS = _rays(BISHOP_DIRECTIONS)
+ROOK_RAYS = _rays(ROOK_DIRECTIONS)
+QUEEN_RAYS = _rays(QUEEN_DIRECTIONS)
+
+# Các ô tốt của mỗi màu ăn chéo được khi đứng ở ô sq
+PAWN_CAPTURES = {
+    Color.WHITE: _targets(((-1, 1), (1, 1))),
+    Color.BLACK: _targets(((-1, -1), (1, -1))),
+}
@@ -0,0 +1,20 @@
+from random import Random
+
+from .piece import Color, PieceType
+
+
+# Bảng số ngẫu nhiên cho Zobrist hashing.
+# Dùng seed cố định để mọi process / mọi lần chạy cho cùng một hash với cùng một thế cờ.
+_rng = Random(20251019)
+
+# ZOBRIST_PIECES[(piece_type, color)][file * 8 + rank]
+ZOBRIST_PIECES = {
+    (piece_type, color): tuple(_rng.getrandbits(64) for _ in range(64))
+    for color in Color
+    for piece_type in PieceType
+}
+
+ZOBRIST_BLACK_TO_MOVE = _rng.getrandbits(64)
+
+# 4 bit quyền nhập thành: K, Q, k, q
+ZOBRIST_CASTLING = tuple(_rng.getrandbits(64) for _ in range(16))
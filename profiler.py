@@ -0,0 +1,297 @@
+"""
+Opt-in instrumentation of the engine's hot paths (Board move generation / make-unmake / check
+detection, evaluate, the alpha-beta recursion).
+
+Nothing is patched until profiling is switched on, so the normal code paths cost nothing. Either
+wrap the code to measure in the context manager:
+
+    with profiler.profile() as prof:
+        agent.search(board, depth=4)
+    prof.dump_json("profile.json")
+    prof.dump_folded("profile.folded")   # flamegraph.pl profile.folded > profile.svg
+
+or set AGENT_CHESS_PROFILE=<path> before starting one of the command-line tools (uci.py, server.py,
+selfplay.py, analyse.py, bench.py, tuner.py), which call enable_from_env() first thing in main();
+other programs can call it themselves. The profile is written at exit, as folded stacks if the path ends in ``.folded`` and as JSON otherwise. ``{pid}`` in
+the path is replaced by the process id. Worker processes started by multiprocessing (Pool,
+ProcessPoolExecutor) restart the counts after the fork and write their own file when they exit,
+including when the pool terminates them; use ``{pid}`` so they do not overwrite each other.
+
+The JSON report has, per instrumented method: call count, cumulative time (recursive calls are
+counted once), self time, and a latency histogram over one call in ``sample_every`` (log2 buckets in
+nanoseconds). Generators (move generation) are timed over all their resumptions, so a generator
+abandoned after the first move only pays for that move. Folded stacks weigh each stack by self time
+in microseconds.
+"""
+
+import functools
+import inspect
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from collections import defaultdict
+from multiprocessing import util
+from typing import Dict, List, Optional
+
+ENV_VAR = "AGENT_CHESS_PROFILE"
+DEFAULT_SAMPLE_EVERY = 16
+DUMP_EXIT_PRIORITY = 10  # chạy trước các finalizer mặc định của multiprocessing (priority 0)
+
+# Tên các phương thức của Board và các hàm của heuristics / agents được đo
+BOARD_METHODS = (
+    "push_move", "pop_move", "get_legal_moves", "get_captures", "get_quiet_moves", "_get_legal_moves_of",
+    "find_move", "find_king", "is_check", "is_square_attacked", "is_checkmate", "is_stalemate",
+    "is_game_over", "count_legal_moves", "has_legal_move", "repetition_count", "see", "copy",
+)
+HEURISTICS_FUNCTIONS = ("evaluate",)
+AGENTS_FUNCTIONS = ("evaluate", "alpha_beta", "quiescence", "pick_moves", "is_losing_capture")
+
+
+class MethodStats:
+    __slots__ = ("calls", "total_ns", "self_ns", "histogram")
+
+    def __init__(self):
+        self.calls = 0
+        self.total_ns = 0   # thời gian tích lũy, lần gọi đệ quy chỉ tính ở lần ngoài cùng
+        self.self_ns = 0    # trừ thời gian của các hàm được đo khác gọi từ bên trong
+        self.histogram: Dict[int, int] = defaultdict(int)  # bit_length(ns) -> số lần (lấy mẫu)
+
+    def percentile(self, q: float) -> Optional[int]:
+        samples = sum(self.histogram.values())
+        if not samples:
+            return None
+        seen = 0
+        for bucket in sorted(self.histogram):
+            seen += self.histogram[bucket]
+            if seen >= q * samples:
+                return 1 << bucket  # cận trên của bucket (ns)
+        return None
+
+    def to_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "total_s": self.total_ns / 1e9,
+            "self_s": self.self_ns / 1e9,
+            "mean_us": self.total_ns / self.calls / 1e3 if self.calls else 0.0,
+            "p50_le_ns": self.percentile(0.5),
+            "p99_le_ns": self.percentile(0.99),
+            "histogram": [{"le_ns": 1 << bucket, "count": count} for bucket, count in sorted(self.histogram.items())],
+        }
+
+
+# Một khung đang chạy trên stack của thread: đường dẫn folded và thời gian của các khung con
+class _Frame:
+    __slots__ = ("path", "child_ns")
+
+    def __init__(self, path: str):
+        self.path = path
+        self.child_ns = 0
+
+
+class Profiler:
+    def __init__(self, sample_every: int = DEFAULT_SAMPLE_EVERY):
+        self.sample_every = sample_every
+        self.stats: Dict[str, MethodStats] = defaultdict(MethodStats)
+        self.folded: Dict[str, int] = defaultdict(int)  # đường dẫn "a;b;c" -> self time (ns)
+        self._local = threading.local()
+        self._patched: List[tuple] = []  # (owner, tên, giá trị gốc) để khôi phục
+        self.started: Optional[float] = None
+        self.elapsed = 0.0
+
+    # ---------------- Bật / tắt ----------------
+    def enable(self):
+        if self._patched:
+            return
+        import agents
+        import heuristics
+        from my_chess.board import Board
+
+        for name in BOARD_METHODS:
+            self._patch(Board, name)
+        self._patch(heuristics.EvalCache, "evaluate")
+        for name in HEURISTICS_FUNCTIONS:
+            self._patch(heuristics, name)
+        for name in AGENTS_FUNCTIONS:
+            self._patch(agents, name)
+        self.started = time.perf_counter()
+
+    def disable(self):
+        for owner, name, original in reversed(self._patched):
+            setattr(owner, name, original)
+        self._patched.clear()
+        if self.started is not None:
+            self.elapsed += time.perf_counter() - self.started
+            self.started = None
+
+    def reset(self):
+        self.stats.clear()
+        self.folded.clear()
+        self.elapsed = 0.0
+
+    def __enter__(self) -> 'Profiler':
+        self.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self.disable()
+
+    def _patch(self, owner, name: str):
+        original = owner.__dict__.get(name)
+        if original is None:
+            return
+        module = getattr(original, "__module__", "").rsplit(".", 1)[-1]
+        label = original.__qualname__ if "." in original.__qualname__ else f"{module}.{original.__qualname__}"
+        wrap = self._wrap_generator if inspect.isgeneratorfunction(original) else self._wrap_function
+        setattr(owner, name, wrap(original, label))
+        self._patched.append((owner, name, original))
+
+    # ---------------- Đo ----------------
+    def _state(self):
+        local = self._local
+        if not hasattr(local, "stack"):
+            local.stack = []
+            local.active = defaultdict(int)  # label -> số lần gọi đang chạy (đệ quy)
+        return local
+
+    def _enter(self, local, label: str) -> _Frame:
+        stack = local.stack
+        frame = _Frame(stack[-1].path + ";" + label if stack else label)
+        stack.append(frame)
+        local.active[label] += 1
+        return frame
+
+    def _exit(self, local, label: str, frame: _Frame, elapsed: int, sample: bool):
+        stack = local.stack
+        stack.pop()
+        if stack:
+            stack[-1].child_ns += elapsed
+        self_ns = elapsed - frame.child_ns
+        self.folded[frame.path] += self_ns
+
+        stats = self.stats[label]
+        stats.self_ns += self_ns
+        local.active[label] -= 1
+        if not local.active[label]:
+            stats.total_ns += elapsed
+        if sample:
+            stats.histogram[elapsed.bit_length()] += 1
+
+    def _wrap_function(self, fn, label: str):
+        profiler = self
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            local = profiler._state()
+            stats = profiler.stats[label]
+            stats.calls += 1
+            sample = stats.calls % profiler.sample_every == 0
+            frame = profiler._enter(local, label)
+            start = time.perf_counter_ns()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                profiler._exit(local, label, frame, time.perf_counter_ns() - start, sample)
+
+        return wrapper
+
+    # Generator: đo từng lần chạy tiếp (next) và cộng lại; histogram lấy tổng thời gian khi generator kết thúc
+    # hoặc bị đóng (ví dụ pick_moves bị bỏ dở sau cắt tỉa beta)
+    def _wrap_generator(self, fn, label: str):
+        profiler = self
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            local = profiler._state()
+            stats = profiler.stats[label]
+            stats.calls += 1
+            sample = stats.calls % profiler.sample_every == 0
+            iterator = fn(*args, **kwargs)
+            total = 0
+            try:
+                while True:
+                    frame = profiler._enter(local, label)
+                    start = time.perf_counter_ns()
+                    try:
+                        item = next(iterator)
+                    except StopIteration:
+                        return
+                    finally:
+                        elapsed = time.perf_counter_ns() - start
+                        total += elapsed
+                        profiler._exit(local, label, frame, elapsed, False)
+                    yield item
+            finally:
+                iterator.close()
+                if sample:
+                    stats.histogram[total.bit_length()] += 1
+
+        return wrapper
+
+    # ---------------- Xuất kết quả ----------------
+    def report(self) -> dict:
+        elapsed = self.elapsed + (time.perf_counter() - self.started if self.started is not None else 0.0)
+        methods = sorted(self.stats.items(), key=lambda item: item[1].self_ns, reverse=True)
+        return {
+            "wall_s": elapsed,
+            "sample_every": self.sample_every,
+            "methods": {label: stats.to_dict() for label, stats in methods if stats.calls},
+        }
+
+    def dump_json(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+
+    # Định dạng folded stack của flamegraph.pl / speedscope: "a;b;c <số micro giây self time>"
+    def dump_folded(self, path: str):
+        with open(path, "w") as f:
+            for stack, ns in sorted(self.folded.items()):
+                if ns >= 1000:
+                    f.write(f"{stack} {ns // 1000}\n")
+
+    def dump(self, path: str):
+        if path.endswith(".folded"):
+            self.dump_folded(path)
+        else:
+            self.dump_json(path)
+
+
+def profile(sample_every: int = DEFAULT_SAMPLE_EVERY) -> Profiler:
+    return Profiler(sample_every)
+
+
+_env_profiler: Optional[Profiler] = None
+
+
+# atexit không chạy trong worker của multiprocessing (thoát bằng os._exit), còn finalizer của
+# multiprocessing.util chạy cả ở process chính (qua atexit) lẫn lúc worker kết thúc
+def _register_dump(profiler: Profiler, path: str):
+    util.Finalize(None, lambda: profiler.dump(path.replace("{pid}", str(os.getpid()))),
+                  exitpriority=DUMP_EXIT_PRIORITY)
+
+
+def _after_fork(profiler: Profiler, path: str):
+    # Worker kế thừa số liệu của process cha lúc fork: đếm lại từ đầu. Finalizer của cha đã bị xóa
+    # trong process con nên đăng ký lại
+    profiler.reset()
+    profiler.started = time.perf_counter()
+    _register_dump(profiler, path)
+    # Pool.terminate() dừng worker bằng SIGTERM: đổi thành SystemExit để finalizer vẫn được chạy
+    if signal.getsignal(signal.SIGTERM) is signal.SIG_DFL:
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+
+
+# Bật profiler cho cả process khi biến môi trường AGENT_CHESS_PROFILE được đặt, ghi kết quả lúc thoát
+def enable_from_env() -> Optional[Profiler]:
+    global _env_profiler
+    path = os.environ.get(ENV_VAR)
+    if not path:
+        return None
+    if _env_profiler is None:
+        _env_profiler = Profiler()
+        _env_profiler.enable()
+        _register_dump(_env_profiler, path)
+        util.register_after_fork(_env_profiler, lambda profiler: _after_fork(profiler, path))
+    return _env_profiler
@@ -0,0 +1,308 @@
+"""
+Streaming self-play dataset generator.
+
+    python selfplay.py data/ --games 1000 --workers 8 --depth 2
+
+Positions are written as they are played into chunked memory-mapped ``.npy`` files
+(``chunk_00000.npy``, ...) with the structured dtype RECORD_DTYPE: position hash, piece codes
+(see Board.piece_codes), side to move, search score (centipawns, White's view), game result
+and game id / ply. A game's result is patched into its rows when the game ends, so whole games
+are never held in memory; rows of unfinished games keep result RESULT_UNKNOWN and are skipped by
+iter_chunks. Positions are deduplicated by hash across all chunks.
+
+manifest.json and seen_hashes.npy form a checkpoint: rerunning the same command resumes, replaying
+only the games that had not finished. With ``--game-log`` finished games are appended to the log at
+each checkpoint and the manifest records the log size, so on resume the log is cut back to it and
+replayed games are not logged twice.
+"""
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import random
+import time
+from queue import Empty
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+import profiler
+from agents import AlphaBetaAgent
+from analysis_cache import AnalysisCache
+from gamelog import GameLogWriter, encode_game
+from my_chess import Board, Color
+
+RECORD_DTYPE = np.dtype([
+    ("hash", "<u8"),
+    ("board", "i1", (64,)),
+    ("stm", "i1"),        # 1 = trắng đi, -1 = đen đi
+    ("score", "<i4"),     # điểm search theo góc nhìn của trắng
+    ("result", "i1"),     # 1 trắng thắng, 0 hòa, -1 đen thắng
+    ("game", "<u4"),
+    ("ply", "<u2"),
+])
+RESULT_UNKNOWN = -128
+RESULT_CODES = {"WHITE_WIN": 1, "BLACK_WIN": -1, "DRAW": 0}
+
+MANIFEST = "manifest.json"
+SEEN_HASHES = "seen_hashes.npy"
+
+
+# ---------------- Writer / reader ----------------
+class DatasetWriter:
+    def __init__(self, out_dir: str, chunk_size: int = 1 << 20, game_log: Optional[str] = None):
+        self.out_dir = out_dir
+        os.makedirs(out_dir, exist_ok=True)
+
+        self.chunk_size = chunk_size
+        self.chunks: List[Dict] = []          # [{"file": ..., "rows": ...}]
+        self.completed_games = set()
+        self.committed_hashes = set()         # hash của các ván đã xong (được lưu vào checkpoint)
+        self.seen = set()                     # committed + các ván đang chơi, dùng để loại trùng
+        self._pending: Dict[int, List[Tuple[int, int]]] = {}   # game -> [(chunk, row)]
+        self._pending_hashes: Dict[int, List[int]] = {}
+        self._maps: Dict[int, np.memmap] = {}
+        self.game_log = GameLogWriter(game_log) if game_log else None
+        self._pending_log: List[bytes] = []   # bản ghi game log của các ván xong từ checkpoint trước
+
+        manifest = os.path.join(out_dir, MANIFEST)
+        if os.path.exists(manifest):
+            with open(manifest) as f:
+                state = json.load(f)
+            self.chunk_size = state["chunk_size"]
+            self.chunks = state["chunks"]
+            self.completed_games = set(state["completed_games"])
+            seen = os.path.join(out_dir, SEEN_HASHES)
+            if os.path.exists(seen):
+                self.committed_hashes = set(np.load(seen).tolist())
+            self.seen = set(self.committed_hashes)
+
+            # Các ván chưa xong ở checkpoint cuối sẽ được chơi lại: bỏ nhãn các hàng cũ của chúng
+            # (kết quả có thể đã được ghi xuống đĩa sau checkpoint trước khi process bị dừng)
+            completed = np.fromiter(self.completed_games, dtype=np.uint32)
+            for index, chunk in enumerate(self.chunks):
+                records = self._chunk(index)[:chunk["rows"]]
+                orphans = ~np.isin(records["game"], completed)
+                records["result"][orphans] = RESULT_UNKNOWN
+
+            # Bỏ các ván được ghi vào game log sau checkpoint cuối, chúng sẽ được chơi và ghi lại
+            log_size = state.get("game_log_size")
+            if self.game_log is not None and log_size is not None:
+                os.truncate(self.game_log.path, log_size)
+
+    def _chunk(self, index: int) -> np.memmap:
+        if index not in self._maps:
+            path = os.path.join(self.out_dir, self.chunks[index]["file"])
+            if os.path.exists(path):
+                self._maps[index] = np.load(path, mmap_mode="r+")
+            else:
+                self._maps[index] = np.lib.format.open_memmap(path, mode="w+", dtype=RECORD_DTYPE,
+                                                              shape=(self.chunk_size,))
+        return self._maps[index]
+
+    # Ghi một thế cờ, trả về False nếu thế cờ đã có trong dataset
+    def add(self, game: int, ply: int, key: int, codes: bytes, stm: int, score: int) -> bool:
+        if key in self.seen:
+            return False
+        self.seen.add(key)
+
+        if not self.chunks or self.chunks[-1]["rows"] >= self.chunk_size:
+            self.chunks.append({"file": f"chunk_{len(self.chunks):05d}.npy", "rows": 0})
+        index = len(self.chunks) - 1
+        row = self.chunks[index]["rows"]
+        record = self._chunk(index)[row]
+        record["hash"] = key
+        record["board"] = np.frombuffer(codes, dtype=np.int8)
+        record["stm"] = stm
+        record["score"] = score
+        record["result"] = RESULT_UNKNOWN
+        record["game"] = game
+        record["ply"] = ply
+        self.chunks[index]["rows"] = row + 1
+
+        self._pending.setdefault(game, []).append((index, row))
+        self._pending_hashes.setdefault(game, []).append(key)
+        return True
+
+    # Ván kết thúc: ghi kết quả vào các hàng của ván đó. log_record (encode_game) được ghi vào game log
+    # ở checkpoint tiếp theo
+    def finish_game(self, game: int, result: int, log_record: Optional[bytes] = None):
+        rows_by_chunk: Dict[int, List[int]] = {}
+        for index, row in self._pending.pop(game, []):
+            rows_by_chunk.setdefault(index, []).append(row)
+        for index, rows in rows_by_chunk.items():
+            self._chunk(index)["result"][rows] = result
+        self.committed_hashes.update(self._pending_hashes.pop(game, []))
+        self.completed_games.add(game)
+        if log_record is not None:
+            self._pending_log.append(log_record)
+
+    def checkpoint(self):
+        for chunk in self._maps.values():
+            chunk.flush()
+        if self.game_log is not None:
+            for record in self._pending_log:
+                self.game_log.write_encoded(record)
+            self._pending_log.clear()
+        seen = os.path.join(self.out_dir, SEEN_HASHES)
+        np.save(seen + ".tmp.npy", np.fromiter(self.committed_hashes, dtype=np.uint64))
+        os.replace(seen + ".tmp.npy", seen)
+
+        state = {
+            "chunk_size": self.chunk_size,
+            "chunks": self.chunks,
+            "completed_games": sorted(self.completed_games),
+        }
+        if self.game_log is not None:
+            state["game_log_size"] = os.path.getsize(self.game_log.path)
+        manifest = os.path.join(self.out_dir, MANIFEST)
+        with open(manifest + ".tmp", "w") as f:
+            json.dump(state, f)
+        os.replace(manifest + ".tmp", manifest)
+
+    def close(self):
+        self.checkpoint()
+        self._maps.clear()
+        if self.game_log is not None:
+            self.game_log.close()
+
+
+# Đọc dataset theo từng chunk (memory-mapped), mặc định bỏ các hàng chưa có kết quả
+def iter_chunks(out_dir: str, labelled_only: bool = True) -> Iterator[np.ndarray]:
+    with open(os.path.join(out_dir, MANIFEST)) as f:
+        state = json.load(f)
+    for chunk in state["chunks"]:
+        records = np.load(os.path.join(out_dir, chunk["file"]), mmap_mode="r")[:chunk["rows"]]
+        if labelled_only:
+            records = records[records["result"] != RESULT_UNKNOWN]
+        yield records
+
+
+# ---------------- Self-play workers ----------------
+_queue: Optional[mp.Queue] = None
+_log_games = False
+_cache: Optional[AnalysisCache] = None
+
+
+def _init_worker(queue: mp.Queue, log_games: bool = False, cache: Optional[AnalysisCache] = None):
+    global _queue, _log_games, _cache
+    _queue = queue
+    _log_games = log_games
+    _cache = cache
+
+
+# Chạy play_game và luôn gửi về một thông điệp kết thúc: lỗi trong worker được báo về process chính
+# thay vì để vòng đọc queue chờ mãi thông điệp "end" không bao giờ tới
+def _play_game_safe(game: int, *args):
+    try:
+        return play_game(game, *args)
+    except BaseException as e:
+        _queue.put(("error", game, f"{type(e).__name__}: {e}"))
+        raise
+
+
+# Chơi một ván agent vs agent và gửi từng thế cờ về writer ngay khi có điểm search.
+# Seed cố định theo game id nên chơi lại một ván (khi resume) cho ra cùng các thế cờ.
+def play_game(game: int, seed: int, depth: int, random_plies: int, max_plies: int):
+    rng = random.Random(seed * 1_000_003 + game)
+    board = Board()
+    agent = AlphaBetaAgent("selfplay", Color.WHITE, depth=depth, cache=_cache)
+
+    result = None
+    for ply in range(max_plies):
+        result = board.get_result()
+        if result is not None:
+            break
+
+        if ply < random_plies:
+            # Khai cuộc ngẫu nhiên để các ván khác nhau
+            move = rng.choice(list(board.get_legal_moves()))
+        else:
+            agent.color = board.turn
+            move = agent.search(board, depth=depth)
+            if move is None:
+                break
+            codes = bytes(c & 0xFF for c in board.piece_codes())
+            stm = 1 if board.turn == Color.WHITE else -1
+            _queue.put(("pos", game, ply, board.hash, codes, stm, int(agent.last_info["score"])))
+        board.push_move(move)
+    else:
+        # Hết max_plies: nước cuối cùng vẫn có thể kết thúc ván
+        result = board.get_result()
+
+    # Ván vượt quá max_plies được tính là hòa. Game log do process chính ghi lúc checkpoint
+    log_record = encode_game(board.move_history(), result or "DRAW") if _log_games else None
+    _queue.put(("end", game, RESULT_CODES.get(result, 0), log_record))
+    return game
+
+
+def generate(out_dir: str, games: int, workers: int, depth: int, seed: int = 0, random_plies: int = 8,
+             max_plies: int = 200, chunk_size: int = 1 << 20, checkpoint_every: int = 50,
+             game_log: Optional[str] = None, cache: Optional[AnalysisCache] = None):
+    writer = DatasetWriter(out_dir, chunk_size, game_log)
+    todo = [g for g in range(games) if g not in writer.completed_games]
+    print(f"{len(writer.completed_games)} games done, {len(todo)} to play")
+
+    queue = mp.Queue(maxsize=10000)
+    started = time.perf_counter()
+    positions = duplicates = finished = 0
+    with mp.Pool(workers, initializer=_init_worker, initargs=(queue, game_log is not None, cache)) as pool:
+        jobs = pool.starmap_async(_play_game_safe, [(g, seed, depth, random_plies, max_plies) for g in todo])
+        while finished < len(todo):
+            try:
+                message = queue.get(timeout=1.0)
+            except Empty:
+                # Phòng khi worker không gửi được thông điệp kết thúc: pool đã xong thì lỗi (nếu có) lộ ra ở get()
+                if jobs.ready():
+                    jobs.get()
+                    raise RuntimeError(f"workers finished but only {finished}/{len(todo)} games were reported")
+                continue
+            if message[0] == "pos":
+                _, game, ply, key, codes, stm, score = message
+                if writer.add(game, ply, key, codes, stm, score):
+                    positions += 1
+                else:
+                    duplicates += 1
+            elif message[0] == "error":
+                # Lưu checkpoint các ván đã xong (ván lỗi sẽ được chơi lại khi chạy tiếp) rồi dừng
+                _, game, error = message
+                writer.close()
+                raise RuntimeError(f"game {game} failed in worker: {error}")
+            else:
+                _, game, result, log_record = message
+                writer.finish_game(game, result, log_record)
+                finished += 1
+                if finished % checkpoint_every == 0:
+                    writer.checkpoint()
+                    elapsed = time.perf_counter() - started
+                    print(f"{finished}/{len(todo)} games, {positions} positions "
+                          f"({duplicates} duplicates), {positions / elapsed:.0f} pos/s")
+        jobs.get()
+    writer.close()
+    print(f"done: {positions} new positions, {duplicates} duplicates skipped")
+
+
+def main():
+    profiler.enable_from_env()
+    parser = argparse.ArgumentParser(description="Generate a self-play position dataset")
+    parser.add_argument("out_dir")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--random-plies", type=int, default=8, help="random opening plies per game")
+    parser.add_argument("--max-plies", type=int, default=200)
+    parser.add_argument("--chunk-size", type=int, default=1 << 20, help="positions per .npy chunk")
+    parser.add_argument("--checkpoint-every", type=int, default=50, help="games between checkpoints")
+    parser.add_argument("--game-log", help="also append every game to this binary game log (see gamelog.py)")
+    parser.add_argument("--cache", help="sqlite analysis cache shared across workers and runs")
+    parser.add_argument("--cache-size", type=int, default=1_000_000, help="max cached positions")
+    args = parser.parse_args()
+    cache = AnalysisCache(args.cache, args.cache_size, min_depth=args.depth) if args.cache else None
+    generate(args.out_dir, args.games, args.workers, args.depth, args.seed, args.random_plies,
+             args.max_plies, args.chunk_size, args.checkpoint_every, args.game_log, cache)
+
+
+if __name__ == "__main__":
+    main()
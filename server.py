@@ -0,0 +1,307 @@
+"""
+Asyncio game server: many independent human-vs-agent games over a JSON line protocol (TCP).
+
+    python server.py --port 8765 --workers 4
+
+Each request / response is one JSON object per line:
+
+    {"op": "new", "color": "white", "depth": 3, "budget": 60000}   -> {"game": 1, "fen": ..., ...}
+    {"op": "move", "game": 1, "move": "e2e4"}                       -> {"game": 1, "reply": "e7e5", ...}
+    {"op": "state", "game": 1}
+    {"op": "close", "game": 1}                                      (also done when the connection closes)
+    {"op": "stats"}                                                 -> latency p50/p99, throughput, queue
+
+Agent searches run on a bounded process pool. Requests wait in a bounded queue in front of the pool:
+when it is full, reading from that client stops (TCP backpressure) until a slot frees up.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import profiler
+from agents import AlphaBetaAgent
+from analysis_cache import AnalysisCache
+from gamelog import GameLogWriter
+from my_chess import Board, Color
+from my_chess.board import STARTING_FEN
+from uci import allocate_time
+
+DEFAULT_DEPTH = 3
+DEFAULT_BUDGET_MS = 5 * 60 * 1000  # tổng thời gian suy nghĩ của agent trong một ván
+LATENCY_WINDOW = 10000             # số mẫu độ trễ gần nhất dùng để tính p50/p99
+
+
+# ---------------- Worker process ----------------
+_worker_agent: Optional[AlphaBetaAgent] = None
+_worker_cache: Optional[AnalysisCache] = None
+
+
+def _init_worker(cache: Optional[AnalysisCache]):
+    global _worker_cache
+    _worker_cache = cache
+
+
+# Chạy trong process của pool: dựng lại thế cờ từ FEN + danh sách nước đi rồi tìm nước cho agent.
+# Agent (và TT) được giữ lại trong process nên các ván chạy trên cùng worker dùng chung TT.
+def search_move(start_fen: str, moves: List[str], depth: int, movetime: Optional[float]):
+    global _worker_agent
+    board = Board.from_fen(start_fen)
+    for uci in moves:
+        board.push_move(board.move_from_uci(uci))
+
+    if _worker_agent is None:
+        _worker_agent = AlphaBetaAgent("server", board.turn, cache=_worker_cache)
+    _worker_agent.color = board.turn
+    started = time.perf_counter()
+    move = _worker_agent.search(board, depth=depth, movetime=movetime)
+    elapsed = time.perf_counter() - started
+    return (move.to_uci().lower() if move else None), _worker_agent.last_info.get("nodes", 0), elapsed
+
+
+# ---------------- Server state ----------------
+class GameSession:
+    def __init__(self, game_id: int, human: Color, depth: int, budget_ms: float):
+        self.id = game_id
+        self.board = Board()
+        self.moves: List[str] = []
+        self.human = human
+        self.depth = depth
+        self.remaining_ms = budget_ms  # thời gian còn lại của agent
+        self.lock = asyncio.Lock()     # mỗi ván chỉ xử lý một nước tại một thời điểm
+        self.logged = False
+
+    def snapshot(self) -> dict:
+        return {
+            "game": self.id,
+            "fen": self.board.fen(),
+            "moves": self.moves,
+            "turn": "white" if self.board.turn == Color.WHITE else "black",
+            "result": self.board.get_result(),
+            "remaining_ms": round(self.remaining_ms),
+        }
+
+
+class LatencyStats:
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.samples = deque(maxlen=window)
+        self.completed = 0
+        self.started = time.perf_counter()
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+        self.completed += 1
+
+    def percentile(self, p: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+    def report(self) -> dict:
+        elapsed = time.perf_counter() - self.started
+        return {
+            "moves": self.completed,
+            "p50_ms": round(self.percentile(50) * 1000, 2),
+            "p99_ms": round(self.percentile(99) * 1000, 2),
+            "throughput_mps": round(self.completed / elapsed, 2) if elapsed > 0 else 0.0,
+        }
+
+
+class GameServer:
+    def __init__(self, workers: int = 4, queue_size: int = 64, game_log: Optional[str] = None,
+                 cache: Optional[AnalysisCache] = None):
+        self.game_log = GameLogWriter(game_log) if game_log else None
+        self.pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(cache,))
+        self.workers = workers
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.games: Dict[int, GameSession] = {}
+        self.ids = itertools.count(1)
+        self.stats = LatencyStats()
+        self.nodes = 0
+        self._dispatchers: List[asyncio.Task] = []
+
+    async def start(self):
+        # Mỗi dispatcher giữ tối đa một job trên pool => số search đồng thời bị giới hạn bởi số worker
+        self._dispatchers = [asyncio.create_task(self._dispatch()) for _ in range(self.workers)]
+
+    async def close(self):
+        for task in self._dispatchers:
+            task.cancel()
+        self.pool.shutdown(cancel_futures=True)
+        if self.game_log is not None:
+            self.game_log.close()
+
+    # Ghi ván vào game log (một lần) khi ván kết thúc hoặc bị đóng giữa chừng
+    def log_game(self, session: GameSession):
+        if self.game_log is None or session.logged or not session.moves:
+            return
+        session.logged = True
+        self.game_log.write(session.board.move_history(), session.board.get_result())
+
+    # Ghi log rồi bỏ ván khỏi bộ nhớ
+    def close_game(self, game_id: int):
+        session = self.games.pop(game_id, None)
+        if session is not None:
+            self.log_game(session)
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            session, movetime, future = await self.queue.get()
+            # Client ngắt kết nối thì future của nó bị hủy: bỏ qua yêu cầu, không set kết quả vào future
+            # đã xong (InvalidStateError sẽ làm chết dispatcher và mất luôn một slot của pool)
+            try:
+                if future.done():
+                    continue
+                result = await loop.run_in_executor(self.pool, search_move, STARTING_FEN, list(session.moves),
+                                                    session.depth, movetime)
+                if not future.done():
+                    future.set_result(result)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                self.queue.task_done()
+
+    # Xếp yêu cầu tìm nước vào hàng đợi (chờ nếu hàng đợi đầy) rồi đợi worker trả lời
+    async def agent_move(self, session: GameSession) -> Optional[str]:
+        movetime = allocate_time(session.remaining_ms)
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((session, movetime, future))
+
+        # Chỉ trừ thời gian tìm kiếm thực sự vào quỹ thời gian của ván, không tính thời gian chờ hàng đợi
+        uci, nodes, elapsed = await future
+        session.remaining_ms = max(0.0, session.remaining_ms - elapsed * 1000)
+        self.nodes += nodes
+
+        if uci is not None:
+            session.board.push_move(session.board.move_from_uci(uci))
+            session.moves.append(uci)
+        return uci
+
+    # owned: id các ván do kết nối hiện tại tạo ra, được đóng khi kết nối đóng
+    async def handle_request(self, request: dict, owned: Optional[set] = None) -> dict:
+        op = request.get("op")
+        if op == "new":
+            human = Color.BLACK if request.get("color") == "black" else Color.WHITE
+            session = GameSession(next(self.ids), human, int(request.get("depth", DEFAULT_DEPTH)),
+                                  float(request.get("budget", DEFAULT_BUDGET_MS)))
+            self.games[session.id] = session
+            if owned is not None:
+                owned.add(session.id)
+            reply = None
+            if human == Color.BLACK:
+                async with session.lock:
+                    reply = await self.agent_move(session)
+                    if session.board.get_result() is not None:
+                        self.log_game(session)
+            return {**session.snapshot(), "reply": reply}
+
+        if op == "stats":
+            return {**self.stats.report(), "games": len(self.games), "queued": self.queue.qsize(),
+                    "nodes": self.nodes}
+
+        session = self.games.get(request.get("game"))
+        if session is None:
+            return {"error": "unknown game"}
+
+        if op == "state":
+            return session.snapshot()
+        if op == "close":
+            self.close_game(session.id)
+            if owned is not None:
+                owned.discard(session.id)
+            return {"game": session.id, "closed": True}
+        if op == "move":
+            return await self.human_move(session, str(request.get("move", "")))
+        return {"error": f"unknown op {op!r}"}
+
+    async def human_move(self, session: GameSession, uci: str) -> dict:
+        async with session.lock:
+            board = session.board
+            if board.turn != session.human:
+                return {"error": "not your turn"}
+            if board.get_result() is not None:
+                return {"error": "game over"}
+
+            move = board.move_from_uci(uci)
+            if move is None:
+                return {"error": f"illegal move {uci}"}
+            board.push_move(move)
+            if board.is_check(session.human):
+                board.pop_move()
+                return {"error": f"illegal move {uci}"}
+
+            started = time.perf_counter()
+            session.moves.append(uci.lower())
+            reply = None
+            if board.get_result() is None:
+                reply = await self.agent_move(session)
+                self.stats.record(time.perf_counter() - started)
+            if board.get_result() is not None:
+                self.log_game(session)
+            return {**session.snapshot(), "reply": reply}
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        owned = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    response = await self.handle_request(request, owned)
+                except (ValueError, TypeError, IndexError) as e:
+                    response = {"error": str(e)}
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            # Các ván chưa "close" của kết nối này không còn ai chơi tiếp: đóng để không giữ mãi trong bộ nhớ
+            for game_id in owned:
+                self.close_game(game_id)
+            writer.close()
+
+
+async def serve(host: str, port: int, workers: int, queue_size: int, game_log: Optional[str] = None,
+                cache: Optional[AnalysisCache] = None):
+    server = GameServer(workers, queue_size, game_log, cache)
+    await server.start()
+    tcp = await asyncio.start_server(server.handle_client, host, port)
+    print(f"Listening on {host}:{port} ({workers} workers, queue {queue_size})")
+    try:
+        async with tcp:
+            await tcp.serve_forever()
+    finally:
+        await server.close()
+
+
+def main():
+    profiler.enable_from_env()
+    parser = argparse.ArgumentParser(description="Multi-game chess agent server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=4, help="number of search processes")
+    parser.add_argument("--queue-size", type=int, default=64, help="max pending search requests")
+    parser.add_argument("--game-log", help="append finished / closed games to this binary game log")
+    parser.add_argument("--cache", help="sqlite analysis cache shared by all workers (see analysis_cache.py)")
+    parser.add_argument("--cache-size", type=int, default=1_000_000, help="max cached positions")
+    parser.add_argument("--cache-min-depth", type=int, default=3, help="only cache searches at least this deep")
+    args = parser.parse_args()
+    cache = AnalysisCache(args.cache, args.cache_size, args.cache_min_depth) if args.cache else None
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.queue_size, args.game_log, cache))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
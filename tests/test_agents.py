@@ -0,0 +1,18 @@
+from agents import MateSearchAgent
+from my_chess import Board, Color
+
+
+def test_mate_search_finds_back_rank_mate():
+    board = Board.from_fen("6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1")
+    agent = MateSearchAgent("mate", Color.WHITE, mate_in=1)
+    assert [move.to_uci().lower() for move in agent.solve(board)] == ["a1a8"]
+    assert agent.last_info["result"] == "mate"
+
+
+def test_mate_search_stalemate_is_not_mate():
+    # Đen không còn nước giả hợp lệ nào (tốt ở hàng 1 không đi được) và không bao giờ bị chiếu: mọi nước của
+    # trắng đều làm đen hết nước nhưng đó là hòa pat
+    board = Board.from_fen("7K/8/8/8/8/8/pp6/kp5R w - - 0 1")
+    agent = MateSearchAgent("mate", Color.WHITE, mate_in=2)
+    assert agent.solve(board) is None
+    assert agent.last_info["result"] == "no mate"
@@ -0,0 +1,106 @@
+from agents import legal_moves
+from bench import random_positions
+from heuristics import PIECE_VALUES
+from my_chess import Board, Color, opposite
+
+
+# SEE tham chiếu: đi hết chuỗi ăn qua lại rồi mới đi ngược lại, không cắt tỉa sớm
+def see_unpruned(board: Board, move, values) -> int:
+    state = board.state
+    (fx, fy), target = move.from_pos, move.to_pos
+    piece = state[fx][fy]
+    victim = state[target[0]][target[1]]
+    gain = [values[victim.piece_type] if victim else 0]
+    on_square = values[piece.piece_type]
+    removed = [(fx, fy, piece)]
+    state[fx][fy] = None
+    side = opposite(piece.color)
+    while True:
+        attacker = board._least_valuable_attacker(target, side, values)
+        if attacker is None:
+            break
+        gain.append(on_square - gain[-1])
+        on_square = values[attacker[2].piece_type]
+        removed.append(attacker)
+        state[attacker[0]][attacker[1]] = None
+        side = opposite(side)
+    for file, rank, removed_piece in removed:
+        state[file][rank] = removed_piece
+    for i in range(len(gain) - 1, 0, -1):
+        gain[i - 1] = -max(-gain[i - 1], gain[i])
+    return gain[0]
+
+
+def test_see_known_values():
+    # Ví dụ trên Chess Programming Wiki
+    board = Board.from_fen("1k1r4/1pp4p/p7/4p3/8/P5P1/1PP4P/2K1R3 w - - 0 1")
+    assert board.see(board.move_from_uci("e1e5"), PIECE_VALUES) == 100
+    board = Board.from_fen("1k1r3q/1ppn3p/p4b2/4p3/8/P2N2P1/1PP1R1BP/2K1Q3 w - - 0 1")
+    assert board.see(board.move_from_uci("d3e5"), PIECE_VALUES) == 100 - 320
+    # Hậu ăn tốt được bảo vệ
+    board = Board.from_fen("4k3/8/3p4/4p3/8/8/8/4QK2 w - - 0 1")
+    assert board.see(board.move_from_uci("e1e5"), PIECE_VALUES) == 100 - 900
+
+
+def test_see_matches_unpruned_exchange():
+    checked = 0
+    for board in random_positions(2000, seed=7):
+        for move in list(board.get_captures()):
+            if move.promotion or board.piece_at(*move.to_pos) is None:
+                continue
+            fen = board.fen()
+            assert board.see(move, PIECE_VALUES) == see_unpruned(board, move, PIECE_VALUES), (fen, move)
+            assert board.fen() == fen
+            checked += 1
+    assert checked > 100
+
+
+def test_count_legal_moves_matches_generators():
+    for board in random_positions(1500, seed=3):
+        for color in (Color.WHITE, Color.BLACK):
+            pseudo = sum(1 for _ in board._get_legal_moves_of(color))
+            assert board.count_legal_moves(color, pseudo=True) == pseudo
+            assert board.has_legal_move(color, pseudo=True) == (pseudo > 0)
+        legal = len(legal_moves(board))
+        assert board.count_legal_moves() == legal, board.fen()
+        assert board.has_legal_move() == (legal > 0)
+
+
+def test_threefold_repetition_is_a_draw():
+    board = Board()
+    shuffle = ["g1f3", "g8f6", "f3g1", "f6g8"]
+    for uci in shuffle * 2:
+        assert board.get_result() is None
+        board.push_move(board.move_from_uci(uci))
+    assert board.repetition_count() == 3
+    assert board.get_result() == "DRAW"
+    board.pop_move()
+    assert not board.is_repetition()
+
+
+def test_pawn_move_ends_repetition_window():
+    board = Board()
+    for uci in ["g1f3", "g8f6", "f3g1", "f6g8", "e2e4", "e7e5"]:
+        board.push_move(board.move_from_uci(uci))
+    # Các thế cờ trước nước tốt không thể lặp lại nên không được đếm
+    for uci in ["g1f3", "g8f6", "f3g1", "f6g8"]:
+        board.push_move(board.move_from_uci(uci))
+    assert board.repetition_count() == 2
+    assert board.get_result() is None
+
+
+def test_fifty_move_rule():
+    board = Board.from_fen("4k3/8/8/8/8/8/8/R3K3 w - - 99 80")
+    assert board.get_result() is None
+    board.push_move(board.move_from_uci("a1a2"))
+    assert board.is_fifty_moves()
+    assert board.get_result() == "DRAW"
+    board.pop_move()
+    assert board.halfmove_clock == 99
+
+
+def test_pawn_move_resets_fifty_move_clock():
+    board = Board.from_fen("4k3/8/8/8/8/8/P7/4K3 w - - 99 80")
+    board.push_move(board.move_from_uci("a2a3"))
+    assert board.halfmove_clock == 0
+    assert board.get_result() is None
@@ -0,0 +1,43 @@
+import io
+
+from gamelog import GameLogWriter, encode_game, export_uci, iter_games
+from my_chess import Board, Move
+
+
+def play(board: Board, moves):
+    for uci in moves:
+        board.push_move(board.move_from_uci(uci))
+    return board
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "games.bin")
+    fen = "4k3/P7/8/8/8/8/8/4K2R w K - 0 1"
+    games = [
+        (play(Board(), ["e2e4", "e7e5", "g1f3", "b8c6", "f1c4", "g8f6", "e1g1"]), "DRAW", None),
+        (play(Board.from_fen(fen), ["a7a8q", "e8e7", "e1g1"]), "WHITE_WIN", fen),
+        (Board(), None, None),
+    ]
+    with GameLogWriter(path) as writer:
+        for board, result, start_fen in games:
+            writer.write(board.move_history(), result, start_fen)
+
+    records = list(iter_games(path))
+    assert len(records) == len(games)
+    for record, (board, result, start_fen) in zip(records, games):
+        assert record.result == result
+        assert record.start_fen == start_fen
+        assert [Move.from_code(code) for code in record.moves] == board.move_history()
+        # Chơi lại từ log cho ra đúng các nước (kể cả phong cấp / nhập thành)
+        replayed = [(move.to_uci(), move.is_castling) for _, move in record.replay()]
+        assert replayed == [(move.to_uci(), move.is_castling) for move in board.move_history()]
+
+def test_encoded_size_and_export(tmp_path):
+    board = play(Board(), ["e2e4", "e7e5"])
+    assert len(encode_game(board.move_history(), "DRAW")) == 6 + 2 * 2
+    path = str(tmp_path / "games.bin")
+    with GameLogWriter(path) as writer:
+        writer.write(board.move_history(), "BLACK_WIN")
+    out = io.StringIO()
+    export_uci(iter_games(path), out)
+    assert out.getvalue() == "e2e4 e7e5 0-1\n"
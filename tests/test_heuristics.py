@@ -0,0 +1,43 @@
+import types
+
+import pytest
+
+import heuristics
+from bench import random_positions
+from heuristics import PIECE_VALUES, PST, TUNABLE_CONSTANTS, encode_positions, evaluate, evaluate_batch
+
+
+def test_evaluate_batch_matches_evaluate():
+    boards = random_positions(1000, seed=11)
+    assert evaluate_batch(encode_positions(boards)).tolist() == [evaluate(board) for board in boards]
+
+
+@pytest.fixture
+def restore_params():
+    saved = types.SimpleNamespace(PIECE_VALUES=dict(PIECE_VALUES),
+                                  PST={piece_type: list(table) for piece_type, table in PST.items()},
+                                  **{name: getattr(heuristics, name) for name in TUNABLE_CONSTANTS})
+    yield
+    heuristics.load_params(saved)
+
+
+def test_evaluate_batch_matches_evaluate_after_load_params(restore_params):
+    params = types.SimpleNamespace(
+        PIECE_VALUES={piece_type: value + 7 for piece_type, value in PIECE_VALUES.items()},
+        PST={piece_type: [value + square % 5 - 2 for square, value in enumerate(table)]
+             for piece_type, table in PST.items()},
+        **{name: getattr(heuristics, name) + 3 for name in TUNABLE_CONSTANTS})
+    heuristics.load_params(params)
+    boards = random_positions(300, seed=5)
+    assert evaluate_batch(encode_positions(boards)).tolist() == [evaluate(board) for board in boards]
+
+
+def test_eval_cache_drops_values_after_load_params(restore_params):
+    board = random_positions(1, seed=2)[0]
+    cache = heuristics.EvalCache(1024)
+    assert cache.evaluate(board) == evaluate(board)
+    heuristics.load_params(types.SimpleNamespace(
+        PIECE_VALUES={piece_type: value * 2 for piece_type, value in PIECE_VALUES.items()}, PST={},
+        **{name: getattr(heuristics, name) for name in TUNABLE_CONSTANTS}))
+    assert cache.evaluate(board) == evaluate(board)
+    assert cache.hits == 0
@@ -0,0 +1,71 @@
+import io
+from contextlib import redirect_stdout
+
+from uci import UCIEngine, parse_go
+
+
+def run_engine(*commands) -> str:
+    engine = UCIEngine()
+    out = io.StringIO()
+    with redirect_stdout(out):
+        for command in commands:
+            engine.handle(command)
+        engine.stop()
+    return out.getvalue()
+
+
+def test_parse_go_ponder():
+    limits, clock = parse_go("ponder wtime 1000 btime 2000 winc 10 binc 10".split())
+    assert limits == {"ponder": True}
+    assert clock == {"wtime": 1000, "btime": 2000, "winc": 10, "binc": 10}
+
+
+def test_parse_go_searchmoves():
+    limits, clock = parse_go("searchmoves e2e4 d2d4 depth 2".split())
+    assert limits == {"searchmoves": ["e2e4", "d2d4"], "depth": 2}
+    assert clock == {}
+
+
+def test_parse_go_skips_unknown_and_bad_values():
+    limits, _ = parse_go("foo depth x nodes 100 mate 3 depth".split())
+    assert limits == {"nodes": 100}
+
+
+def test_go_ponder_then_ponderhit():
+    out = run_engine("position startpos", "go ponder wtime 1000 btime 1000", "ponderhit")
+    assert "bestmove" in out
+
+
+def test_go_searchmoves_restricts_root():
+    out = run_engine("position startpos", "go searchmoves a2a3 depth 2")
+    assert out.strip().splitlines()[-1] == "bestmove a2a3"
+
+
+def test_malformed_position_keeps_previous_board():
+    engine = UCIEngine()
+    out = io.StringIO()
+    with redirect_stdout(out):
+        engine.handle("position startpos moves e2e4")
+        before = engine.board.fen()
+        engine.handle("position fen garbage")
+        assert engine.board.fen() == before
+        engine.handle("position startpos moves e2e4 e7e9")
+    assert "info string invalid fen garbage" in out.getvalue()
+    assert "info string illegal move e7e9" in out.getvalue()
+
+
+def test_bad_option_value_keeps_option():
+    engine = UCIEngine()
+    entries = engine.agent.tt.max_entries
+    out = io.StringIO()
+    with redirect_stdout(out):
+        engine.handle("setoption name Hash value big")
+        engine.handle("setoption name MultiPV value x")
+    assert engine.agent.tt.max_entries == entries
+    assert engine.multipv == 1
+    assert out.getvalue().count("info string invalid value") == 2
+
+
+def test_go_stopped_before_first_move_still_moves():
+    out = run_engine("position startpos", "go nodes 0")
+    assert out.strip().splitlines()[-1] != "bestmove 0000"
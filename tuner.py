@@ -0,0 +1,351 @@
+"""
+Texel-style tuner for the evaluation weights in heuristics.py.
+
+    python tuner.py data/ --out tuned_params.py --iterations 500 --workers 8
+
+Reads a labelled position set written by selfplay.py, extracts each position's sparse feature vector
+once (the evaluation is linear in PIECE_VALUES, the six PSTs and heuristics.TUNABLE_CONSTANTS) and
+minimises the logistic loss between sigmoid(evaluation) and the game result with Adam. Gradients are
+computed in shards on a process pool. Extracted features are cached under <data>/features/<key>/, so
+repeated runs over the same dataset skip parsing. The result is written as a parameter module that
+heuristics.load_params() accepts.
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import multiprocessing as mp
+import os
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+import heuristics
+import profiler
+from heuristics import (PIECE_VALUES, PST, CENTER_SQUARES, EXTENDED_CENTER, TUNABLE_CONSTANTS,
+                        pawn_structure_counts, king_safety_counts)
+from my_chess import Color, PieceType
+from selfplay import iter_chunks, MANIFEST
+
+# Vị trí các tham số trong vector theta
+PST_OFFSET = len(PieceType)                       # 0..5: giá trị quân theo PieceType.value - 1
+SCALAR_OFFSET = PST_OFFSET + len(PieceType) * 64  # PST: 6 bảng x 64 ô
+N_PARAMS = SCALAR_OFFSET + len(TUNABLE_CONSTANTS)
+CONSTANT_INDEX = {name: SCALAR_OFFSET + i for i, name in enumerate(TUNABLE_CONSTANTS)}
+
+FEATURE_VERSION = 1  # tăng khi cách trích xuất đặc trưng thay đổi để bỏ cache cũ
+
+# 0 = ô thường, 1 = trung tâm, 2 = trung tâm mở rộng (ô sq = rank * 8 + file)
+CENTER_KIND = np.zeros(64, dtype=np.int64)
+for _file, _rank in CENTER_SQUARES:
+    CENTER_KIND[_rank * 8 + _file] = 1
+for _file, _rank in EXTENDED_CENTER:
+    CENTER_KIND[_rank * 8 + _file] = 2
+
+
+def initial_params() -> np.ndarray:
+    theta = np.zeros(N_PARAMS)
+    for piece_type in PieceType:
+        i = piece_type.value - 1
+        theta[i] = PIECE_VALUES[piece_type]
+        theta[PST_OFFSET + i * 64:PST_OFFSET + (i + 1) * 64] = PST[piece_type]
+    for name, index in CONSTANT_INDEX.items():
+        theta[index] = getattr(heuristics, name)
+    return theta
+
+
+# ---------------- Feature extraction ----------------
+# Trả về các đặc trưng dạng COO (row, col, value) sắp theo row: evaluate(position) = sum(value * theta[col])
+def extract_features(codes: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    rows, squares = np.nonzero(codes)
+    piece = codes[rows, squares].astype(np.int64)
+    kind = np.abs(piece) - 1
+    sign = np.sign(piece)
+    view = np.where(piece > 0, squares, squares ^ 56)  # quân đen nhìn PST theo hàng lật ngược
+
+    center = CENTER_KIND[squares]
+    on_center = center > 0
+    parts_rows = [rows, rows, rows[on_center]]
+    parts_cols = [kind, PST_OFFSET + kind * 64 + view,
+                  np.where(center[on_center] == 1, CONSTANT_INDEX["CENTER_BONUS"],
+                           CONSTANT_INDEX["EXTENDED_CENTER_BONUS"])]
+    parts_vals = [sign, sign, sign[on_center]]
+
+    # Cấu trúc tốt và an toàn vua: hệ số = (trắng - đen), phạt thì mang dấu âm
+    white_doubled, white_isolated = pawn_structure_counts(codes, Color.WHITE)
+    black_doubled, black_isolated = pawn_structure_counts(codes, Color.BLACK)
+    _, white_castled, white_hits, white_misses = king_safety_counts(codes, Color.WHITE)
+    _, black_castled, black_hits, black_misses = king_safety_counts(codes, Color.BLACK)
+    scalars = {
+        "DOUBLED_PAWN_PENALTY": black_doubled - white_doubled,
+        "ISOLATED_PAWN_PENALTY": black_isolated - white_isolated,
+        "CASTLED_KING_BONUS": white_castled.astype(np.int64) - black_castled,
+        "PAWN_SHIELD_BONUS": white_hits - black_hits,
+        "PAWN_SHIELD_MISSING_PENALTY": black_misses - white_misses,
+    }
+    for name, values in scalars.items():
+        nonzero = np.nonzero(values)[0]
+        parts_rows.append(nonzero)
+        parts_cols.append(np.full(len(nonzero), CONSTANT_INDEX[name]))
+        parts_vals.append(values[nonzero])
+
+    rows = np.concatenate(parts_rows)
+    order = np.argsort(rows, kind="stable")
+    return (rows[order].astype(np.int64), np.concatenate(parts_cols)[order].astype(np.int16),
+            np.concatenate(parts_vals)[order].astype(np.int8))
+
+
+def _dataset_key(data_dir: str) -> str:
+    digest = hashlib.sha1(f"v{FEATURE_VERSION}".encode())
+    with open(os.path.join(data_dir, MANIFEST), "rb") as f:
+        manifest = f.read()
+    digest.update(manifest)
+    for chunk in json.loads(manifest)["chunks"]:
+        stat = os.stat(os.path.join(data_dir, chunk["file"]))
+        digest.update(f"{chunk['file']}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()[:16]
+
+
+# Trích xuất đặc trưng một lần và lưu ra file nhị phân; lần chạy sau chỉ cần memory-map lại
+def build_feature_cache(data_dir: str) -> str:
+    cache_dir = os.path.join(data_dir, "features", _dataset_key(data_dir))
+    meta_path = os.path.join(cache_dir, "meta.json")
+    if os.path.exists(meta_path):
+        return cache_dir
+
+    os.makedirs(cache_dir, exist_ok=True)
+    files = {name: open(os.path.join(cache_dir, f"{name}.bin"), "wb")
+             for name in ("rows", "cols", "vals", "result", "score")}
+    positions = entries = 0
+    try:
+        for records in iter_chunks(data_dir):
+            codes = np.asarray(records["board"])
+            # Thế cờ mất vua là thế cờ kết thúc, không dùng để tune
+            has_kings = ((codes == PieceType.KING.value).any(axis=1)
+                         & (codes == -PieceType.KING.value).any(axis=1))
+            records, codes = records[has_kings], codes[has_kings]
+
+            rows, cols, vals = extract_features(codes)
+            (rows + positions).astype(np.int64).tofile(files["rows"])
+            cols.tofile(files["cols"])
+            vals.tofile(files["vals"])
+            ((np.asarray(records["result"], dtype=np.float32) + 1) / 2).tofile(files["result"])
+            np.asarray(records["score"], dtype=np.float32).tofile(files["score"])
+            positions += len(codes)
+            entries += len(rows)
+    finally:
+        for f in files.values():
+            f.close()
+
+    # meta.json được ghi sau cùng: cache chỉ hợp lệ khi đã trích xuất xong
+    with open(meta_path, "w") as f:
+        json.dump({"positions": positions, "entries": entries}, f)
+    return cache_dir
+
+
+def _load_bin(cache_dir: str, name: str, dtype) -> np.ndarray:
+    path = os.path.join(cache_dir, f"{name}.bin")
+    # np.memmap không map được file rỗng
+    return np.memmap(path, dtype=dtype, mode="r") if os.path.getsize(path) else np.zeros(0, dtype=dtype)
+
+
+class Features:
+    def __init__(self, cache_dir: str):
+        with open(os.path.join(cache_dir, "meta.json")) as f:
+            meta = json.load(f)
+        self.positions = meta["positions"]
+        self.rows = _load_bin(cache_dir, "rows", np.int64)
+        self.cols = _load_bin(cache_dir, "cols", np.int16)
+        self.vals = _load_bin(cache_dir, "vals", np.int8)
+        self.result = _load_bin(cache_dir, "result", np.float32)
+        self.score = _load_bin(cache_dir, "score", np.float32)
+
+    # Chia tập thế cờ thành các shard liên tiếp, trả về (start, end, entry_start, entry_end)
+    def shards(self, count: int) -> List[Tuple[int, int, int, int]]:
+        bounds = np.linspace(0, self.positions, count + 1).astype(np.int64)
+        entry_bounds = np.searchsorted(self.rows, bounds)
+        return [(int(bounds[i]), int(bounds[i + 1]), int(entry_bounds[i]), int(entry_bounds[i + 1]))
+                for i in range(count)]
+
+
+# ---------------- Loss / gradient ----------------
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    return 1 / (1 + np.exp(-np.clip(x, -50, 50)))
+
+
+def _evaluate(features: Features, shard, theta: np.ndarray) -> np.ndarray:
+    start, end, e0, e1 = shard
+    rows = features.rows[e0:e1] - start
+    return np.bincount(rows, weights=features.vals[e0:e1] * theta[features.cols[e0:e1]], minlength=end - start)
+
+
+def _targets(features: Features, shard, k: float, score_weight: float) -> np.ndarray:
+    start, end, _, _ = shard
+    target = np.asarray(features.result[start:end], dtype=np.float64)
+    if score_weight:
+        target = (1 - score_weight) * target + score_weight * _sigmoid(k * features.score[start:end])
+    return target
+
+
+# Logistic loss (tổng trên shard) và gradient theo theta
+def loss_and_gradient(features: Features, shard, theta: np.ndarray, k: float, score_weight: float):
+    start, end, e0, e1 = shard
+    target = _targets(features, shard, k, score_weight)
+    p = _sigmoid(k * _evaluate(features, shard, theta))
+    eps = 1e-12
+    loss = -np.sum(target * np.log(p + eps) + (1 - target) * np.log(1 - p + eps))
+
+    delta = (p - target) * k  # dLoss / d(evaluation)
+    rows = features.rows[e0:e1] - start
+    gradient = np.bincount(features.cols[e0:e1], weights=features.vals[e0:e1] * delta[rows], minlength=N_PARAMS)
+    return loss, gradient
+
+
+_features: Optional[Features] = None
+
+
+def _init_worker(cache_dir: str):
+    global _features
+    _features = Features(cache_dir)
+
+
+def _worker_loss_and_gradient(args):
+    shard, theta, k, score_weight = args
+    return loss_and_gradient(_features, shard, theta, k, score_weight)
+
+
+class Tuner:
+    def __init__(self, cache_dir: str, workers: int = 1):
+        self.features = Features(cache_dir)
+        self.workers = max(1, workers)
+        self.shards = self.features.shards(self.workers)
+        self.pool = mp.Pool(self.workers, initializer=_init_worker, initargs=(cache_dir,)) \
+            if self.workers > 1 else None
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+
+    def loss_and_gradient(self, theta: np.ndarray, k: float, score_weight: float = 0.0):
+        jobs = [(shard, theta, k, score_weight) for shard in self.shards]
+        if self.pool is not None:
+            results = self.pool.map(_worker_loss_and_gradient, jobs)
+        else:
+            results = [loss_and_gradient(self.features, *job) for job in jobs]
+        n = max(1, self.features.positions)
+        return sum(r[0] for r in results) / n, sum(r[1] for r in results) / n
+
+    # Tìm hệ số K của sigmoid (theo kiểu Texel) khớp nhất với bộ tham số ban đầu
+    def fit_k(self, theta: np.ndarray, score_weight: float = 0.0) -> float:
+        lo, hi = 0.05, 3.0
+        for _ in range(30):  # golden-section search
+            m1 = hi - (hi - lo) / 1.618
+            m2 = lo + (hi - lo) / 1.618
+            if self.loss_and_gradient(theta, _k(m1), score_weight)[0] < \
+                    self.loss_and_gradient(theta, _k(m2), score_weight)[0]:
+                hi = m2
+            else:
+                lo = m1
+        return (lo + hi) / 2
+
+    def tune(self, theta: np.ndarray, k: float, iterations: int, lr: float, score_weight: float = 0.0,
+             log_every: int = 50) -> np.ndarray:
+        theta = theta.copy()
+        m = np.zeros_like(theta)
+        v = np.zeros_like(theta)
+        beta1, beta2, eps = 0.9, 0.999, 1e-8
+        # Giá trị vua không ảnh hưởng đánh giá khi cả hai vua còn trên bàn nên được giữ nguyên
+        frozen = np.zeros(N_PARAMS, dtype=bool)
+        frozen[PieceType.KING.value - 1] = True
+
+        started = time.perf_counter()
+        for step in range(1, iterations + 1):
+            loss, gradient = self.loss_and_gradient(theta, k, score_weight)
+            gradient[frozen] = 0
+            m = beta1 * m + (1 - beta1) * gradient
+            v = beta2 * v + (1 - beta2) * gradient ** 2
+            theta -= lr * (m / (1 - beta1 ** step)) / (np.sqrt(v / (1 - beta2 ** step)) + eps)
+            if step % log_every == 0 or step == iterations:
+                print(f"step {step}: loss {loss:.6f} ({time.perf_counter() - started:.1f}s)")
+        return theta
+
+
+# Hệ số Texel K -> hệ số của sigmoid theo centipawn: 1 / (1 + 10^(-K * e / 400))
+def _k(texel_k: float) -> float:
+    return texel_k * math.log(10) / 400
+
+
+# ---------------- Output ----------------
+TABLE_NAMES = {
+    PieceType.PAWN: "PAWN_TABLE",
+    PieceType.KNIGHT: "KNIGHT_TABLE",
+    PieceType.BISHOP: "BISHOP_TABLE",
+    PieceType.ROOK: "ROOK_TABLE",
+    PieceType.QUEEN: "QUEEN_TABLE",
+    PieceType.KING: "KING_TABLE",
+}
+
+
+def write_params_module(path: str, theta: np.ndarray, header: str = ""):
+    values = np.rint(theta).astype(int)
+    lines = ['"""', "Evaluation parameters generated by tuner.py. Load with heuristics.load_params().",
+             header, '"""', "", "from my_chess import PieceType", "", "PIECE_VALUES = {"]
+    for piece_type in PieceType:
+        lines.append(f"    PieceType.{piece_type.name}: {values[piece_type.value - 1]},")
+    lines += ["}", ""]
+
+    for piece_type in PieceType:
+        start = PST_OFFSET + (piece_type.value - 1) * 64
+        lines.append(f"{TABLE_NAMES[piece_type]} = [")
+        for row in range(8):
+            cells = ",".join(f"{x:4d}" for x in values[start + row * 8:start + row * 8 + 8])
+            lines.append(f"   {cells},")
+        lines += ["]", ""]
+
+    lines.append("PST = {")
+    for piece_type in PieceType:
+        lines.append(f"    PieceType.{piece_type.name}: {TABLE_NAMES[piece_type]},")
+    lines += ["}", ""]
+
+    for name, index in CONSTANT_INDEX.items():
+        lines.append(f"{name} = {values[index]}")
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def main():
+    profiler.enable_from_env()
+    parser = argparse.ArgumentParser(description="Texel-style evaluation tuner")
+    parser.add_argument("data_dir", help="dataset directory written by selfplay.py")
+    parser.add_argument("--out", default="tuned_params.py", help="parameter module to write")
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--lr", type=float, default=1.0, help="Adam step size (centipawns)")
+    parser.add_argument("--k", type=float, default=None, help="Texel K (fitted when omitted)")
+    parser.add_argument("--score-weight", type=float, default=0.0,
+                        help="blend the search score into the target (0 = game result only)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    cache_dir = build_feature_cache(args.data_dir)
+    tuner = Tuner(cache_dir, args.workers)
+    print(f"{tuner.features.positions} positions, features ready in {time.perf_counter() - started:.1f}s")
+    try:
+        theta = initial_params()
+        texel_k = args.k if args.k is not None else tuner.fit_k(theta, args.score_weight)
+        k = _k(texel_k)
+        print(f"K = {texel_k:.3f}, initial loss {tuner.loss_and_gradient(theta, k, args.score_weight)[0]:.6f}")
+        theta = tuner.tune(theta, k, args.iterations, args.lr, args.score_weight)
+    finally:
+        tuner.close()
+
+    write_params_module(args.out, theta, f"K = {texel_k:.3f}, {tuner.features.positions} positions, "
+                                         f"{args.iterations} iterations")
+    print(f"wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""
+Headless UCI front end for AlphaBetaAgent (stdin/stdout).
+
+    python uci.py
+
+Supported: uci, isready, ucinewgame, setoption (Hash, Threads, MultiPV), position (startpos/fen + moves),
+go (depth, movetime, nodes, wtime, btime, winc, binc, movestogo, infinite, ponder, searchmoves),
+ponderhit, stop, quit.
+"""
+
+import sys
+import threading
+from typing import Optional
+
+import profiler
+from agents import AlphaBetaAgent, legal_moves
+from my_chess import Board, Color
+
+ENGINE_NAME = "agent-chess"
+ENGINE_AUTHOR = "Pham Dang Quoc Vien, Vu Manh Hung"
+
+DEFAULT_HASH_MB = 64
+# Ước lượng bộ nhớ của một entry trong TT (dict entry + tuple + Move) để quy đổi Hash (MB) -> số entry
+TT_ENTRY_BYTES = 200
+
+
+def send(line: str):
+    sys.stdout.write(line + "\n")
+    sys.stdout.flush()
+
+
+# Chia thời gian còn lại: khoảng 1/movestogo của đồng hồ cộng phần lớn increment, chừa lại một khoảng an toàn
+def allocate_time(time_left: float, inc: float = 0, moves_to_go: Optional[int] = None) -> float:
+    moves_to_go = moves_to_go or 30
+    budget = time_left / moves_to_go + inc * 0.8
+    return max(10.0, min(budget, time_left - 50))
+
+
+GO_FLAGS = ("infinite", "ponder")
+GO_VALUES = ("depth", "movetime", "nodes", "mate", "wtime", "btime", "winc", "binc", "movestogo")
+GO_CLOCK = ("wtime", "btime", "winc", "binc", "movestogo")
+
+
+# Nước UCI hợp lệ trên board, None nếu không đúng định dạng (ví dụ "e2e9") hoặc không đi được
+def parse_move(board: Board, uci: str):
+    try:
+        return board.move_from_uci(uci)
+    except (ValueError, IndexError):
+        return None
+
+
+# Tách tham số của lệnh "go" thành (limits, clock). Token không biết hoặc giá trị không phải số được bỏ qua;
+# searchmoves lấy các nước UCI phía sau cho tới từ khóa tiếp theo.
+def parse_go(args) -> tuple:
+    limits = {}
+    clock = {}
+    i = 0
+    while i < len(args):
+        key = args[i]
+        i += 1
+        if key in GO_FLAGS:
+            limits[key] = True
+        elif key == "searchmoves":
+            moves = []
+            while i < len(args) and args[i] not in GO_FLAGS + GO_VALUES:
+                moves.append(args[i])
+                i += 1
+            limits["searchmoves"] = moves
+        elif key in GO_VALUES and i < len(args):
+            try:
+                value = int(args[i])
+            except ValueError:
+                continue
+            i += 1
+            if key in GO_CLOCK:
+                clock[key] = value
+            elif key != "mate":
+                limits[key] = value
+    return limits, clock
+
+
+class UCIEngine:
+    def __init__(self):
+        self.board = Board()
+        self.agent = AlphaBetaAgent(ENGINE_NAME, Color.WHITE, tt_size=self._tt_entries(DEFAULT_HASH_MB))
+        self.threads = 1
+        self.multipv = 1
+        self._search_thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._ponder_movetime: Optional[float] = None
+
+    @staticmethod
+    def _tt_entries(hash_mb: int) -> int:
+        return max(1, hash_mb * 1024 * 1024 // TT_ENTRY_BYTES)
+
+    # Xử lý một dòng lệnh, trả về False khi gặp "quit"
+    def handle(self, line: str) -> bool:
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, args = tokens[0], tokens[1:]
+
+        if command == "uci":
+            send(f"id name {ENGINE_NAME}")
+            send(f"id author {ENGINE_AUTHOR}")
+            send(f"option name Hash type spin default {DEFAULT_HASH_MB} min 1 max 4096")
+            send("option name Threads type spin default 1 min 1 max 1")
+            send("option name MultiPV type spin default 1 min 1 max 64")
+            send("uciok")
+        elif command == "isready":
+            send("readyok")
+        elif command == "ucinewgame":
+            self.stop()
+            self.agent.tt.clear()
+            self.board = Board()
+        elif command == "setoption":
+            self.set_option(args)
+        elif command == "position":
+            self.stop()
+            self.set_position(args)
+        elif command == "go":
+            self.go(args)
+        elif command == "ponderhit":
+            self.ponderhit()
+        elif command == "stop":
+            self.stop()
+        elif command == "quit":
+            self.stop()
+            return False
+        return True
+
+    def set_option(self, args):
+        # setoption name <id> [value <x>]
+        if "name" not in args:
+            return
+        value_at = args.index("value") if "value" in args else len(args)
+        name = " ".join(args[args.index("name") + 1:value_at]).lower()
+        value = " ".join(args[value_at + 1:])
+        if name not in ("hash", "threads", "multipv"):
+            return
+        # Giá trị không phải số: báo lại cho GUI và giữ nguyên option cũ
+        try:
+            number = int(value)
+        except ValueError:
+            send(f"info string invalid value {value!r} for option {name}")
+            return
+        if name == "hash":
+            self.stop()
+            self.agent.tt.max_entries = self._tt_entries(number)
+            self.agent.tt.clear()
+        elif name == "threads":
+            # Tìm kiếm viết bằng Python thuần bị GIL giới hạn nên luôn chạy 1 thread
+            self.threads = number
+        elif name == "multipv":
+            self.multipv = max(1, number)
+
+    def set_position(self, args):
+        if not args:
+            return
+        if args[0] == "startpos":
+            board = Board()
+            rest = args[1:]
+        elif args[0] == "fen":
+            end = args.index("moves") if "moves" in args else len(args)
+            fen = " ".join(args[1:end])
+            try:
+                board = Board.from_fen(fen)
+            except (ValueError, IndexError, KeyError):
+                send(f"info string invalid fen {fen}")
+                return
+            rest = args[end:]
+        else:
+            return
+
+        if rest and rest[0] == "moves":
+            for uci in rest[1:]:
+                move = parse_move(board, uci)
+                if move is None:
+                    send(f"info string illegal move {uci}")
+                    break
+                board.push_move(move)
+        self.board = board
+
+    def go(self, args):
+        self.stop()
+        limits, clock = parse_go(args)
+        if "searchmoves" in limits:
+            moves = [parse_move(self.board, uci) for uci in limits["searchmoves"]]
+            limits["searchmoves"] = [move for move in moves if move is not None] or None
+
+        if "movetime" not in limits and not limits.get("infinite"):
+            white = self.board.turn == Color.WHITE
+            time_left = clock.get("wtime" if white else "btime")
+            if time_left is not None:
+                limits["movetime"] = allocate_time(time_left, clock.get("winc" if white else "binc", 0),
+                                                   clock.get("movestogo"))
+        # go ponder: tìm không giới hạn thời gian cho tới "ponderhit" (khi đó mới bắt đầu tính giờ) hoặc "stop"
+        self._ponder_movetime = limits.pop("movetime", None) if limits.get("ponder") else None
+
+        # Tìm kiếm trên bản sao ở thread riêng để vòng đọc stdin vẫn nhận được "stop"
+        self._stop = threading.Event()
+        self._search_thread = threading.Thread(target=self._search, args=(self.board.copy(), limits, self._stop),
+                                               daemon=True)
+        self._search_thread.start()
+
+    def _search(self, board: Board, limits: dict, stop: threading.Event):
+        self.agent.color = board.turn
+        # Gửi info sau mỗi độ sâu hoàn thành, mỗi dòng multipv một dòng info
+        for info in self.agent.analyse(board, depth=limits.get("depth"), movetime=limits.get("movetime"),
+                                       nodes=limits.get("nodes"), stop=stop, multipv=self.multipv,
+                                       searchmoves=limits.get("searchmoves")):
+            for rank, line in enumerate(info["multipv"], start=1):
+                # Điểm trong UCI tính theo bên đang đi, evaluate tính theo bên trắng
+                score = line["score"] if board.turn == Color.WHITE else -line["score"]
+                pv = " ".join(m.to_uci().lower() for m in line["pv"])
+                send(f"info depth {info['depth']} multipv {rank} score cp {score} nodes {info['nodes']} "
+                     f"nps {info['nps']} time {int(info['time'] * 1000)} pv {pv}")
+        move = self.agent.best_move()
+        if move is None:
+            # Bị dừng trước khi xét xong nước đầu tiên: vẫn phải trả về một nước nếu còn nước đi
+            moves = limits.get("searchmoves") or legal_moves(board) or list(board.get_legal_moves())
+            move = moves[0] if moves else None
+        send(f"bestmove {move.to_uci().lower() if move else '0000'}")
+
+    # Đối thủ đi đúng nước đã ponder: tiếp tục tìm, dừng sau thời gian dành cho nước này
+    def ponderhit(self):
+        if self._search_thread is None or self._ponder_movetime is None:
+            return
+        timer = threading.Timer(self._ponder_movetime / 1000, self._stop.set)
+        timer.daemon = True
+        timer.start()
+        self._ponder_movetime = None
+
+    def stop(self):
+        if self._search_thread is None:
+            return
+        self._stop.set()
+        self._search_thread.join()
+        self._search_thread = None
+
+
+def main():
+    profiler.enable_from_env()
+    engine = UCIEngine()
+    for line in sys.stdin:
+        if not engine.handle(line.strip()):
+            break
+
+
+if __name__ == "__main__":
+    main()